@@ -0,0 +1,159 @@
+"""Compares the command header indexer against the Command Permission Editor's original loader.
+
+Usage:
+    python benchmarks/bench_command_index.py [FILES [COMMANDS_PER_FILE]]
+
+Writes a synthetic ChatCommands header set (default 40 files x 30 commands, each class
+with a realistic constructor and Execute body) to a temporary directory, then times the
+legacy per-match regex scan, the single-pass indexer, and the indexer on a process pool.
+All three must produce the same command table. It then times reopening the editor through
+the on-disk CommandIndexCache, with nothing changed and with one header edited, and the
+editor table's filter, sort and bulk-edit operations.
+"""
+import glob
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from microvolts_command_index import CommandIndexCache, CommandTableModel, build_command_table, index_headers
+
+GRADES = ["PLAYER", "VIP", "GM", "ADMIN", "OWNER"]
+
+COMMAND_TEMPLATE = """
+// Handles /{lower}. Usage: /{lower} <target> [count]
+class {name} final : public ICommand
+{{
+public:
+    {name}()
+        : ICommand{{ "{lower}", "{description}" }}
+    {{
+    }}
+
+    void Execute(Main::Classes::Player& player, const std::vector<std::string>& args) override
+    {{
+        if (args.size() < 2)
+        {{
+            player.SendMessage("Usage: /{lower} <target> [count]");
+            return;
+        }}
+{body}
+    }}
+}};
+REGISTER_CMD({name}, Common::Enums::PlayerGrade::{grade});
+"""
+
+
+def legacy_load_commands(command_files_path):
+    commands = {}
+    description_regex = re.compile(r'ICommand\s*{\s*[^,]+,\s*"([^"]+)"')
+    permission_regex = re.compile(r"REGISTER_CMD\(\s*(\w+)\s*,\s*Common::Enums::PlayerGrade::(\w+)\)")
+    for filepath in sorted(glob.glob(os.path.join(command_files_path, "*.h"))):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            content = f.read()
+            for match in permission_regex.finditer(content):
+                command_name = match.group(1)
+                permission = match.group(2)
+                class_def_search_area = content[:match.start()]
+                class_regex = re.compile(r"(?:class|struct)\s+" + re.escape(command_name) + r"\s*(?:final)?\s*:\s*public")
+                class_match = class_regex.search(class_def_search_area)
+                if class_match:
+                    constructor_area = class_def_search_area[class_match.start():]
+                    desc_match = description_regex.search(constructor_area)
+                    if desc_match:
+                        commands[command_name] = {
+                            "file": filepath,
+                            "permission": permission,
+                            "description": desc_match.group(1),
+                            "original_permission": permission,
+                        }
+    return commands
+
+
+def write_headers(directory, files, per_file):
+    random.seed(7)
+    for file_index in range(files):
+        parts = ["#pragma once\n#include \"ICommand.h\"\n\nnamespace Main::Command\n{\n"]
+        for command_index in range(per_file):
+            name = f"Cmd{file_index:03d}x{command_index:03d}"
+            body = "\n".join(f"        player.Notify(\"step {i}\", {{ {i}, {i * 2} }});"
+                             for i in range(random.randint(5, 40)))
+            parts.append(COMMAND_TEMPLATE.format(name=name, lower=name.lower(), grade=random.choice(GRADES),
+                                                 description=f"Usage: /{name.lower()} <target> - does thing {command_index}",
+                                                 body=body))
+        parts.append("}\n")
+        with open(os.path.join(directory, f"Commands{file_index:03d}.h"), 'w', encoding='utf-8') as f:
+            f.write("".join(parts))
+
+
+def timed(name, func, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started_at)
+    print(f"{name:<36} {best * 1000:9.1f} ms")
+    return best, result
+
+
+def strip_offsets(commands):
+    return {name: {key: value for key, value in data.items() if key != "offset"} for name, data in commands.items()}
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    per_file = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    with tempfile.TemporaryDirectory() as directory:
+        write_headers(directory, files, per_file)
+        headers = sorted(glob.glob(os.path.join(directory, "*.h")))
+        size = sum(os.path.getsize(path) for path in headers)
+        print(f"{files * per_file} commands in {files} headers ({size / 1048576:.1f} MB), {os.cpu_count()} CPU(s)")
+
+        legacy_time, legacy = timed("legacy load_commands", lambda: legacy_load_commands(directory))
+        single_time, single = timed("single-pass indexer", lambda: build_command_table(
+            index_headers(headers, parallel_min_bytes=float("inf"))))
+        pool_time, pooled = timed("single-pass indexer, pool", lambda: build_command_table(
+            index_headers(headers, parallel_min_bytes=0)))
+
+        assert strip_offsets(single) == legacy, "indexer disagrees with the legacy loader"
+        assert pooled == single, "pooled indexer disagrees with the sequential one"
+        print(f"speedup vs legacy: {legacy_time / single_time:.1f}x sequential, {legacy_time / pool_time:.1f}x pool")
+
+        cache_path = os.path.join(directory, "command_index_cache.json")
+
+        def open_editor():
+            cache = CommandIndexCache(cache_path)
+            commands = build_command_table(cache.load_directory(directory))
+            cache.save()
+            return commands
+
+        open_editor()
+        _, cached = timed("reopen, cache warm", open_editor)
+        assert cached == single, "cached index disagrees with a fresh parse"
+
+        def touch_and_open():
+            os.utime(headers[0], ns=(time.time_ns(), time.time_ns()))
+            return open_editor()
+        timed("reopen, one header changed", touch_and_open)
+
+        table = CommandTableModel(single, GRADES)
+        timed("table: filter 'thing 1'", lambda: table.filter("thing 1"))
+        timed("table: filter grade GM", lambda: table.filter(grade="GM"))
+        for column in CommandTableModel.COLUMNS:
+            table.orders.clear()
+            timed(f"table: first sort by {column}", lambda: table.filter(sort=column, descending=True), repeat=1)
+        names = table.filter(grade="VIP")
+
+        def bulk_edit():
+            table.set_permission(names, "ADMIN")
+            table.set_permission(names, "VIP")
+            return table.filter(sort="Permission")
+        timed(f"table: bulk set {len(names)} rows", bulk_edit)
+
+
+if __name__ == "__main__":
+    main()
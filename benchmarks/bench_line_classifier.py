@@ -0,0 +1,155 @@
+"""Compares the console line classifier against the original _get_line_tag.
+
+Usage:
+    python benchmarks/bench_line_classifier.py [LOG_FILE ...]
+
+LOG_FILE may be a plain text log or a server_logs/ archive segment (.log or .log.gz).
+Without arguments every segment under server_logs/ is used, falling back to a
+synthetic sample when no recorded logs exist yet.
+"""
+import gc
+import glob
+import gzip
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from microvolts_server_setup import LineClassifier
+
+
+def legacy_get_line_tag(line):
+    line_upper = line.upper()
+    if "ERROR" in line_upper or "FAIL" in line_upper: return "ERROR"
+    if "WARN" in line_upper or "WARNING" in line_upper: return "WARN"
+    if "SUCCESS" in line_upper or "OK" in line_upper: return "SUCCESS"
+    if "INFO" in line_upper: return "INFO"
+    if "DEBUG" in line_upper: return "DEBUG"
+    return "DEFAULT"
+
+
+def load_lines(paths):
+    lines = []
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                # Archive segments prefix every line with "<epoch> ".
+                stamp, _, rest = line.partition(" ")
+                lines.append(rest if stamp.replace(".", "", 1).isdigit() else line)
+    return lines
+
+
+def synthetic_lines(count=200000):
+    random.seed(42)
+    templates = [
+        "[INFO] Player {id} joined room {room}",
+        "[INFO] Session token refreshed for account {id}",
+        "[DEBUG] Packet opcode {op} size {size}",
+        "[WARN] Slow tick: {ms} ms",
+        "[ERROR] Failed to load item {id} from database",
+        "Lookup of character {id} took {ms} ms",
+        "MainServer listening on port {port}",
+        "Match {room} finished: OK",
+        "DB_ERROR: query for account {id} timed out",
+        "CONNECTION_FAILED to 127.0.0.1:{port}",
+    ]
+    return [random.choice(templates).format(id=random.randint(1, 10**6), room=random.randint(1, 500),
+                                            op=random.randint(1, 900), size=random.randint(8, 4096),
+                                            ms=random.randint(1, 900), port=random.randint(13000, 13100)) + "\n"
+            for _ in range(count)]
+
+
+def best_of(run, repeat=5):
+    # Like timeit: the best of several runs, with the cyclic GC out of the way.
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - started_at)
+    finally:
+        gc.enable()
+    return best
+
+
+def bench(name, func, lines, repeat=5):
+    def run():
+        for line in lines:
+            func(line)
+    best = best_of(run, repeat)
+    print(f"{name:<28} {best * 1000:9.1f} ms  {best / len(lines) * 1e9:8.0f} ns/line")
+    return best
+
+
+def main():
+    paths = sys.argv[1:] or glob.glob(os.path.join("server_logs", "*", "*.log*"))
+    paths = [p for p in paths if not p.endswith(".idx")]
+    lines = load_lines(paths) if paths else synthetic_lines()
+    source = f"{len(paths)} recorded log file(s)" if paths else "synthetic sample"
+    print(f"{len(lines)} lines from {source}")
+
+    legacy = bench("legacy _get_line_tag", legacy_get_line_tag, lines)
+    uncached = LineClassifier(cache_size=0)
+    bench("LineClassifier (no cache)", uncached.classify, lines)
+    cached = LineClassifier()
+    current = bench("LineClassifier (cached)", cached.classify, lines)
+    print(f"per-line speedup vs legacy: {legacy / current:.2f}x")
+
+    # The console used to re-classify every retained line each time a server was
+    # re-selected; levels are now stored next to the lines at ingest (as ConsoleIndex does).
+    renders, retained = 50, 1000
+
+    def legacy_session():
+        kept = []
+        for line in lines:
+            kept.append(line)
+            legacy_get_line_tag(line)
+        for _ in range(renders):
+            for line in kept[-retained:]:
+                legacy_get_line_tag(line)
+
+    def current_session():
+        kept, levels = [], []
+        for line in lines:
+            kept.append(line)
+            levels.append(cached.classify(line))
+        for _ in range(renders):
+            for line, level in zip(kept[-retained:], levels[-retained:]):
+                pass
+
+    kept, levels = lines[-retained:], [cached.classify(line) for line in lines[-retained:]]
+
+    def legacy_render():
+        for line in kept:
+            legacy_get_line_tag(line)
+
+    def current_render():
+        for line, level in zip(kept, levels):
+            pass
+
+    legacy_render_time, current_render_time = best_of(legacy_render, 50), best_of(current_render, 50)
+    print(f"one console re-render of {retained} lines: legacy {legacy_render_time * 1e6:.0f} us, "
+          f"stored levels {current_render_time * 1e6:.0f} us ({legacy_render_time / current_render_time:.1f}x)")
+    legacy_total, current_total = best_of(legacy_session), best_of(current_session)
+    print(f"ingest + {renders} console re-renders: legacy {legacy_total * 1000:.1f} ms, "
+          f"classify-once {current_total * 1000:.1f} ms ({legacy_total / current_total:.2f}x)")
+
+    # Keywords must start a word now, so e.g. TOKEN and LOOKUP no longer count as OK, while
+    # DB_ERROR and CONNECTION_FAILED still count as errors. Every change is listed, ERROR ones first.
+    differences = {}
+    for line in lines:
+        old, new = legacy_get_line_tag(line), cached.classify(line)
+        if old != new:
+            differences[(old, new)] = differences.get((old, new), 0) + 1
+    lost_errors = sum(count for (old, new), count in differences.items() if old == "ERROR")
+    print(f"ERROR lines no longer tagged ERROR: {lost_errors}")
+    for (old, new), count in sorted(differences.items(), key=lambda item: ("ERROR" not in item[0], -item[1])):
+        print(f"  {count:7d} lines reclassified {old} -> {new}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measures spawn-to-first-log latency of setup steps, per-step processes vs. the worker host.
+
+Usage:
+    python benchmarks/bench_worker_spawn.py [ROUNDS]
+
+"legacy" reproduces the old behaviour: a fresh multiprocessing.Process per step using
+the spawn start method (the only one on Windows), which re-imports the GUI module with
+customtkinter, tkinter and requests before the step can log anything. The worker host
+numbers are for starting a host and running one step ("cold") and for running a step on
+an already running host ("warm"). Both run worker_install_mariadb with an existing
+MariaDB, which logs once and returns.
+"""
+import multiprocessing
+import os
+import queue
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from microvolts_setup_worker import WorkerHost
+
+CONFIG = {'existing_mariadb': True}
+
+
+def legacy_step(q, config):
+    import microvolts_server_setup
+    microvolts_server_setup.worker_install_mariadb(q, config)
+
+
+def first_log(messages, timeout=30):
+    while True:
+        message = messages.get(timeout=timeout)
+        if message.get('type') == 'log':
+            return
+
+
+def bench_legacy(rounds):
+    context = multiprocessing.get_context("spawn")
+    samples = []
+    for _ in range(rounds):
+        q = context.Queue()
+        started_at = time.perf_counter()
+        process = context.Process(target=legacy_step, args=(q, CONFIG))
+        process.start()
+        first_log(q)
+        samples.append(time.perf_counter() - started_at)
+        process.join()
+    return samples
+
+
+def bench_host(rounds):
+    cold, warm = [], []
+    for _ in range(rounds):
+        messages = queue.Queue()
+        host = WorkerHost(messages.put)
+        started_at = time.perf_counter()
+        host.run("worker_install_mariadb", CONFIG)
+        first_log(messages)
+        cold.append(time.perf_counter() - started_at)
+        for _ in range(5):
+            started_at = time.perf_counter()
+            host.run("worker_install_mariadb", CONFIG)
+            first_log(messages)
+            warm.append(time.perf_counter() - started_at)
+        host.stop()
+    return cold, warm
+
+
+def report(name, samples):
+    print(f"{name:<26} median {statistics.median(samples) * 1000:8.1f} ms   "
+          f"min {min(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms   (n={len(samples)})")
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    report("legacy Process per step", bench_legacy(rounds))
+    cold, warm = bench_host(rounds)
+    report("worker host, cold start", cold)
+    report("worker host, warm", warm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""Indexes the emulator's chat command headers (MainServer/include/ChatCommands/Commands/*.h).
+
+Each header is tokenized once: comments and string literals are skipped, braces are
+tracked to find class spans, and ICommand descriptions and REGISTER_CMD sites are
+recorded with their byte offsets. Large header sets are parsed on a process pool, and
+CommandIndexCache keeps the results on disk so only changed headers are parsed again.
+
+Pool workers only need this module, so it stays free of GUI imports. That alone does not
+keep them light on Windows: the spawn start method re-runs the main script's imports in
+every worker. Frozen builds dispatch the workers before the GUI imports (freeze_support at
+the top of microvolts_server_setup.py); run as a plain script, each worker still imports
+the GUI modules, which PARALLEL_MIN_BYTES has to pay for.
+"""
+import concurrent.futures
+import json
+import os
+import re
+
+# The leading lookahead lets the engine reject most positions on their first character
+# instead of trying every alternative there; it makes the scan about three times faster.
+TOKEN = re.compile(rb"""
+  (?=[/"'{}csIR])
+  (?:
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<class>\b(?:class|struct)\s+(?P<class_name>\w+)\s*(?:final\s*)?:\s*public\b)
+  | (?P<icommand>\bICommand(?=\s*\{\s*[^,]+,\s*"(?P<description>[^"]+)"))
+  | (?P<register>\bREGISTER_CMD\(\s*(?P<command>\w+)\s*,\s*Common::Enums::PlayerGrade::(?P<permission>\w+)\))
+  | (?P<open>\{)
+  | (?P<close>\})
+  )
+""", re.S | re.X)
+
+REGISTER_SITE = re.compile(rb"REGISTER_CMD\(\s*(\w+)\s*,\s*Common::Enums::PlayerGrade::(\w+)\)")
+
+PLAYER_GRADE_ENUM = re.compile(r'enum\s+PlayerGrade\s*{([^}]+)}')
+PLAYER_GRADE_VALUE = re.compile(r'(\w+)\s*=\s*\d+')
+
+# Below this much header text, starting pool workers costs more than it saves.
+PARALLEL_MIN_BYTES = 1 << 20
+
+
+def index_header(path):
+    """Returns {'path', 'size', 'mtime_ns', 'classes', 'registrations'} for one header.
+
+    classes maps a class name to {'span': [start, end], 'description'} (first declaration
+    wins); registrations lists {'name', 'permission', 'span'} in file order. Offsets are
+    byte offsets into the file.
+    """
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    classes = {}
+    registrations = []
+    # One entry per open brace: the class it opens, or None.
+    braces = []
+    pending_class = None
+    last_class = None
+    for match in TOKEN.finditer(content):
+        kind = match.lastgroup
+        if kind == 'open':
+            braces.append(pending_class)
+            pending_class = None
+        elif kind == 'close':
+            if braces:
+                opened = braces.pop()
+                if opened is not None and opened['span'][1] is None:
+                    opened['span'][1] = match.end()
+        elif kind == 'class':
+            name = match.group('class_name').decode('utf-8')
+            pending_class = {'span': [match.start(), None], 'description': None}
+            classes.setdefault(name, pending_class)
+            last_class = pending_class
+        elif kind == 'icommand':
+            owner = next((opened for opened in reversed(braces) if opened is not None), last_class)
+            if owner is not None and owner['description'] is None:
+                owner['description'] = match.group('description').decode('utf-8', errors='replace')
+        elif kind == 'register':
+            registrations.append({
+                'name': match.group('command').decode('utf-8'),
+                'permission': match.group('permission').decode('utf-8'),
+                'span': [match.start(), match.end()],
+            })
+    return {'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'classes': classes, 'registrations': registrations}
+
+def index_headers(paths, max_workers=None, parallel_min_bytes=PARALLEL_MIN_BYTES):
+    """Indexes every header in `paths`, in order, on a process pool when there is enough text to pay for one."""
+    paths = list(paths)
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    if len(paths) < 2 or total < parallel_min_bytes or (os.cpu_count() or 1) < 2:
+        return [index_header(path) for path in paths]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(index_header, paths, chunksize=max(1, len(paths) // 32)))
+
+def build_command_table(indexes):
+    """{command: {'file', 'permission', 'description', 'original_permission', 'offset'}}, as the editor uses it.
+
+    A registration is listed only if its class and that class's ICommand description are
+    in the same header, like the editor has always done.
+    """
+    commands = {}
+    for index in indexes:
+        for registration in index['registrations']:
+            owner = index['classes'].get(registration['name'])
+            if owner is None or owner['description'] is None or owner['span'][0] > registration['span'][0]:
+                continue
+            commands[registration['name']] = {
+                "file": index['path'],
+                "permission": registration['permission'],
+                "description": owner['description'],
+                "original_permission": registration['permission'],
+                "offset": registration['span'][0],
+            }
+    return commands
+
+def apply_permission_changes(path, changes):
+    """Rewrites the REGISTER_CMD grades of one header in a single pass and returns the commands it couldn't find.
+
+    changes maps a command name to (offset, old_permission, new_permission). The stored
+    offset is checked first; if the header moved since it was indexed, the site is looked
+    up by name instead. The file is replaced atomically through a temporary file.
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    sites = None
+    edits = []
+    missing = []
+    for name, (offset, old_permission, new_permission) in changes.items():
+        match = REGISTER_SITE.match(content, offset) if offset is not None else None
+        if match is None or match.group(1).decode('utf-8') != name:
+            if sites is None:
+                sites = {site.group(1).decode('utf-8'): site for site in REGISTER_SITE.finditer(content)}
+            match = sites.get(name)
+        if match is None or match.group(2).decode('utf-8') != old_permission:
+            missing.append(name)
+            continue
+        edits.append((match.start(2), match.end(2), new_permission.encode('utf-8')))
+
+    if edits:
+        parts = []
+        position = 0
+        for start, end, replacement in sorted(edits):
+            parts += [content[position:start], replacement]
+            position = end
+        parts.append(content[position:])
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(b"".join(parts))
+        os.replace(temp_path, path)
+    return missing
+
+def parse_player_grades(path):
+    """Returns the PlayerGrade enumerator names from PlayerEnums.h; raises ValueError if there are none."""
+    with open(path, 'r') as f:
+        content = f.read()
+    enum_content_match = PLAYER_GRADE_ENUM.search(content)
+    if not enum_content_match:
+        raise ValueError("PlayerGrade enum not found")
+    grades = PLAYER_GRADE_VALUE.findall(enum_content_match.group(1))
+    if not grades:
+        raise ValueError("No grades found in PlayerGrade enum")
+    return grades
+
+
+class CommandIndexCache:
+    """On-disk cache of header indexes and player grades, keyed by path, size and mtime.
+
+    The cache file is plain JSON: {'version', 'headers': {path: index}, 'grades': {path: entry}}.
+    It is only written when something was re-parsed or dropped, through a temporary file so
+    an interrupted save never leaves a truncated cache behind.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.headers = {}
+        self.grades = {}
+        self.dirty = False
+        self.last_scan = (0, 0, 0)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.headers = data.get('headers', {})
+                self.grades = data.get('grades', {})
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def load_directory(self, directory):
+        """Returns the indexes of directory/*.h in path order, parsing only new or changed headers."""
+        current = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".h") and entry.is_file():
+                    # DirEntry.stat() is served from the directory listing on Windows.
+                    stat = entry.stat()
+                    current[entry.path] = (stat.st_size, stat.st_mtime_ns)
+
+        changed = [path for path, (size, mtime_ns) in current.items()
+                   if (self.headers.get(path) or {}).get('size') != size
+                   or self.headers[path].get('mtime_ns') != mtime_ns]
+        for index in index_headers(sorted(changed)):
+            self.headers[index['path']] = index
+
+        directory = os.path.normcase(os.path.abspath(directory))
+        dropped = [path for path in self.headers
+                   if path not in current and os.path.normcase(os.path.dirname(os.path.abspath(path))) == directory]
+        for path in dropped:
+            del self.headers[path]
+
+        if changed or dropped:
+            self.dirty = True
+        self.last_scan = (len(current) - len(changed), len(changed), len(dropped))
+        return [self.headers[path] for path in sorted(current)]
+
+    def load_grades(self, path):
+        stat = os.stat(path)
+        entry = self.grades.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return list(entry['grades'])
+        grades = parse_player_grades(path)
+        self.grades[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'grades': grades}
+        self.dirty = True
+        return list(grades)
+
+    def save(self):
+        if not self.dirty:
+            return
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'headers': self.headers, 'grades': self.grades}, f)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+
+class CommandTableModel:
+    """Filter and sort index over the editor's command table ({name: command dict}).
+
+    Each row's lowercased search text (name, description and grade) is built once, rows are
+    bucketed by grade, and each column's sort order is computed on first use and kept until
+    that column changes, so filtering and re-sorting never touch the headers again.
+    """
+
+    COLUMNS = ("Command", "Description", "Permission")
+
+    def __init__(self, commands, grades=()):
+        self.commands = commands
+        self.grade_rank = {grade: rank for rank, grade in enumerate(grades)}
+        self.search_text = {}
+        self.by_grade = {}
+        self.orders = {}
+        for name, data in commands.items():
+            self.search_text[name] = self._search_text(name, data)
+            self.by_grade.setdefault(data['permission'], set()).add(name)
+
+    def _search_text(self, name, data):
+        return f"{name}\n{data['description']}\n{data['permission']}".lower()
+
+    def _sort_key(self, column):
+        if column == "Command":
+            return lambda name: name.lower()
+        if column == "Description":
+            return lambda name: (self.commands[name]['description'].lower(), name.lower())
+        # Grades sort in PlayerGrade order, unknown ones last.
+        return lambda name: (self.grade_rank.get(self.commands[name]['permission'], len(self.grade_rank)), name.lower())
+
+    def order(self, column):
+        if column not in self.orders:
+            self.orders[column] = sorted(self.commands, key=self._sort_key(column))
+        return self.orders[column]
+
+    def filter(self, query="", grade=None, sort="Command", descending=False):
+        """Returns the names matching the query (a substring of name, description or grade) and grade, in sort order."""
+        names = self.order(sort)
+        if descending:
+            names = names[::-1]
+        query = query.strip().lower()
+        if grade is not None:
+            allowed = self.by_grade.get(grade, set())
+            names = [name for name in names if name in allowed]
+        if query:
+            search_text = self.search_text
+            names = [name for name in names if query in search_text[name]]
+        return list(names)
+
+    def set_permission(self, names, grade):
+        """Sets the grade of several commands; returns the names whose grade actually changed."""
+        changed = []
+        for name in names:
+            data = self.commands[name]
+            if data['permission'] == grade:
+                continue
+            self.by_grade[data['permission']].discard(name)
+            data['permission'] = grade
+            self.by_grade.setdefault(grade, set()).add(name)
+            self.search_text[name] = self._search_text(name, data)
+            changed.append(name)
+        if changed:
+            self.orders.pop("Permission", None)
+        return changed
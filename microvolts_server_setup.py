@@ -1,3 +1,15 @@
+import sys
+
+if __name__ == "__main__":
+    from multiprocessing import freeze_support
+    from microvolts_setup_worker import WORKER_HOST_FLAG, host_main
+    # Frozen builds re-launch the executable itself as the worker host and as command index
+    # pool workers; hand over before the GUI imports.
+    if WORKER_HOST_FLAG in sys.argv:
+        host_main()
+        sys.exit(0)
+    freeze_support()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, font
 import customtkinter
@@ -5,346 +17,50 @@ import requests
 import zipfile
 import os
 import subprocess
-from multiprocessing import Process, Queue
 import json
 import shutil
 from pathlib import Path
-import configparser
 import secrets
 import string
-import sys
 import time
 import re
 import queue
 from collections import deque
 import glob
 import threading
+import socket
+from array import array
+import http.server
+import gzip
+import bisect
+import concurrent.futures
+import functools
+import traceback
+import cProfile
+import pstats
+import tracemalloc
+import io
+import hashlib
+import fnmatch
+import csv
+import ipaddress
+import logging
+import logging.handlers
+
+from microvolts_command_index import CommandIndexCache, CommandTableModel, apply_permission_changes, build_command_table
+from microvolts_setup_worker import (
+    MARIADB_VERSION, WorkerHost, find_ccache, worker_download_repository, worker_install_ccache,
+    worker_install_llvm, worker_install_mariadb, worker_setup_database, worker_setup_vcpkg,
+)
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
 
 customtkinter.set_appearance_mode("Dark")
 customtkinter.set_default_color_theme("blue")
 
-def worker_log(q, message):
-    q.put({'type': 'log', 'message': message})
-
-def worker_ask_yes_no(q, title, prompt):
-    response_q = Queue()
-    q.put({'type': 'ask', 'method': 'askyesno', 'title': title, 'prompt': prompt, 'response_queue': response_q})
-    return response_q.get()
-
-def worker_show_error(q, title, message):
-    q.put({'type': 'showerror', 'title': title, 'message': message})
-
-def worker_show_info(q, title, message):
-    q.put({'type': 'showinfo', 'title': title, 'message': message})
-
-def worker_install_llvm(q, config):
-    try:
-        worker_log(q, "Checking for LLVM (clang-cl) installation...")
-        try:
-            result = subprocess.run(['clang-cl', '--version'], capture_output=True, text=True, check=False)
-            if result.returncode == 0:
-                worker_log(q, "LLVM (clang-cl) is already installed")
-                q.put({'type': 'result', 'success': True})
-                return
-        except FileNotFoundError:
-            pass
-        
-        worker_log(q, "LLVM (clang-cl) not found. Installing...")
-        
-        llvm_version = "18.1.8"
-        llvm_url = f"https://github.com/llvm/llvm-project/releases/download/llvmorg-{llvm_version}/LLVM-{llvm_version}-win64.exe"
-        
-        worker_log(q, f"Downloading LLVM {llvm_version}...")
-        response = requests.get(llvm_url, stream=True)
-        response.raise_for_status()
-        
-        installer_path = os.path.join(config['project_path'], f"LLVM-{llvm_version}-win64.exe")
-        
-        with open(installer_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        worker_log(q, "LLVM downloaded successfully. Installing...")
-        
-        result = subprocess.run([installer_path, '/S', '/D=C:\\Program Files\\LLVM'], capture_output=True, text=True, check=False)
-        
-        try:
-            os.remove(installer_path)
-        except OSError:
-            pass
-
-        worker_log(q, "LLVM installation complete.")
-        q.put({'type': 'result', 'success': True})
-
-    except Exception as e:
-        worker_log(q, f"LLVM installation failed: {e}")
-        if worker_ask_yes_no(q, "LLVM Installation Failed", "LLVM installation failed. Continue anyway?"):
-             q.put({'type': 'result', 'success': True})
-        else:
-             q.put({'type': 'result', 'success': False})
-
-def worker_download_repository(q, config):
-    try:
-        worker_log(q, "Cloning MicroVolts Emulator repository...")
-        repo_url = "https://github.com/SoWeBegin/MicrovoltsEmulator.git"
-        repo_path = os.path.join(config['project_path'], "MicrovoltsEmulator")
-        
-        if os.path.exists(repo_path):
-            worker_log(q, "Removing existing MicrovoltsEmulator directory...")
-            shutil.rmtree(repo_path)
-        
-        worker_log(q, "Cloning repository (this may take a few minutes)...")
-        result = subprocess.run([
-            "git", "clone", "-b", "mv1.1_2.0", repo_url, repo_path
-        ], capture_output=True, text=True, check=False)
-        
-        if result.returncode != 0:
-            raise Exception(f"Git clone failed: {result.stderr}")
-            
-        worker_log(q, "Repository cloned successfully")
-        q.put({'type': 'result', 'success': True})
-    except Exception as e:
-        worker_log(q, f"Failed to clone repository: {str(e)}")
-        q.put({'type': 'result', 'success': False})
-
-def worker_setup_vcpkg(q, config):
-    try:
-        worker_log(q, "Setting up vcpkg...")
-        repo_path = os.path.join(config['project_path'], "MicrovoltsEmulator")
-        ext_lib_path = os.path.join(repo_path, "ExternalLibraries")
-        os.makedirs(ext_lib_path, exist_ok=True)
-        
-        vcpkg_path = os.path.join(ext_lib_path, "vcpkg")
-        
-        if not os.path.exists(os.path.join(vcpkg_path, ".git")):
-            worker_log(q, "Cloning vcpkg repository...")
-            if os.path.exists(vcpkg_path):
-                shutil.rmtree(vcpkg_path)
-            
-            result = subprocess.run([
-                "git", "clone", "https://github.com/microsoft/vcpkg.git", vcpkg_path
-            ], capture_output=True, text=True, check=False)
-            
-            if result.returncode != 0:
-                raise Exception(f"Git clone failed: {result.stderr}")
-        else:
-            worker_log(q, "vcpkg repository already exists.")
-
-        worker_log(q, "Bootstrapping vcpkg...")
-        bootstrap_script = os.path.join(vcpkg_path, "bootstrap-vcpkg.bat")
-        result = subprocess.run([bootstrap_script], cwd=vcpkg_path, capture_output=True, text=True, check=False)
-        if result.returncode != 0:
-            worker_log(q, f"Bootstrap warning/error: {result.stderr or result.stdout}")
-
-        worker_log(q, "Integrating vcpkg with Visual Studio...")
-        vcpkg_exe = os.path.join(vcpkg_path, "vcpkg.exe")
-        result = subprocess.run([vcpkg_exe, "integrate", "install"], cwd=vcpkg_path, capture_output=True, text=True, check=False)
-        if result.returncode != 0:
-            worker_log(f"vcpkg integrate install failed: {result.stderr or result.stdout}")
-        else:
-            worker_log(q, "vcpkg integrated successfully.")
-
-        vcpkg_json_source = os.path.join(repo_path, "vcpkg.json")
-        vcpkg_json_dest = os.path.join(vcpkg_path, "vcpkg.json")
-        if os.path.exists(vcpkg_json_source):
-            worker_log(q, f"Moving vcpkg.json to {vcpkg_path}")
-            shutil.move(vcpkg_json_source, vcpkg_json_dest)
-        else:
-            worker_log(q, "Root vcpkg.json not found, skipping move. It might already be in place.")
-
-        worker_log(q, "Running vcpkg install...")
-        result = subprocess.run([vcpkg_exe, "install"], cwd=vcpkg_path, capture_output=True, text=True, check=False)
-        if result.returncode != 0:
-            raise Exception(f"vcpkg install failed: {result.stderr or result.stdout}")
-
-        worker_log(q, "vcpkg setup and package installation completed")
-        q.put({'type': 'result', 'success': True})
-    except Exception as e:
-        worker_log(q, f"Failed to setup vcpkg: {str(e)}")
-        q.put({'type': 'result', 'success': False})
-
-def worker_delete_service(q, service_name):
-    """Attempts to delete a Windows service."""
-    try:
-        worker_log(q, f"Attempting to delete service: {service_name}")
-        # Use sc.exe to delete the service. This is a standard Windows command.
-        # We don't check the return code here because it will fail if the service doesn't exist,
-        # which is a normal and expected outcome in many cases.
-        result = subprocess.run(['sc', 'delete', service_name], capture_output=True, text=True, check=False)
-        if result.returncode == 0:
-            worker_log(q, f"Service '{service_name}' deleted successfully.")
-        else:
-            # It's not necessarily an error if the service doesn't exist.
-            # We can check the output to be more specific.
-            if "The specified service does not exist" in result.stderr:
-                worker_log(q, f"Service '{service_name}' did not exist, no action needed.")
-            else:
-                worker_log(q, f"Warning: 'sc delete {service_name}' failed with code {result.returncode}: {result.stderr.strip()}")
-        return True
-    except Exception as e:
-        worker_log(q, f"An error occurred while trying to delete service '{service_name}': {e}")
-        # We don't want to fail the whole installation for this, so we return True.
-        # The installer will likely fail with a more specific error if this was the root cause.
-        return True
-def worker_install_mariadb(q, config):
-    try:
-        if config['existing_mariadb']:
-            worker_log(q, "Skipping MariaDB installation as per user's choice.")
-            q.put({'type': 'result', 'success': True})
-            return
-
-        # Attempt to delete a lingering service from a previous failed install
-        worker_delete_service(q, "MariaDB")
-
-        worker_log(q, "Installing MariaDB...")
-        mariadb_version = "11.5.1"
-        installer_name = f"mariadb-{mariadb_version}-winx64.msi"
-        
-        try:
-            script_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
-        except NameError:
-            script_dir = os.getcwd()
-
-        installer_path = os.path.join(script_dir, installer_name)
-
-        if not os.path.exists(installer_path):
-            worker_log(q, f"MariaDB installer not found at '{installer_path}'. Attempting to download...")
-            mariadb_url = f"https://archive.mariadb.org/mariadb-{mariadb_version}/winx64-packages/{installer_name}"
-            
-            try:
-                response = requests.get(mariadb_url, stream=True)
-                response.raise_for_status()
-
-                with open(installer_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                worker_log(q, "MariaDB installer downloaded successfully.")
-            except requests.exceptions.RequestException as e:
-                error_msg = f"Could not download MariaDB installer: {e}. Please place '{installer_name}' in the same directory as the setup script and try again."
-                worker_log(q, error_msg)
-                worker_show_error(q, "Download Failed", error_msg)
-                q.put({'type': 'result', 'success': False})
-                return
-        else:
-            worker_log(q, f"Found existing MariaDB installer: {installer_path}")
-        
-        worker_log(q, "Starting MariaDB installation (this may take a few minutes)...")
-        
-        log_file_path = os.path.join(config['project_path'], "mariadb_install_log.txt")
-        worker_log(q, f"MariaDB installation log will be saved to: {log_file_path}")
-
-        install_cmd = [
-            'msiexec', '/i', installer_path, '/qn',
-            f'/L*v', log_file_path,
-            f'PASSWORD={config["db_password"]}',
-            'ADDLOCAL=ALL',
-            'SERVICENAME=MariaDB',
-            'PORT=3306',
-            'CLEANUPDATA=1'
-        ]
-        result = subprocess.run(install_cmd, capture_output=True, text=True, check=False)
-
-        if result.returncode not in [0, 3010]:
-            log_contents = ""
-            try:
-                with open(log_file_path, 'r', encoding='utf-8', errors='ignore') as log_file:
-                    log_contents = log_file.read()
-            except Exception as e:
-                worker_log(q, f"Could not read MariaDB install log: {e}")
-
-            if "CreateService failed (1073)" in log_contents:
-                error_message = (
-                    "MariaDB installation failed because the service already exists.\n\n"
-                    "The setup tried to remove the old service automatically but failed, "
-                    "likely due to insufficient permissions.\n\n"
-                    "Please run this setup tool as an Administrator."
-                )
-                worker_log(q, "Detected 'CreateService failed (1073)' error. Instructing user to run as admin.")
-            elif "data directory exist and not empty" in log_contents:
-                error_message = (
-                    "MariaDB installation failed because the data directory is not empty.\n\n"
-                    "Please manually delete the following directory and then try again:\n"
-                    "C:\\Program Files\\MariaDB 11.5\\data"
-                )
-                worker_log(q, "Detected 'data directory not empty' error. Instructing user to manually delete.")
-            else:
-                error_message = f"MariaDB installation failed with exit code {result.returncode}.\n\nPlease check the log file for details:\n{log_file_path}"
-                worker_log(q, error_message)
-                if log_contents:
-                     worker_log(q, f"--- MariaDB Install Log (last 2000 chars) ---\n{log_contents[-2000:]}")
-
-            worker_show_error(q, "MariaDB Installation Failed", error_message)
-            q.put({'type': 'result', 'success': False})
-            return
-
-        worker_log(q, "MariaDB installed successfully.")
-        q.put({'type': 'result', 'success': True})
-    except Exception as e:
-        worker_log(q, f"An unexpected error occurred during MariaDB installation: {e}")
-        q.put({'type': 'result', 'success': False})
-
-def worker_setup_database(q, config):
-    try:
-        worker_log(q, "Setting up database...")
-        repo_path = os.path.join(config['project_path'], "MicrovoltsEmulator")
-        sql_script_path = os.path.join(repo_path, "microvolts-db.sql")
-
-        if not os.path.exists(sql_script_path):
-            raise Exception("Database script not found")
-
-        mysql_exe = ""
-        custom_path = config.get("mariadb_path")
-
-        if custom_path:
-            path_to_check = os.path.join(custom_path, "bin", "mysql.exe")
-            if os.path.exists(path_to_check):
-                mysql_exe = path_to_check
-                worker_log(q, f"Using custom MariaDB path: {mysql_exe}")
-
-        if not mysql_exe:
-            worker_log(q, "Custom MariaDB path not provided or invalid. Searching default locations...")
-            for version in ["11.5", "11.4", "11.3", "11.2", "11.1", "11.0", "10.11", "10.6", "10.5"]:
-                path = f"C:\\Program Files\\MariaDB {version}\\bin\\mysql.exe"
-                if os.path.exists(path):
-                    mysql_exe = path
-                    worker_log(q, f"Found MariaDB at: {mysql_exe}")
-                    break
-        
-        if not mysql_exe:
-            raise Exception("Could not find mysql.exe. Please specify the path in the DB Config tab if you have an existing installation.")
-
-        # Create the database first
-        worker_log(q, f"Ensuring database '{config['db_name']}' exists...")
-        create_db_cmd = [
-            mysql_exe, "-u", config['db_username'], f"-p{config['db_password']}",
-            "-h", config['db_ip'], f"-P", str(config['db_port']),
-            "-e", f"CREATE DATABASE IF NOT EXISTS `{config['db_name']}`;"
-        ]
-        result = subprocess.run(create_db_cmd, capture_output=True, text=True, check=False)
-        if result.returncode != 0:
-            raise Exception(f"Failed to create database: {result.stderr}")
-        worker_log(q, f"Database '{config['db_name']}' created or already exists.")
-
-        # Now import the script
-        with open(sql_script_path, 'r') as f:
-            sql_script_content = f.read()
-
-        import_cmd = [
-            mysql_exe, "-u", config['db_username'], f"-p{config['db_password']}",
-            "-h", config['db_ip'], f"-P", str(config['db_port']),
-            "-D", config['db_name']
-        ]
-        result = subprocess.run(import_cmd, input=sql_script_content, capture_output=True, text=True, check=False)
-
-        if result.returncode != 0:
-            raise Exception(f"Database script execution failed: {result.stderr}")
-
-        worker_log(q, "Database setup complete.")
-        q.put({'type': 'result', 'success': True})
-    except Exception as e:
-        worker_log(q, f"Failed to set up database: {e}")
-        q.put({'type': 'result', 'success': False})
-
 class MicroVoltsServerSetup(customtkinter.CTk):
     def __init__(self):
         super().__init__()
@@ -352,11 +68,24 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         self.geometry("1100x850")
         self.resizable(True, True)
 
+        self.ui_notifier = UiNotifier(self, self.on_ui_wake)
+        self.gui_messages = deque()
+        self.gui_tasks = deque()
+        self.log_widget_lines = 5000
+        self.log_buffer = deque(maxlen=self.log_widget_lines)
+        self.setup_log_queue = queue.SimpleQueue()
+        self.setup_log_listener = None
+        self.setup_logger = logging.getLogger("mv_setup")
+        self.setup_logger.setLevel(logging.INFO)
+        self.setup_logger.propagate = False
+        self.setup_logger.addHandler(logging.handlers.QueueHandler(self.setup_log_queue))
+
         self.title_font = customtkinter.CTkFont(family="Segoe UI", size=20, weight="bold")
         self.header_font = customtkinter.CTkFont(family="Segoe UI", size=13, weight="bold")
 
         self.project_path = tk.StringVar()
         self.local_ip = tk.StringVar()
+        self.primary_ports = {field: tk.StringVar(value=port) for field, port in ServerListModel.PRIMARY_PORTS.items()}
         
         self.db_ip = tk.StringVar(value="127.0.0.1")
         self.db_port = tk.StringVar(value="3306")
@@ -370,17 +99,64 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         self.mariadb_path = tk.StringVar()
 
         self.state_file = "setup_state.json"
-        self.setup_state = {}
-
-        self.servers = []
-        self.server_widgets = []
-        self.server_manager = ServerProcessManager(self.log)
+        self.setup_state = {'version': 2, 'steps': {}, 'file_hashes': {}}
+        self.steps_to_run = set()
+        self.step_config = None
+        self.timings_file = "step_timings.json"
+        self.command_index_cache = CommandIndexCache("command_index_cache.json")
+
+        self.server_model = ServerListModel()
+        self.console_rules_config = {}
+        self.line_classifiers = LineClassifier.for_servers({})
+        self.server_manager = ServerProcessManager(self.log, line_classifier=self.classify_line)
+        self.resource_sampler = ResourceSampler(self.server_manager)
+        self._resource_generation = None
+        self._status_version = None
+
+        self.metrics_enabled = tk.BooleanVar(value=False)
+        self.metrics_port = tk.StringVar(value="9464")
+        self.metrics_exporter = None
+        self.metrics_snapshot = ()
+        self.log_archive = None
+        self.log_history_window = None
+        self._metrics_published_at = 0.0
+        self._line_count_history = deque()
+        self.step_durations = {}
+        self.step_started_at = None
+        self.last_build = None
+        self.build_counts = {'success': 0, 'failure': 0}
         self.console_server_selection = tk.StringVar()
         self.server_status_vars = {}
+        self.log_archive_config = {}
+        self.setup_log_config = {}
+        self.supervision_config = {}
+        self.port_allocation_config = {}
+        self.rollout_config = {}
+        self.artifact_cache_config = {}
+        self.compiler_cache_config = {}
+        self.compiler_cache_enabled = tk.BooleanVar(value=False)
+        self.last_compiler_cache_stats = None
+        self._port_check_after = None
+        self._port_check_token = None
+        self._bound_ports = set()
+        self._conflict_rows = set()
+        self.auto_restart_servers = tk.BooleanVar(value=True)
+        self.probe_servers = tk.BooleanVar(value=True)
+        self.silence_timeout_minutes = tk.StringVar(value="30")
         
-        self.gui_queue = Queue()
+        self.worker_host = WorkerHost(self.post_gui_message)
+        self.current_job = None
+        self.step_token = None
+        self.tasks = TaskExecutor(self.schedule_gui_task, self.log)
+        self.loop_lag = LoopLagMonitor(self)
+        self.monitor_loop_lag = tk.BooleanVar(value=False)
+        self.profile_hot_paths = tk.BooleanVar(value=False)
+        self.hot_path_profiler = HotPathProfiler(
+            [(MicroVoltsServerSetup, name) for name in ("process_gui_queue", "update_all_consoles", "append_text_to_console", "recompile_project")]
+            + [(CommandEditorWindow, "load_commands")])
+        self._diagnostics_shown_at = 0.0
         self.command_editor_window = None
-        self.worker_process = None
+        self.awaiting_worker_result = False
         self.current_step = 0
         self.setup_steps = []
         
@@ -388,12 +164,23 @@ class MicroVoltsServerSetup(customtkinter.CTk):
 
         self.setup_gui()
         self.load_settings()
+        self.refresh_release_label()
 
         if not self.project_path.get():
             self.generate_random_password()
         
+        if self.metrics_enabled.get():
+            self.toggle_metrics_endpoint()
+        self.start_setup_log()
+        self.start_log_archive()
+
+        self.server_manager.notify = self.ui_notifier.notify
+        self.resource_sampler.notify = self.ui_notifier.notify
+
         self.center_window()
-        self.process_gui_queue()
+        self.ui_notifier.start()
+        if self.monitor_loop_lag.get():
+            self.loop_lag.start()
         
     def center_window(self):
         self.update_idletasks()
@@ -405,6 +192,7 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         directory = filedialog.askdirectory()
         if directory:
             self.project_path.set(directory)
+            self.refresh_release_label()
 
     def browse_mariadb_directory(self):
         directory = filedialog.askdirectory()
@@ -420,29 +208,40 @@ class MicroVoltsServerSetup(customtkinter.CTk):
                 
                 self.project_path.set(config.get("project_path", ""))
                 self.local_ip.set(config.get("local_ip", ""))
+                primary_ports = config.get("primary_ports", {})
+                for field, var in self.primary_ports.items():
+                    var.set(str(primary_ports.get(field, ServerListModel.PRIMARY_PORTS[field])))
                 self.db_ip.set(config.get("db_ip", "127.0.0.1"))
                 self.db_port.set(config.get("db_port", "3306"))
                 self.db_username.set(config.get("db_username", "root"))
                 self.db_password.set(config.get("db_password", ""))
                 self.db_name.set(config.get("db_name", "microvolts-db"))
                 self.mariadb_path.set(config.get("mariadb_path", ""))
+                self.supervision_config = config.get("supervision", {})
+                self.port_allocation_config = config.get("port_allocation", {})
+                self.rollout_config = config.get("rollout", {})
+                self.artifact_cache_config = config.get("artifact_cache", {})
+                self.compiler_cache_config = config.get("compiler_cache", {})
+                self.compiler_cache_enabled.set(self.compiler_cache_config.get("enabled", False))
+                supervision_default = self.supervision_config.get("default", {})
+                self.auto_restart_servers.set(supervision_default.get("auto_restart", True))
+                self.probe_servers.set(supervision_default.get("probe_enabled", True))
+                silence_timeout = supervision_default.get("silence_timeout", SupervisionPolicy.DEFAULTS["silence_timeout"])
+                self.silence_timeout_minutes.set(f"{silence_timeout / 60:g}" if silence_timeout else "")
+                self.metrics_enabled.set(config.get("metrics_enabled", False))
+                self.monitor_loop_lag.set(config.get("monitor_loop_lag", False))
+                self.metrics_port.set(str(config.get("metrics_port", 9464)))
+                self.log_archive_config = config.get("log_archive", {})
+                self.setup_log_config = config.get("setup_log", {})
+                self.console_rules_config = config.get("console_rules", {})
+                try:
+                    self.line_classifiers = LineClassifier.for_servers(self.console_rules_config)
+                except (re.error, ValueError, TypeError, AttributeError) as e:
+                    self.log(f"Invalid console_rules in settings, using built-in rules: {e}")
+                    self.line_classifiers = LineClassifier.for_servers({})
                 
-                for widgets in self.server_widgets:
-                    widgets["frame"].destroy()
-                self.server_widgets.clear()
-
-                self.servers = config.get("servers", [])
-                for server_data in self.servers:
-                    self.add_server_row()
-                    widgets = self.server_widgets[-1]
-                    widgets["main_local_ip"].set(server_data.get("main_local_ip", ""))
-                    widgets["main_public_ip"].set(server_data.get("main_public_ip", ""))
-                    widgets["main_port"].set(server_data.get("main_port", ""))
-                    widgets["main_ipc_port"].set(server_data.get("main_ipc_port", ""))
-                    widgets["cast_local_ip"].set(server_data.get("cast_local_ip", ""))
-                    widgets["cast_public_ip"].set(server_data.get("cast_public_ip", ""))
-                    widgets["cast_port"].set(server_data.get("cast_port", ""))
-                    widgets["cast_ipc_port"].set(server_data.get("cast_ipc_port", ""))
+                self.server_model.replace(config.get("servers", []))
+                self.refresh_server_table()
 
                 self.log("Settings loaded successfully.")
             except Exception as e:
@@ -454,30 +253,29 @@ class MicroVoltsServerSetup(customtkinter.CTk):
     def save_settings(self):
         self.log(f"Saving settings to {self.config_file}")
         try:
-            servers_data = []
-            for widgets in self.server_widgets:
-                server_data = {
-                    "main_local_ip": widgets["main_local_ip"].get(),
-                    "main_public_ip": widgets["main_public_ip"].get(),
-                    "main_port": widgets["main_port"].get(),
-                    "main_ipc_port": widgets["main_ipc_port"].get(),
-                    "cast_local_ip": widgets["cast_local_ip"].get(),
-                    "cast_public_ip": widgets["cast_public_ip"].get(),
-                    "cast_port": widgets["cast_port"].get(),
-                    "cast_ipc_port": widgets["cast_ipc_port"].get(),
-                }
-                servers_data.append(server_data)
-
+            self.compiler_cache_config["enabled"] = self.compiler_cache_enabled.get()
             config = {
                 "project_path": self.project_path.get(),
                 "local_ip": self.local_ip.get(),
+                "primary_ports": {field: var.get() for field, var in self.primary_ports.items()},
                 "db_ip": self.db_ip.get(),
                 "db_port": self.db_port.get(),
                 "db_username": self.db_username.get(),
                 "db_password": self.db_password.get(),
                 "db_name": self.db_name.get(),
                 "mariadb_path": self.mariadb_path.get(),
-                "servers": servers_data
+                "servers": self.server_model.to_list(),
+                "supervision": self.supervision_config,
+                "metrics_enabled": self.metrics_enabled.get(),
+                "metrics_port": self.metrics_port.get(),
+                "monitor_loop_lag": self.monitor_loop_lag.get(),
+                "log_archive": self.log_archive_config,
+                "setup_log": self.setup_log_config,
+                "console_rules": self.console_rules_config,
+                "port_allocation": self.port_allocation_config,
+                "rollout": self.rollout_config,
+                "artifact_cache": self.artifact_cache_config,
+                "compiler_cache": self.compiler_cache_config
             }
             with open(self.config_file, 'w') as f:
                 json.dump(config, f, indent=4)
@@ -532,6 +330,9 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         
         self.stop_button = customtkinter.CTkButton(button_frame, text="Stop Setup", command=self.stop_setup, state=tk.DISABLED, fg_color="#D32F2F", hover_color="#B71C1C")
         self.stop_button.pack(side="left", padx=5)
+
+        self.plan_button = customtkinter.CTkButton(button_frame, text="Plan (Dry Run)", command=self.show_setup_plan, fg_color="transparent", border_width=1)
+        self.plan_button.pack(side="left", padx=5)
         
         customtkinter.CTkButton(button_frame, text="Exit", command=self.on_closing, fg_color="transparent", border_width=1).pack(side="right", padx=5)
 
@@ -544,6 +345,15 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         customtkinter.CTkEntry(ip_frame, textvariable=self.local_ip).grid(row=0, column=1, sticky="ew", pady=2, padx=5)
         customtkinter.CTkButton(ip_frame, text="Auto-detect", command=self.auto_detect_ip, width=120).grid(row=0, column=2, padx=10, pady=2)
 
+        # Server 1's ports; extra servers are on the Multi-Server tab.
+        ports_frame = customtkinter.CTkFrame(tab)
+        ports_frame.grid(row=1, column=0, columnspan=2, sticky="ew", padx=10, pady=(0, 10))
+        ports_frame.grid_columnconfigure((1, 3), weight=1)
+        for position, (field, heading) in enumerate(ServerListModel.PRIMARY_HEADINGS.items()):
+            row, column = divmod(position, 2)
+            customtkinter.CTkLabel(ports_frame, text=f"{heading}:").grid(row=row, column=column * 2, sticky=tk.W, pady=2, padx=10)
+            customtkinter.CTkEntry(ports_frame, textvariable=self.primary_ports[field]).grid(row=row, column=column * 2 + 1, sticky="ew", pady=2, padx=5)
+
     def setup_db_config_tab(self, tab):
         tab.grid_columnconfigure(0, weight=1)
         self.db_install_frame = customtkinter.CTkFrame(tab, fg_color="transparent")
@@ -587,14 +397,43 @@ class MicroVoltsServerSetup(customtkinter.CTk):
 
     def setup_multi_server_tab(self, tab):
         tab.grid_rowconfigure(0, weight=1)
-        self.server_list_frame = customtkinter.CTkScrollableFrame(tab)
-        self.server_list_frame.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
-        self.server_list_frame.grid_columnconfigure(0, weight=1)
-        
+        tab.grid_columnconfigure(0, weight=1)
+        configure_treeview_style(self)
+        tree_frame = customtkinter.CTkFrame(tab, fg_color="transparent")
+        tree_frame.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
+        tree_frame.grid_columnconfigure(0, weight=1)
+        tree_frame.grid_rowconfigure(0, weight=1)
+
+        # A Treeview only draws the rows in view, so hundreds of servers cost no widgets.
+        columns = ("server",) + ServerListModel.FIELDS
+        self.server_tree = ttk.Treeview(tree_frame, columns=columns, show="headings", selectmode="extended")
+        self.server_tree.heading("server", text="Server")
+        self.server_tree.column("server", width=70, stretch=False, anchor="center")
+        for field in ServerListModel.FIELDS:
+            self.server_tree.heading(field, text=ServerListModel.HEADINGS[field])
+            self.server_tree.column(field, width=80 if field in ServerListModel.PORT_FIELDS else 110, anchor="w")
+        self.server_tree.tag_configure('oddrow', background='#343638')
+        self.server_tree.tag_configure('evenrow', background='#2a2d2e')
+        self.server_tree.tag_configure('conflict', background='#6b2b2b')
+        scrollbar = customtkinter.CTkScrollbar(tree_frame, command=self.server_tree.yview)
+        self.server_tree.configure(yscrollcommand=scrollbar.set)
+        self.server_tree.grid(row=0, column=0, sticky="nsew")
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.server_tree.bind("<Double-1>", self.on_server_double_click)
+        self.server_tree.bind("<Delete>", lambda e: self.remove_selected_servers())
+        self.port_status_label = customtkinter.CTkLabel(tree_frame, text="", anchor="w", justify="left")
+        self.port_status_label.grid(row=1, column=0, columnspan=2, sticky="ew")
+
         button_frame_multi = customtkinter.CTkFrame(tab, fg_color="transparent")
-        button_frame_multi.grid(row=1, column=0, sticky="e", pady=(0,10), padx=10)
-        add_server_button = customtkinter.CTkButton(button_frame_multi, text="+ Add Server", command=self.add_server_row, width=120)
-        add_server_button.pack()
+        button_frame_multi.grid(row=1, column=0, sticky="ew", pady=(0,10), padx=10)
+        customtkinter.CTkLabel(button_frame_multi, text="Double-click a cell to edit it.", text_color="gray60").pack(side="left")
+        for text, command in (("Export...", self.export_servers), ("Import...", self.import_servers),
+                              ("Write Configs", self.write_configs_now), ("Auto-assign Ports", self.auto_assign_ports),
+                              ("Generate...", self.open_server_generator), ("Remove Selected", self.remove_selected_servers),
+                              ("+ Add Server", self.add_server)):
+            customtkinter.CTkButton(button_frame_multi, text=text, command=command, width=120).pack(side="right", padx=(5, 0))
+        for variable in (self.db_port, self.metrics_port, self.metrics_enabled, *self.primary_ports.values()):
+            variable.trace_add("write", lambda *args: self.schedule_port_check())
 
     def setup_progress_tab(self, tab):
         tab.grid_rowconfigure(0, weight=1)
@@ -606,16 +445,42 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         self.log_text.grid(row=0, column=0, sticky="nsew")
         self.progress_bar = customtkinter.CTkProgressBar(progress_frame, mode='indeterminate')
         self.progress_bar.grid(row=1, column=0, sticky="ew", pady=(10, 0))
+        self.progress_label = customtkinter.CTkLabel(progress_frame, text="", anchor="w")
+        self.progress_label.grid(row=2, column=0, sticky="ew")
 
     def setup_tools_tab(self, tab):
         tools_frame = customtkinter.CTkFrame(tab)
         tools_frame.grid(row=0, column=0, sticky="new", padx=10, pady=10)
         tools_frame.grid_columnconfigure(0, weight=1)
 
-        self.update_button = customtkinter.CTkButton(tools_frame, text="Check for Updates & Recompile", command=self.check_for_updates)
+        self.update_button = customtkinter.CTkButton(tools_frame, text="Check for Updates & Recompile", command=self.start_update_check)
         self.update_button.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+        release_frame = customtkinter.CTkFrame(tools_frame, fg_color="transparent")
+        release_frame.grid(row=1, column=0, padx=5, pady=5, sticky="ew")
+        self.release_label = customtkinter.CTkLabel(release_frame, text="", text_color="gray60", anchor="w")
+        self.release_label.pack(side="left")
+        self.rollback_button = customtkinter.CTkButton(release_frame, text="Roll Back to Previous Release", command=self.roll_back_release, width=200)
+        self.rollback_button.pack(side="right")
+        compiler_cache_frame = customtkinter.CTkFrame(tools_frame, fg_color="transparent")
+        compiler_cache_frame.grid(row=2, column=0, padx=5, pady=5, sticky="ew")
+        customtkinter.CTkCheckBox(compiler_cache_frame, text="Use compiler cache (ccache) for builds", variable=self.compiler_cache_enabled,
+                                  command=self.toggle_compiler_cache).pack(side="left")
+        self.compiler_cache_label = customtkinter.CTkLabel(compiler_cache_frame, text="", text_color="gray60", anchor="w")
+        self.compiler_cache_label.pack(side="left", padx=10)
         command_editor_button = customtkinter.CTkButton(tools_frame, text="Command Permissions Editor", command=self.open_command_editor)
-        command_editor_button.grid(row=1, column=0, padx=5, pady=5, sticky="ew")
+        command_editor_button.grid(row=3, column=0, padx=5, pady=5, sticky="ew")
+
+        metrics_frame = customtkinter.CTkFrame(tools_frame, fg_color="transparent")
+        metrics_frame.grid(row=4, column=0, padx=5, pady=5, sticky="ew")
+        customtkinter.CTkCheckBox(metrics_frame, text="Serve Prometheus metrics on 127.0.0.1 port:", variable=self.metrics_enabled, command=self.toggle_metrics_endpoint).pack(side="left")
+        customtkinter.CTkEntry(metrics_frame, textvariable=self.metrics_port, width=80).pack(side="left", padx=5)
+        self.loop_lag_label = customtkinter.CTkLabel(tools_frame, text="", text_color="gray60", anchor="w")
+        self.loop_lag_label.grid(row=5, column=0, padx=5, pady=(0, 5), sticky="ew")
+        diagnostics_frame = customtkinter.CTkFrame(tools_frame, fg_color="transparent")
+        diagnostics_frame.grid(row=6, column=0, padx=5, pady=5, sticky="ew")
+        customtkinter.CTkCheckBox(diagnostics_frame, text="Monitor UI loop lag", variable=self.monitor_loop_lag, command=self.toggle_loop_lag_monitor).pack(side="left")
+        customtkinter.CTkCheckBox(diagnostics_frame, text="Profile hot paths", variable=self.profile_hot_paths, command=self.toggle_hot_path_profiling).pack(side="left", padx=(10, 0))
+        customtkinter.CTkButton(diagnostics_frame, text="Save Stall Report", command=self.save_stall_report, width=140).pack(side="left", padx=10)
         
         cache_frame = customtkinter.CTkFrame(tab)
         cache_frame.grid(row=1, column=0, sticky="new", padx=10, pady=10)
@@ -625,6 +490,159 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         self.setup_running = False
         self.update_all_consoles()
 
+    def toggle_loop_lag_monitor(self):
+        # The monitor ticks every 100 ms, so it only runs while someone is diagnosing the UI.
+        if self.monitor_loop_lag.get():
+            self.loop_lag.start()
+        else:
+            self.loop_lag.stop()
+        self._diagnostics_shown_at = 0.0
+        self.update_loop_lag_display()
+        self.save_settings()
+
+    def toggle_hot_path_profiling(self):
+        if self.profile_hot_paths.get():
+            self.hot_path_profiler.start()
+            self.log("Hot path profiling started. Untick the box to save the report.")
+            return
+        report = self.hot_path_profiler.stop()
+        if report:
+            self.tasks.submit(self.write_diagnostics_report, "hot-path-profile", report + "\n\n" + self.loop_lag.report(),
+                              on_done=lambda path: self.log(f"Hot path profile saved to {path}"))
+
+    def save_stall_report(self):
+        self.tasks.submit(self.write_diagnostics_report, "stall-report", self.loop_lag.report(),
+                          on_done=lambda path: self.log(f"Stall report saved to {path}"))
+
+    def write_diagnostics_report(self, kind, text):
+        os.makedirs("diagnostics", exist_ok=True)
+        path = os.path.abspath(os.path.join("diagnostics", f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}.txt"))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def toggle_metrics_endpoint(self):
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+            self.metrics_exporter = None
+            self.log("Metrics endpoint stopped.")
+
+        if not self.metrics_enabled.get():
+            return
+
+        try:
+            port = int(self.metrics_port.get())
+            exporter = MetricsExporter(port=port)
+            exporter.add_source(lambda: self.server_manager.metrics_snapshot)
+            exporter.add_source(lambda: self.metrics_snapshot)
+            exporter.start()
+        except (ValueError, OSError) as e:
+            self.log(f"Could not start metrics endpoint: {e}")
+            self.metrics_enabled.set(False)
+            return
+        self.metrics_exporter = exporter
+        self.log(f"Serving metrics at http://127.0.0.1:{port}/metrics")
+
+    def start_setup_log(self):
+        settings = self.setup_log_config
+        try:
+            widget_lines = max(100, int(settings.get("widget_lines", 5000)))
+            if widget_lines != self.log_widget_lines:
+                self.log_widget_lines = widget_lines
+                self.log_buffer = deque(self.log_buffer, maxlen=widget_lines)
+            if not settings.get("enabled", True):
+                self.setup_logger.handlers.clear()
+                self.setup_log_queue = None
+                return
+            directory = settings.get("directory", "setup_logs")
+            os.makedirs(directory, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(directory, "setup.log"),
+                maxBytes=int(settings.get("max_file_mb", 8) * 1024 * 1024),
+                backupCount=int(settings.get("backup_count", 5)),
+                encoding="utf-8",
+            )
+        except (OSError, TypeError, ValueError) as e:
+            # Nothing will drain the queue, so stop feeding it.
+            self.setup_logger.handlers.clear()
+            self.setup_log_queue = None
+            self.log(f"Setup log file disabled: {e}")
+            return
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        # Messages logged before this point are already queued and get written first.
+        self.setup_log_listener = logging.handlers.QueueListener(self.setup_log_queue, handler)
+        self.setup_log_listener.start()
+
+    def start_log_archive(self):
+        settings = self.log_archive_config
+        if not settings.get("enabled", True):
+            return
+        try:
+            self.log_archive = ServerLogArchive(
+                directory=settings.get("directory", "server_logs"),
+                max_segment_bytes=int(settings.get("max_segment_mb", 16) * 1024 * 1024),
+                max_segment_age=settings.get("max_segment_age", 3600),
+                max_total_bytes=int(settings.get("max_total_mb", 1024) * 1024 * 1024),
+            )
+            self.log_archive.start()
+        except (OSError, TypeError, ValueError) as e:
+            self.log(f"Server log archive disabled: {e}")
+            self.log_archive = None
+        self.server_manager.archive = self.log_archive
+
+    def open_log_history(self):
+        if self.log_archive is None:
+            messagebox.showinfo("Log History", "The server log archive is disabled.")
+            return
+        server_names = sorted(set(self.server_manager.server_names) | {"AuthServer", "MainServer", "CastServer"})
+        if self.log_history_window is None or not self.log_history_window.winfo_exists():
+            self.log_history_window = LogHistoryWindow(self, self.log_archive, server_names)
+            selected = self.console_server_selection.get()
+            if selected:
+                self.log_history_window.server_var.set(selected)
+        else:
+            self.log_history_window.focus()
+
+    def publish_app_metrics(self):
+        """Rebuilds the GUI-side metrics snapshot (log levels, setup steps, builds) at most once per second."""
+        now = time.time()
+        if now - self._metrics_published_at < 1.0:
+            return
+        self._metrics_published_at = now
+
+        counts = {}
+        for server_name, index in list(self.server_manager.console_indexes.items()):
+            for level, total in list(index.level_totals.items()):
+                if total:
+                    counts[(server_name, level)] = total
+        history = self._line_count_history
+        history.append((now, counts))
+        while len(history) > 1 and now - history[0][0] > 60:
+            history.popleft()
+        oldest_at, oldest_counts = history[0]
+
+        samples = []
+        for (server_name, level), total in counts.items():
+            labels = {'server': server_name, 'level': level}
+            samples.append(("mv_server_log_lines_total", labels, total))
+            rate = (total - oldest_counts.get((server_name, level), 0)) / (now - oldest_at) if now > oldest_at else 0.0
+            samples.append(("mv_server_log_lines_per_second", labels, rate))
+        for step_name, (duration, success) in self.step_durations.items():
+            samples.append(("mv_setup_step_duration_seconds", {'step': step_name}, duration))
+            samples.append(("mv_setup_step_success", {'step': step_name}, 1 if success else 0))
+        if self.last_build:
+            samples.append(("mv_build_duration_seconds", {}, self.last_build['duration']))
+            samples.append(("mv_build_success", {}, 1 if self.last_build['success'] else 0))
+        for result, total in self.build_counts.items():
+            samples.append(("mv_builds_total", {'result': result}, total))
+        if self.last_compiler_cache_stats:
+            for result in ("hits", "misses", "uncacheable"):
+                samples.append(("mv_build_compiler_cache_results", {'result': result}, self.last_compiler_cache_stats[result]))
+        max_lag, slow_ticks = self.loop_lag.summary()
+        samples.append(("mv_ui_loop_lag_max_seconds", {}, max_lag))
+        samples.append(("mv_ui_loop_slow_ticks", {}, slow_ticks))
+        self.metrics_snapshot = tuple(samples)
+
     def setup_console_tab(self, console_tab):
         console_tab.grid_columnconfigure(0, weight=1)
         console_tab.grid_rowconfigure(1, weight=1)
@@ -638,6 +656,11 @@ class MicroVoltsServerSetup(customtkinter.CTk):
 
         customtkinter.CTkButton(action_frame, text="Start All Servers", command=self.start_all_servers).pack(side="left", padx=(0, 5))
         customtkinter.CTkButton(action_frame, text="Stop All Servers", command=self.stop_all_servers, fg_color="#D32F2F", hover_color="#B71C1C").pack(side="left")
+        customtkinter.CTkCheckBox(action_frame, text="Auto-restart", variable=self.auto_restart_servers).pack(side="left", padx=(10, 0))
+        customtkinter.CTkCheckBox(action_frame, text="Port check", variable=self.probe_servers).pack(side="left", padx=(10, 0))
+        customtkinter.CTkLabel(action_frame, text="Restart if silent (min):").pack(side="left", padx=(10, 5))
+        customtkinter.CTkEntry(action_frame, textvariable=self.silence_timeout_minutes, width=50).pack(side="left")
+        customtkinter.CTkButton(action_frame, text="Search History", command=self.open_log_history, width=120).pack(side="left", padx=(10, 0))
 
         status_frame = customtkinter.CTkFrame(controls_frame)
         status_frame.pack(side="right", padx=(10, 0))
@@ -646,7 +669,7 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         console_frame = customtkinter.CTkFrame(console_tab)
         console_frame.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=10, pady=(0,10))
         console_frame.grid_columnconfigure(0, weight=1)
-        console_frame.grid_rowconfigure(1, weight=1)
+        console_frame.grid_rowconfigure(2, weight=1)
 
         selector_frame = customtkinter.CTkFrame(console_frame, fg_color="transparent")
         selector_frame.grid(row=0, column=0, sticky="ew", pady=(0,5))
@@ -654,9 +677,31 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         customtkinter.CTkLabel(selector_frame, text="Show output for:").pack(side="left")
         self.console_server_selector = customtkinter.CTkComboBox(selector_frame, variable=self.console_server_selection, state="readonly", width=200, command=self.on_server_select)
         self.console_server_selector.pack(side="left", padx=5)
+        self.resource_label = customtkinter.CTkLabel(selector_frame, text="", text_color="gray60", font=("Consolas", 12))
+        self.resource_label.pack(side="left", padx=10)
 
         self.console_text = customtkinter.CTkTextbox(console_frame, state='disabled', font=("Consolas", 14))
-        self.console_text.grid(row=1, column=0, sticky="nsew")
+        self.console_text.grid(row=2, column=0, sticky="nsew")
+
+        filter_frame = customtkinter.CTkFrame(console_frame, fg_color="transparent")
+        filter_frame.grid(row=1, column=0, sticky="ew", pady=(0, 5))
+        self.console_level_filters = {}
+        for level in ConsoleIndex.LEVELS:
+            var = tk.BooleanVar(value=True)
+            text = "Other" if level == "DEFAULT" else level.title()
+            customtkinter.CTkCheckBox(filter_frame, text=text, variable=var, command=self.apply_console_level_filter, width=60).pack(side="left", padx=(0, 5))
+            self.console_level_filters[level] = var
+
+        self.console_search_var = tk.StringVar()
+        self.console_search_regex = tk.BooleanVar(value=False)
+        search_entry = customtkinter.CTkEntry(filter_frame, textvariable=self.console_search_var, placeholder_text="Search console", width=220)
+        search_entry.pack(side="left", padx=(10, 5))
+        search_entry.bind("<Return>", lambda e: self.search_console())
+        customtkinter.CTkCheckBox(filter_frame, text="Regex", variable=self.console_search_regex, width=60).pack(side="left", padx=(0, 5))
+        customtkinter.CTkButton(filter_frame, text="▲", width=30, command=lambda: self.jump_to_console_match(-1)).pack(side="left")
+        customtkinter.CTkButton(filter_frame, text="▼", width=30, command=lambda: self.jump_to_console_match(1)).pack(side="left", padx=(2, 5))
+        self.console_search_label = customtkinter.CTkLabel(filter_frame, text="", text_color="gray60")
+        self.console_search_label.pack(side="left", padx=5)
         
         self.console_text.tag_config("ERROR", foreground="#ff8787")
         self.console_text.tag_config("WARN", foreground="#ffd966")
@@ -664,6 +709,14 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         self.console_text.tag_config("SUCCESS", foreground="#78e08f")
         self.console_text.tag_config("DEBUG", foreground="#b2b2b2")
         self.console_text.tag_config("DEFAULT", foreground="#ffffff")
+        self.console_text.tag_config("MATCH", background="#44475a")
+        self.console_text.tag_config("CURRENT_MATCH", background="#6272a4")
+        self.console_text.tag_raise("MATCH")
+        self.console_text.tag_raise("CURRENT_MATCH")
+        self.console_seq_end = {}
+        self.console_widget_first_seq = 0
+        self.console_matches = []
+        self.console_match_index = -1
 
         self.console_outputs = {}
         self.max_console_lines = 1000
@@ -673,7 +726,8 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             messagebox.showerror("Error", "Please select an installation directory first.")
             return
 
-        base_path = os.path.join(self.project_path.get(), "MicrovoltsEmulator", "x64")
+        repo_path = os.path.join(self.project_path.get(), "MicrovoltsEmulator")
+        base_path = ReleaseStore(repo_path).current_dir() or os.path.join(repo_path, "x64")
         if not os.path.isdir(base_path):
             messagebox.showerror("Error", f"Server executable directory not found:\n{base_path}\n\nPlease build the project first.")
             return
@@ -684,10 +738,43 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             "CastServer": os.path.join(base_path, "CastServer.exe"),
         }
 
+        supervision_default = self.supervision_config.setdefault("default", {})
+        supervision_default["auto_restart"] = self.auto_restart_servers.get()
+        supervision_default["probe_enabled"] = self.probe_servers.get()
+        minutes = self.silence_timeout_minutes.get().strip()
+        try:
+            # Blank or 0 turns silence detection off.
+            supervision_default["silence_timeout"] = float(minutes) * 60 if minutes and float(minutes) > 0 else None
+        except ValueError:
+            self.log(f"Invalid silence timeout '{minutes}' minutes, keeping {supervision_default.get('silence_timeout')} seconds.")
+        # Each server is probed on its own IP and port from the Server Config tab.
+        ports = {"AuthServer": "auth_port", "MainServer": "main_port", "CastServer": "cast_port"}
+        probe_host = self.local_ip.get().strip() or "127.0.0.1"
+
         server_order = ["AuthServer", "CastServer", "MainServer"]
+        servers = []
         for name in server_order:
             if name in servers_to_start:
-                self.server_manager.start_server(name, servers_to_start[name])
+                port = self.primary_ports[ports[name]].get().strip()
+                port = int(port) if port.isdigit() else None
+                try:
+                    policy = SupervisionPolicy.from_config(self.supervision_config, name, probe_host=probe_host, probe_port=port)
+                except (TypeError, ValueError) as e:
+                    self.log(f"Invalid supervision settings for {name}, using defaults: {e}")
+                    policy = SupervisionPolicy(auto_restart=self.auto_restart_servers.get(), probe_host=probe_host,
+                                               probe_port=port if self.probe_servers.get() else None)
+                servers.append((name, servers_to_start[name], policy))
+        self.tasks.submit(self._start_servers, servers, on_done=self.on_servers_started)
+
+    def _start_servers(self, servers):
+        errors = [self.server_manager.start_server(name, exe_path, policy) for name, exe_path, policy in servers]
+        return [error for error in errors if error]
+
+    def on_servers_started(self, errors=None):
+        if errors:
+            messagebox.showerror("Server Error", "\n\n".join(errors))
+        if not self.resource_sampler.start():
+            self.log("Resource sampling unavailable on this platform. Install 'psutil' to enable CPU/memory graphs.")
 
         self.update_server_status()
         
@@ -698,8 +785,8 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             self.on_server_select(server_names[0])
 
     def stop_all_servers(self):
-        self.server_manager.stop_all_servers()
-        self.update_server_status()
+        # taskkill can take seconds per server; statuses refresh through status_version.
+        self.tasks.submit(self.server_manager.stop_all_servers)
 
     def update_server_status(self):
         if set(self.server_status_vars.keys()) != set(self.server_manager.server_names):
@@ -714,25 +801,80 @@ class MicroVoltsServerSetup(customtkinter.CTk):
                 indicator.pack(side="left")
                 label = customtkinter.CTkLabel(frame, text=server_name)
                 label.pack(side="left", padx=(0, 5))
-                self.server_status_vars[server_name] = {'indicator': indicator, 'label': label}
+                spark = customtkinter.CTkLabel(frame, text="", font=("Consolas", 11), text_color="gray60")
+                spark.pack(side="left", padx=(0, 5))
+                self.server_status_vars[server_name] = {'indicator': indicator, 'label': label, 'spark': spark}
+            self._resource_generation = None
 
+        status_colors = {"Running": "#57e893", "Restarting": "#ffd966", "Hung": "#ffd966", "Parked": "#b388ff"}
         for server_name, widgets in self.server_status_vars.items():
             status = self.server_manager.get_status(server_name)
-            color = "#57e893" if status == "Running" else "#ff6b6b"
+            color = status_colors.get(status, "#ff6b6b")
             widgets['indicator'].configure(text_color=color)
+            stats = self.server_manager.get_stats(server_name)
+            restarts = stats['restarts'] if stats else 0
+            widgets['label'].configure(text=f"{server_name} ({restarts}↻)" if restarts else server_name)
+
+    def update_resource_display(self):
+        for server_name, widgets in self.server_status_vars.items():
+            latest = self.resource_sampler.latest(server_name)
+            if latest is None or self.server_manager.get_status(server_name) != "Running":
+                widgets['spark'].configure(text="")
+                continue
+            sparkline = self.resource_sampler.sparkline(server_name, "cpu")
+            widgets['spark'].configure(text=f"{sparkline} {latest['cpu']:.0f}% {latest['rss'] / 1048576:.0f}MB")
+
+        selected = self.console_server_selection.get()
+        latest = self.resource_sampler.latest(selected) if selected else None
+        if latest is None:
+            self.resource_label.configure(text="")
+            return
+        cpu = self.resource_sampler.summary(selected, "cpu")
+        rss = self.resource_sampler.summary(selected, "rss")
+        parts = [f"{label} CPU {lo:.0f}/{avg:.0f}/{hi:.0f}% RSS {rss[label][1] / 1048576:.0f}MB"
+                 for label, (lo, avg, hi) in cpu.items() if label in rss]
+        parts.append(f"thr {latest['threads']:.0f} h {latest['handles']:.0f} "
+                     f"io {latest['io_read'] / 1024:.0f}/{latest['io_write'] / 1024:.0f}KB/s")
+        self.resource_label.configure(text=" | ".join(parts))
+
+    def process_supervisor_events(self):
+        try:
+            while True:
+                event = self.server_manager.events.get_nowait()
+                self.log(event['message'])
+                if event['type'] == 'alert':
+                    messagebox.showwarning("Server Crash Loop", event['message'])
+        except queue.Empty:
+            pass
 
     def update_all_consoles(self):
         """The main loop that orchestrates updates for all server consoles."""
+        self.process_supervisor_events()
+
         for server_name in self.server_manager.server_names:
             self.process_individual_server_output(server_name)
 
-        current_statuses = {name: self.server_manager.get_status(name) for name in self.server_manager.server_names}
-        if not hasattr(self, '_last_statuses') or self._last_statuses != current_statuses:
+        if self.server_manager.status_version != self._status_version:
+            self._status_version = self.server_manager.status_version
             self.update_server_status()
-            self._last_statuses = current_statuses
 
-        delay = 250 if self.server_manager.processes else 1000
-        self.after(delay, self.update_all_consoles)
+        if self.resource_sampler.generation != self._resource_generation:
+            self._resource_generation = self.resource_sampler.generation
+            self.update_resource_display()
+
+        self.publish_app_metrics()
+        self.update_loop_lag_display()
+
+    def update_loop_lag_display(self):
+        now = time.time()
+        if now - self._diagnostics_shown_at < 1.0:
+            return
+        self._diagnostics_shown_at = now
+        if not self.loop_lag.running:
+            self.loop_lag_label.configure(text="UI loop lag: not monitored (tick \"Monitor UI loop lag\" below)")
+            return
+        max_lag, slow_ticks = self.loop_lag.summary()
+        self.loop_lag_label.configure(text=f"UI loop lag (last 60s): max {max_lag * 1000:.0f} ms, {slow_ticks} samples over one frame")
 
     def process_individual_server_output(self, server_name):
         """Drains the output queue for a single server and updates the display if it's the selected one."""
@@ -741,9 +883,11 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             return
 
         lines_to_add = []
+        last_seq = None
         try:
             while not q.empty():
-                lines_to_add.append(q.get_nowait())
+                last_seq, line, level = q.get_nowait()
+                lines_to_add.append((line, level))
         except queue.Empty:
             pass
 
@@ -753,38 +897,95 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         if server_name not in self.console_outputs:
             self.console_outputs[server_name] = deque(maxlen=self.max_console_lines)
         self.console_outputs[server_name].extend(lines_to_add)
+        self.console_seq_end[server_name] = last_seq + 1
 
         if self.console_server_selection.get() == server_name:
             self.append_text_to_console(lines_to_add)
 
     def append_text_to_console(self, lines):
-        """Appends a list of lines to the console text widget."""
+        """Appends a list of (line, level) entries to the console text widget."""
         self.console_text.configure(state='normal')
-        for line in lines:
-            tag = self._get_line_tag(line)
-            self.console_text.insert(tk.END, line, tag)
+        for line, level in lines:
+            self.console_text.insert(tk.END, line, level)
         self.console_text.see(tk.END)
         self.console_text.configure(state='disabled')
 
-    def _get_line_tag(self, line):
-        line_upper = line.upper()
-        if "ERROR" in line_upper or "FAIL" in line_upper: return "ERROR"
-        if "WARN" in line_upper or "WARNING" in line_upper: return "WARN"
-        if "SUCCESS" in line_upper or "OK" in line_upper: return "SUCCESS"
-        if "INFO" in line_upper: return "INFO"
-        if "DEBUG" in line_upper: return "DEBUG"
-        return "DEFAULT"
+    def apply_console_level_filter(self):
+        # Hidden levels are elided in place rather than re-rendering the console.
+        for level, var in self.console_level_filters.items():
+            self.console_text.tag_config(level, elide=not var.get())
+
+    def search_console(self):
+        server_name = self.console_server_selection.get()
+        index = self.server_manager.console_indexes.get(server_name)
+        query = self.console_search_var.get()
+        levels = [level for level, var in self.console_level_filters.items() if var.get()]
+        regex = self.console_search_regex.get()
+        if index is None:
+            return
+        if regex:
+            try:
+                re.compile(query)
+            except re.error as e:
+                self.console_search_label.configure(text=f"Invalid regex: {e}")
+                return
+
+        def search():
+            started_at = time.perf_counter()
+            seqs = index.search(query, levels, regex=regex, limit=10000)
+            self.schedule_gui_task(self.show_console_matches, server_name, seqs, time.perf_counter() - started_at)
+
+        self.console_search_label.configure(text="Searching...")
+        self.tasks.submit(search)
+
+    def show_console_matches(self, server_name, seqs, elapsed):
+        if server_name != self.console_server_selection.get():
+            return
+        self.console_text.tag_remove("MATCH", 1.0, tk.END)
+        self.console_text.tag_remove("CURRENT_MATCH", 1.0, tk.END)
+
+        first_seq = self.console_widget_first_seq
+        end_seq = self.console_seq_end.get(server_name, first_seq)
+        self.console_matches = [seq - first_seq + 1 for seq in seqs if first_seq <= seq < end_seq]
+        for line_number in self.console_matches:
+            self.console_text.tag_add("MATCH", f"{line_number}.0", f"{line_number}.0 lineend")
+
+        older = sum(1 for seq in seqs if seq < first_seq)
+        summary = f"{len(self.console_matches)} matches ({elapsed * 1000:.0f} ms)"
+        if older:
+            summary += f", {older} older than the console view"
+        self.console_search_label.configure(text=summary)
+
+        self.console_match_index = len(self.console_matches)
+        self.jump_to_console_match(-1)
+
+    def jump_to_console_match(self, step):
+        if not self.console_matches:
+            return
+        self.console_match_index = (self.console_match_index + step) % len(self.console_matches)
+        line_number = self.console_matches[self.console_match_index]
+        self.console_text.tag_remove("CURRENT_MATCH", 1.0, tk.END)
+        self.console_text.tag_add("CURRENT_MATCH", f"{line_number}.0", f"{line_number}.0 lineend")
+        self.console_text.see(f"{line_number}.0")
+
+    def classify_line(self, server_name, line):
+        """Called once per line by the reader threads; the level travels with the line from then on."""
+        classifier = self.line_classifiers.get(server_name) or self.line_classifiers["default"]
+        return classifier.classify(line)
 
     def on_server_select(self, selected_server):
         self.console_text.configure(state='normal')
         self.console_text.delete(1.0, tk.END)
+        self.console_matches = []
+        self.console_match_index = -1
+        self.console_search_label.configure(text="")
         
         if selected_server in self.console_outputs:
             lines_to_insert = list(self.console_outputs[selected_server])
+            self.console_widget_first_seq = self.console_seq_end.get(selected_server, 0) - len(lines_to_insert)
             
-            for line in lines_to_insert:
-                tag = self._get_line_tag(line)
-                self.console_text.insert(tk.END, line, (tag,))
+            for line, level in lines_to_insert:
+                self.console_text.insert(tk.END, line, (level,))
             
             self.console_text.see(tk.END)
         
@@ -792,80 +993,206 @@ class MicroVoltsServerSetup(customtkinter.CTk):
 
     def on_closing(self):
         if messagebox.askokcancel("Quit", "Do you want to quit? This will stop all running servers."):
-            self.stop_all_servers()
+            self.server_manager.stop_all_servers()
+            self.server_manager.shutdown()
+            self.resource_sampler.stop()
+            self.ui_notifier.stop()
+            self.loop_lag.stop()
+            self.hot_path_profiler.stop()
+            self.tasks.shutdown()
+            self.worker_host.stop()
+            if self.metrics_exporter is not None:
+                self.metrics_exporter.stop()
+            if self.log_archive is not None:
+                self.log_archive.stop()
+            if self.setup_log_listener is not None:
+                self.setup_log_listener.stop()
             self.destroy()
 
     def open_database_editor(self):
         self.log("Database Editor functionality has been removed.")
         messagebox.showinfo("Feature Removed", "The standalone database editor has been removed to simplify the application.")
 
-    def add_server_row(self):
-        server_number = len(self.server_widgets) + 2
-        
-        row_frame = customtkinter.CTkFrame(self.server_list_frame, border_width=1)
-        row_frame.pack(fill="x", expand=True, padx=10, pady=5)
-        row_frame.grid_columnconfigure((1, 3), weight=1)
-
-        customtkinter.CTkLabel(row_frame, text=f"Server {server_number}", font=self.header_font).grid(row=0, column=0, columnspan=4, sticky="w", padx=10, pady=5)
-
-        customtkinter.CTkLabel(row_frame, text="MainServer Local IP:").grid(row=1, column=0, sticky=tk.W, pady=2, padx=10)
-        main_local_ip = tk.StringVar()
-        customtkinter.CTkEntry(row_frame, textvariable=main_local_ip).grid(row=1, column=1, sticky="ew", pady=2, padx=5)
-
-        customtkinter.CTkLabel(row_frame, text="MainServer Public IP:").grid(row=1, column=2, sticky=tk.W, pady=2, padx=10)
-        main_public_ip = tk.StringVar()
-        customtkinter.CTkEntry(row_frame, textvariable=main_public_ip).grid(row=1, column=3, sticky="ew", pady=2, padx=5)
-
-        customtkinter.CTkLabel(row_frame, text="MainServer Port:").grid(row=2, column=0, sticky=tk.W, pady=2, padx=10)
-        main_port = tk.StringVar()
-        customtkinter.CTkEntry(row_frame, textvariable=main_port).grid(row=2, column=1, sticky="ew", pady=2, padx=5)
-
-        customtkinter.CTkLabel(row_frame, text="MainServer IPC Port:").grid(row=2, column=2, sticky=tk.W, pady=2, padx=10)
-        main_ipc_port = tk.StringVar()
-        customtkinter.CTkEntry(row_frame, textvariable=main_ipc_port).grid(row=2, column=3, sticky="ew", pady=2, padx=5)
-
-        customtkinter.CTkLabel(row_frame, text="CastServer Local IP:").grid(row=3, column=0, sticky=tk.W, pady=2, padx=10)
-        cast_local_ip = tk.StringVar()
-        customtkinter.CTkEntry(row_frame, textvariable=cast_local_ip).grid(row=3, column=1, sticky="ew", pady=2, padx=5)
+    def refresh_server_table(self):
+        self.server_tree.delete(*self.server_tree.get_children(""))
+        for index, row in enumerate(self.server_model.rows):
+            # Server 1 is the one on the Server Config tab.
+            values = (f"Server {index + 2}",) + tuple(row[field] for field in ServerListModel.FIELDS)
+            self.server_tree.insert("", "end", iid=str(index), values=values, tags=('evenrow' if index % 2 == 0 else 'oddrow',))
+        self._conflict_rows = set()
+        self.schedule_port_check()
+
+    def add_server(self):
+        index = self.server_model.add()
+        self.refresh_server_table()
+        self.server_tree.see(str(index))
+        self.server_tree.selection_set(str(index))
+
+    def remove_selected_servers(self):
+        selected = [int(iid) for iid in self.server_tree.selection()]
+        if not selected:
+            return
+        self.server_model.remove(selected)
+        self.refresh_server_table()
+
+    def on_server_double_click(self, event):
+        if hasattr(self, '_server_editor') and self._server_editor.winfo_exists():
+            self._server_editor.destroy()
+        rowid = self.server_tree.identify_row(event.y)
+        column_id = self.server_tree.identify_column(event.x)
+        if not rowid or column_id in ("", "#1"):
+            return
+        field = ServerListModel.FIELDS[int(column_id[1:]) - 2]
+        x, y, width, height = self.server_tree.bbox(rowid, column_id)
 
-        customtkinter.CTkLabel(row_frame, text="CastServer Public IP:").grid(row=3, column=2, sticky=tk.W, pady=2, padx=10)
-        cast_public_ip = tk.StringVar()
-        customtkinter.CTkEntry(row_frame, textvariable=cast_public_ip).grid(row=3, column=3, sticky="ew", pady=2, padx=5)
+        editor = self._server_editor = customtkinter.CTkEntry(self.server_tree)
+        editor.insert(0, self.server_model.rows[int(rowid)][field])
+        editor.place(x=x, y=y, width=width, height=height)
+        editor.focus_force()
 
-        customtkinter.CTkLabel(row_frame, text="CastServer Port:").grid(row=4, column=0, sticky=tk.W, pady=2, padx=10)
-        cast_port = tk.StringVar()
-        customtkinter.CTkEntry(row_frame, textvariable=cast_port).grid(row=4, column=1, sticky="ew", pady=2, padx=5)
+        def commit(event=None):
+            if not editor.winfo_exists():
+                return
+            value = editor.get()
+            editor.destroy()
+            try:
+                self.server_model.set(int(rowid), field, value)
+            except ValueError as e:
+                messagebox.showerror("Invalid Value", str(e))
+                return
+            self.server_tree.set(rowid, field, self.server_model.rows[int(rowid)][field])
+            self.schedule_port_check()
+
+        editor.bind("<Return>", commit)
+        editor.bind("<FocusOut>", commit)
+        editor.bind("<Escape>", lambda e: editor.destroy())
+
+    def port_allocator(self):
+        # MariaDB, the metrics endpoint and Server 1 live on this host too.
+        extra = [self.db_port.get()]
+        if self.metrics_enabled.get():
+            extra.append(self.metrics_port.get())
+        primary_ports = {field: var.get().strip() for field, var in self.primary_ports.items()}
+        try:
+            return PortAllocator.from_config(self.port_allocation_config, [port for port in extra if str(port).isdigit()], primary_ports)
+        except (TypeError, ValueError) as e:
+            self.log(f"Invalid port_allocation settings, using defaults: {e}")
+            return PortAllocator.from_config({}, [port for port in extra if str(port).isdigit()], primary_ports)
+
+    def schedule_port_check(self, delay_ms=150):
+        """Re-checks the server ports shortly after the last change; rapid edits cost one check."""
+        if self._port_check_after is not None:
+            self.after_cancel(self._port_check_after)
+        self._port_check_after = self.after(delay_ms, self.run_port_check)
+
+    def run_port_check(self):
+        self._port_check_after = None
+        rows = self.server_model.to_list()
+        allocator = self.port_allocator()
+        self.show_port_problems(allocator.check(rows), probed=False)
+        token = self._port_check_token = object()
+        if any(self.server_manager.get_status(name) != "Stopped" for name in self.server_manager.server_names):
+            # Our own running servers hold their ports, so a probe would only report them.
+            self._bound_ports = set()
+            self.show_port_problems(allocator.check(rows), probed=None)
+            return
+        ports = sorted({int(row[field]) for row in rows for field in ServerListModel.PORT_FIELDS if row[field].isdigit()})
+        self.tasks.submit(probe_bound_ports, ports,
+                          on_done=lambda bound: self.finish_port_check(token, rows, allocator, bound))
 
-        customtkinter.CTkLabel(row_frame, text="CastServer IPC Port:").grid(row=4, column=2, sticky=tk.W, pady=2, padx=10)
-        cast_ipc_port = tk.StringVar()
-        customtkinter.CTkEntry(row_frame, textvariable=cast_ipc_port).grid(row=4, column=3, sticky="ew", pady=2, padx=5)
+    def finish_port_check(self, token, rows, allocator, bound):
+        if token is not self._port_check_token:
+            return
+        self._bound_ports = bound
+        self.show_port_problems(allocator.check(rows, bound), probed=True)
+
+    def show_port_problems(self, problems, probed):
+        rows = {index for index, _ in problems}
+        for index in rows ^ self._conflict_rows:
+            iid = str(index)
+            if self.server_tree.exists(iid):
+                tags = ('evenrow' if index % 2 == 0 else 'oddrow',) + (('conflict',) if index in rows else ())
+                self.server_tree.item(iid, tags=tags)
+        self._conflict_rows = rows
+
+        if probed is None:
+            host_note = " Host check skipped while servers are running."
+        elif probed:
+            host_note = ""
+        else:
+            host_note = " Checking the host..."
+        if not problems:
+            self.port_status_label.configure(text=f"No port conflicts among {len(self.server_model.rows)} server(s).{host_note}",
+                                             text_color="gray60")
+            return
+        details = [f"Server {index + 2} {ServerListModel.HEADINGS[field]}: {message}"
+                   for (index, field), message in sorted(problems.items())[:3]]
+        more = f" (+{len(problems) - 3} more)" if len(problems) > 3 else ""
+        self.port_status_label.configure(text=f"{len(problems)} port problem(s): " + "; ".join(details) + more + host_note,
+                                         text_color="#FF6B6B")
 
-        remove_button = customtkinter.CTkButton(row_frame, text="-", command=lambda: self.remove_server_row(row_frame), width=30, fg_color="#D32F2F", hover_color="#B71C1C")
-        remove_button.grid(row=0, column=4, padx=10)
+    def auto_assign_ports(self):
+        try:
+            changed = self.port_allocator().allocate(self.server_model.rows, self._bound_ports)
+        except ValueError as e:
+            messagebox.showerror("Auto-assign Ports", str(e))
+            return
+        self.refresh_server_table()
+        self.log(f"Assigned new ports to {len(changed)} server(s)." if changed else "All server ports are already valid.")
 
-        widgets = {
-            "frame": row_frame,
-            "main_local_ip": main_local_ip, "main_public_ip": main_public_ip,
-            "main_port": main_port, "main_ipc_port": main_ipc_port,
-            "cast_local_ip": cast_local_ip, "cast_public_ip": cast_public_ip,
-            "cast_port": cast_port, "cast_ipc_port": cast_ipc_port
-        }
-        self.server_widgets.append(widgets)
+    def import_servers(self):
+        path = filedialog.askopenfilename(title="Import Servers", filetypes=[("CSV or JSON", "*.csv *.json"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            rows = ServerListModel.read_file(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Import Failed", f"Could not import servers from {os.path.basename(path)}:\n{e}")
+            return
+        if self.server_model.rows and messagebox.askyesno("Import Servers", f"Replace the {len(self.server_model.rows)} existing server(s)? Choose No to append."):
+            self.server_model.replace(rows)
+        else:
+            for row in rows:
+                self.server_model.add(row)
+        self.refresh_server_table()
+        self.log(f"Imported {len(rows)} server(s) from {path}")
+
+    def export_servers(self):
+        path = filedialog.asksaveasfilename(title="Export Servers", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            self.server_model.export(path)
+        except OSError as e:
+            messagebox.showerror("Export Failed", f"Could not export servers:\n{e}")
+            return
+        self.log(f"Exported {len(self.server_model.rows)} server(s) to {path}")
+
+    def open_server_generator(self):
+        selected = self.server_tree.selection()
+        if selected:
+            template = self.server_model.rows[int(selected[0])]
+        elif self.server_model.rows:
+            template = self.server_model.rows[-1]
+        else:
+            local_ip = self.local_ip.get() or "127.0.0.1"
+            template = {"main_local_ip": local_ip, "main_public_ip": local_ip, "cast_local_ip": local_ip, "cast_public_ip": local_ip}
+        ServerTemplateDialog(self, template)
 
-    def remove_server_row(self, row_frame):
-        for i, widgets in enumerate(self.server_widgets):
-            if widgets["frame"] == row_frame:
-                self.server_widgets.pop(i)
-                break
-        row_frame.destroy()
-        
-        for i, widgets in enumerate(self.server_widgets):
-            label = widgets["frame"].winfo_children()[0]
-            label.configure(text=f"Server {i + 2}")
+    def generate_servers(self, count, template, increment_ip):
+        try:
+            new_rows = self.server_model.generate(count, template, increment_ip)
+        except ValueError as e:
+            messagebox.showerror("Generate Servers", str(e))
+            return False
+        self.refresh_server_table()
+        self.server_tree.see(str(len(self.server_model.rows) - 1))
+        self.log(f"Generated {len(new_rows)} server(s) from template.")
+        return True
 
     def auto_detect_ip(self):
         try:
-            import socket
             s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             s.settimeout(2)
             s.connect(("8.8.8.8", 80))
@@ -928,11 +1255,32 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         return password
             
     def log(self, message):
-        if hasattr(self, 'log_text') and self.log_text.winfo_exists():
-            self.log_text.insert(tk.END, f"{message}\n")
-            self.log_text.see(tk.END)
+        """Safe to call from any thread; the widget is updated in batches by flush_log()."""
+        message = str(message)
+        self.log_buffer.append(message)
+        if self.setup_log_queue is not None:
+            self.setup_logger.info(message)
+        self.ui_notifier.notify()
+
+    def flush_log(self):
+        if not self.log_buffer:
+            return
+        lines = []
+        try:
+            while True:
+                lines.append(self.log_buffer.popleft())
+        except IndexError:
+            pass
+        if not (hasattr(self, 'log_text') and self.log_text.winfo_exists()):
+            return
+        self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+        excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - self.log_widget_lines
+        if excess > 0:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
+        self.log_text.see(tk.END)
         
     def clear_log(self):
+        self.log_buffer.clear()
         if hasattr(self, 'log_text') and self.log_text.winfo_exists():
             self.log_text.delete(1.0, tk.END)
         
@@ -947,40 +1295,79 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         self.start_button.configure(state=tk.DISABLED)
         self.stop_button.configure(state=tk.NORMAL)
         self.progress_bar.start()
+        # Warm the worker host up while the in-process prerequisite steps run.
+        threading.Thread(target=self.worker_host.start, daemon=True).start()
         
         self.run_setup_sequentially()
         
     def stop_setup(self):
         self.setup_running = False
-        if self.worker_process and self.worker_process.is_alive():
-            self.worker_process.terminate()
+        if self.current_job is not None:
+            self.worker_host.cancel(self.current_job)
+            self.current_job = None
+            self.awaiting_worker_result = False
+        # An in-process step can't be interrupted; its result is ignored when it finishes.
+        self.step_token = None
         self.finalize_setup_ui()
-        self.log("Setup stopped by user")
+        self.log("Setup stopped by user. Partial downloads, clones and built packages are kept and reused on the next run.")
         
+    def on_ui_wake(self):
+        """Runs at most once per frame after a producer calls ui_notifier.notify(), plus on the idle heartbeat."""
+        self.run_gui_tasks()
+        self.process_gui_queue()
+        self.flush_log()
+        self.update_all_consoles()
+
+    def post_gui_message(self, message):
+        self.gui_messages.append(message)
+        self.ui_notifier.notify()
+
+    def run_gui_tasks(self):
+        while self.gui_tasks:
+            func, args = self.gui_tasks.popleft()
+            func(*args)
+
     def process_gui_queue(self):
         try:
             while True:
-                message = self.gui_queue.get_nowait()
+                message = self.gui_messages.popleft()
                 if message['type'] == 'log':
                     self.log(message['message'])
                 elif message['type'] == 'ask':
-                    response_queue = message['response_queue']
+                    if message['job'] != self.current_job:
+                        self.worker_host.answer(message['id'], False)
+                        continue
+                    self.flush_log()
                     answer = messagebox.askyesno(message['title'], message['prompt'])
-                    response_queue.put(answer)
+                    self.worker_host.answer(message['id'], answer)
                 elif message['type'] == 'showerror':
+                    self.flush_log()
                     messagebox.showerror(message['title'], message['message'])
                 elif message['type'] == 'showinfo':
+                    self.flush_log()
                     messagebox.showinfo(message['title'], message['message'])
+                elif message['type'] == 'progress':
+                    if message['job'] == self.current_job:
+                        self.set_progress(message['value'], message['label'])
                 elif message['type'] == 'result':
-                    self.handle_step_result(message['success'])
-        except queue.Empty:
+                    if self.awaiting_worker_result and message['job'] == self.current_job:
+                        self.awaiting_worker_result = False
+                        self.current_job = None
+                        self.handle_step_result(message['success'])
+                elif message['type'] == 'worker_exit':
+                    if self.awaiting_worker_result and message['job'] == self.current_job:
+                        self.log(f"Worker host exited unexpectedly (exit code {message['exitcode']}).")
+                        self.awaiting_worker_result = False
+                        self.current_job = None
+                        self.handle_step_result(False)
+        except IndexError:
             pass
-        self.after(100, self.process_gui_queue)
 
     def get_current_config(self):
         return {
             "project_path": self.project_path.get(),
             "local_ip": self.local_ip.get(),
+            "primary_ports": {field: var.get().strip() for field, var in self.primary_ports.items()},
             "db_ip": self.db_ip.get(),
             "db_port": self.db_port.get(),
             "db_username": self.db_username.get(),
@@ -989,35 +1376,75 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             "existing_mariadb": self.existing_mariadb.get(),
             "db_root_password": self.db_root_password.get(),
             "mariadb_path": self.mariadb_path.get(),
-            "servers": [
-                {
-                    "main_local_ip": w["main_local_ip"].get(),
-                    "main_public_ip": w["main_public_ip"].get(),
-                    "main_port": w["main_port"].get(),
-                    "main_ipc_port": w["main_ipc_port"].get(),
-                    "cast_local_ip": w["cast_local_ip"].get(),
-                    "cast_public_ip": w["cast_public_ip"].get(),
-                    "cast_port": w["cast_port"].get(),
-                    "cast_ipc_port": w["cast_ipc_port"].get(),
-                } for w in self.server_widgets
-            ]
+            "servers": self.server_model.to_list(),
+            "compiler_cache": self.compiler_cache_enabled.get()
         }
 
+    def build_setup_steps(self):
+        repo = "MicrovoltsEmulator"
+        return [
+            SetupStep("prerequisites", self.check_prerequisites, False, tools=("git", "7z")),
+            SetupStep("install_type", self.ask_for_install_type, False),
+            SetupStep("install_llvm", worker_install_llvm, True, tools=("clang-cl",)),
+            SetupStep("install_ccache", worker_install_ccache, True, config_keys=("project_path", "compiler_cache"), tools=("ccache",)),
+            SetupStep("download_repo", worker_download_repository, True, config_keys=("project_path",), revision="mv1.1_2.0",
+                      artifacts=(os.path.join(repo, ".git"),)),
+            SetupStep("extract_cleanup", self.extract_and_cleanup, False, config_keys=("project_path",), depends=("download_repo",)),
+            SetupStep("setup_vcpkg", worker_setup_vcpkg, True, config_keys=("project_path",),
+                      files=(os.path.join(repo, "vcpkg.json"), os.path.join(repo, "ExternalLibraries", "vcpkg", "vcpkg.json")),
+                      depends=("download_repo",),
+                      artifacts=(os.path.join(repo, "ExternalLibraries", "vcpkg", "vcpkg.exe"),
+                                 os.path.join(repo, "ExternalLibraries", "vcpkg", "installed"))),
+            SetupStep("configure_project", self.configure_project, False, depends=("download_repo",)),
+            SetupStep("configure_vs_projects", self.worker_configure_vs_projects, False, depends=("download_repo",)),
+            SetupStep("install_mariadb", worker_install_mariadb, True, config_keys=("existing_mariadb",),
+                      artifacts=(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), f"mariadb-{MARIADB_VERSION}-winx64.msi"),)),
+            SetupStep("setup_config", self.setup_config, False,
+                      config_keys=("project_path", "local_ip", "primary_ports", "db_ip", "db_port", "db_name", "db_username", "db_password", "servers"),
+                      depends=("download_repo",), revision="3", artifacts=(os.path.join(repo, "Setup", "config.ini"),)),
+            SetupStep("setup_database", worker_setup_database, True,
+                      config_keys=("project_path", "mariadb_path", "db_ip", "db_port", "db_name", "db_username", "db_password"),
+                      files=(os.path.join(repo, "microvolts-db.sql"),), depends=("download_repo", "install_mariadb")),
+        ]
+
+    def plan_setup(self, steps, state, config):
+        """Returns [(step, fingerprint, reason)] where reason is why the step must run, or None to skip it."""
+        journal = state['steps']
+        rerun = set()
+        plan = []
+        for step in steps:
+            record = journal.get(step.name)
+            fingerprint = step.fingerprint(config, state['file_hashes'])
+            changed_dependencies = [name for name in step.depends if name in rerun]
+            if record is None:
+                reason = "not completed yet"
+            elif changed_dependencies:
+                reason = f"{', '.join(changed_dependencies)} will run again"
+            elif record.get('invalidated_by'):
+                reason = f"{record['invalidated_by']} ran again since it completed"
+            elif record['fingerprint'] not in (fingerprint, "legacy"):
+                reason = "inputs changed"
+            else:
+                reason = None
+            if reason:
+                rerun.add(step.name)
+            plan.append((step, fingerprint, reason))
+        return plan
+
     def run_setup_sequentially(self):
         self.load_setup_state()
-        self.setup_steps = [
-            ("prerequisites", self.check_prerequisites, False),
-            ("install_type", self.ask_for_install_type, False),
-            ("install_llvm", worker_install_llvm, True),
-            ("download_repo", worker_download_repository, True),
-            ("extract_cleanup", self.extract_and_cleanup, False),
-            ("setup_vcpkg", worker_setup_vcpkg, True),
-            ("configure_project", self.configure_project, False),
-            ("configure_vs_projects", self.worker_configure_vs_projects, False),
-            ("install_mariadb", worker_install_mariadb, True),
-            ("setup_config", self.setup_config, False),
-            ("setup_database", worker_setup_database, True)
-        ]
+        self.setup_steps = self.build_setup_steps()
+        self.steps_to_run = set()
+        for step, fingerprint, reason in self.plan_setup(self.setup_steps, self.setup_state, self.get_current_config()):
+            record = self.setup_state['steps'].get(step.name)
+            if reason:
+                self.steps_to_run.add(step.name)
+                if record is not None:
+                    self.log(f"Step {step.name} will run again: {reason}.")
+            elif record['fingerprint'] == "legacy":
+                # Completed before fingerprints were recorded; trust it and adopt the current inputs.
+                record['fingerprint'] = fingerprint
+        self.save_setup_state()
         self.current_step = 0
         self.run_next_step()
 
@@ -1028,8 +1455,8 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             return
 
         while self.current_step < len(self.setup_steps):
-            step_name, _, _ = self.setup_steps[self.current_step]
-            if not self.setup_state.get(step_name, False):
+            step_name = self.setup_steps[self.current_step].name
+            if step_name in self.steps_to_run:
                 break
             self.log(f"--- Skipping already completed step: {step_name} ---")
             self.current_step += 1
@@ -1045,24 +1472,42 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             self.finalize_setup_ui()
             return
 
-        step_name, step_func, is_process = self.setup_steps[self.current_step]
-        self.log(f"--- Running step: {step_name} ---")
+        step = self.setup_steps[self.current_step]
+        self.log(f"--- Running step: {step.name} ---")
+        self.step_started_at = time.time()
 
-        if is_process:
-            config = self.get_current_config()
-            self.worker_process = Process(target=step_func, args=(self.gui_queue, config))
-            self.worker_process.start()
-            self.check_step_completion()
+        config = self.step_config = self.get_current_config()
+        self.reset_progress()
+        if step.is_process:
+            self.awaiting_worker_result = True
+            self.current_job = self.worker_host.run(step.func, config)
         else:
-            step_success = step_func()
-            self.handle_step_result(step_success)
+            token = self.step_token = object()
+            self.tasks.submit(step.func, config,
+                              on_done=lambda success: self.finish_in_process_step(token, success),
+                              on_error=lambda error: self.finish_in_process_step(token, False, error))
+
+    def finish_in_process_step(self, token, success, error=None):
+        if token is not self.step_token:
+            return
+        self.step_token = None
+        if error is not None:
+            self.log(f"Unexpected error: {error}")
+        self.handle_step_result(success)
 
     def handle_step_result(self, success):
-        step_name, _, _ = self.setup_steps[self.current_step]
+        step = self.setup_steps[self.current_step]
+        step_name = step.name
+        duration = None
+        if self.step_started_at is not None:
+            duration = time.time() - self.step_started_at
+            self.step_durations[step_name] = (duration, bool(success))
+            self.step_started_at = None
         if success:
             self.log(f"Step {step_name} completed successfully.")
-            self.setup_state[step_name] = True
-            self.save_setup_state()
+            self.record_step_completion(step, duration)
+            if duration is not None:
+                self.record_step_timing(step_name, duration)
             self.current_step += 1
             self.run_next_step()
         else:
@@ -1070,32 +1515,146 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             messagebox.showerror("Setup Failed", f"The setup failed at step: {step_name}.\nCheck the log for details.")
             self.finalize_setup_ui()
 
-    def check_step_completion(self):
-        if self.worker_process and self.worker_process.is_alive():
-            self.after(100, self.check_step_completion)
-            return
-        
-        if self.worker_process and self.worker_process.exitcode != 0:
-             self.handle_step_result(False)
-
     def finalize_setup_ui(self):
         self.setup_running = False
         self.start_button.configure(state=tk.NORMAL)
         self.stop_button.configure(state=tk.DISABLED)
         self.progress_bar.stop()
+        self.progress_bar.configure(mode="indeterminate")
+        self.progress_label.configure(text="")
         self.log("To start fresh, click 'Clear Cache & Restart'.")
 
+    def set_progress(self, value, label):
+        """Switches the bar to determinate mode once a step reports real progress."""
+        if self.progress_bar.cget("mode") != "determinate":
+            self.progress_bar.stop()
+            self.progress_bar.configure(mode="determinate")
+        self.progress_bar.set(value)
+        self.progress_label.configure(text=f"{label} ({value:.0%})")
+
+    def reset_progress(self):
+        if self.progress_bar.cget("mode") != "indeterminate":
+            self.progress_bar.configure(mode="indeterminate")
+            self.progress_bar.start()
+        self.progress_label.configure(text="")
+
+    def record_step_completion(self, step, duration):
+        journal = self.setup_state['steps']
+        journal[step.name] = {
+            'fingerprint': step.fingerprint(self.step_config, self.setup_state['file_hashes']),
+            'completed_at': time.time(),
+            'duration': round(duration, 3) if duration is not None else None,
+        }
+        # Whatever was built on top of this step's old output has to be redone, even if
+        # this run stops before reaching it.
+        invalidated = {step.name}
+        for other in self.setup_steps:
+            if invalidated.intersection(other.depends):
+                invalidated.add(other.name)
+                if other.name in journal:
+                    journal[other.name]['invalidated_by'] = step.name
+        self.save_setup_state()
+
+    def show_setup_plan(self):
+        if self.setup_running:
+            messagebox.showinfo("Setup Plan", "Setup is already running.")
+            return
+        config = self.get_current_config()
+        self.plan_button.configure(state=tk.DISABLED)
+        self.notebook.set("Setup Progress")
+        self.tasks.submit(self.build_setup_plan_report, config, on_done=self.finish_setup_plan)
+
+    def finish_setup_plan(self, report):
+        self.plan_button.configure(state=tk.NORMAL)
+        for line in report:
+            self.log(line)
+
+    def build_setup_plan_report(self, config):
+        """Describes what Start Setup would do right now. Reads state only; nothing is written."""
+        try:
+            state = self.read_setup_state()
+        except Exception as e:
+            return [f"Could not read {self.state_file}: {e}"]
+        plan = self.plan_setup(self.build_setup_steps(), state, config)
+        timings = self.load_step_timings()
+
+        lines = ["--- Setup plan (dry run, nothing is changed) ---",
+                 f"{'Step':<24}{'Action':<8}{'Estimate':>10}  Notes"]
+        total, unknown, running = 0.0, 0, 0
+        for step, _, reason in plan:
+            notes = []
+            estimate = None
+            if reason:
+                running += 1
+                estimate = self.estimate_step_duration(step.name, timings, state)
+                if estimate is None:
+                    unknown += 1
+                else:
+                    total += estimate
+                notes.append(reason)
+            cached = step.cached_artifacts(config)
+            if cached:
+                notes.append("cached: " + ", ".join(cached))
+            estimate_text = "-" if not reason else ("?" if estimate is None else format_duration(estimate))
+            lines.append(f"{step.name:<24}{'RUN' if reason else 'skip':<8}{estimate_text:>10}  {'; '.join(notes)}")
+        summary = f"Total estimated time: {format_duration(total)} ({running} of {len(plan)} steps will run)"
+        if unknown:
+            summary += f", plus {unknown} step(s) with no recorded timings on this host"
+        lines.append(summary)
+        return lines
+
+    def load_step_timings(self):
+        try:
+            with open(self.timings_file, 'r') as f:
+                return json.load(f).get(socket.gethostname(), {})
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def record_step_timing(self, step_name, duration, keep=10):
+        try:
+            with open(self.timings_file, 'r') as f:
+                history = json.load(f)
+        except (OSError, ValueError):
+            history = {}
+        durations = history.setdefault(socket.gethostname(), {}).setdefault(step_name, [])
+        durations.append(round(duration, 3))
+        del durations[:-keep]
+        try:
+            with open(self.timings_file, 'w') as f:
+                json.dump(history, f, indent=4)
+        except OSError as e:
+            self.log(f"Warning: Could not save step timings: {e}")
+
+    def estimate_step_duration(self, step_name, timings, state):
+        durations = sorted(timings.get(step_name, []))
+        if durations:
+            return durations[len(durations) // 2]
+        record = state['steps'].get(step_name)
+        return record.get('duration') if record else None
+
+    def read_setup_state(self):
+        """Reads the step journal, migrating the old format; returns an empty journal if there is no file."""
+        state = {'version': 2, 'steps': {}, 'file_hashes': {}}
+        if not os.path.exists(self.state_file):
+            return state
+        with open(self.state_file, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != 2:
+            # Old journals only stored "step_name": true.
+            data = {'version': 2, 'steps': {
+                name: {'fingerprint': "legacy", 'completed_at': None, 'duration': None}
+                for name, done in data.items() if done is True}}
+        state.update(data)
+        return state
+
     def load_setup_state(self):
-        if os.path.exists(self.state_file):
-            try:
-                with open(self.state_file, 'r') as f:
-                    self.setup_state = json.load(f)
+        try:
+            self.setup_state = self.read_setup_state()
+            if self.setup_state['steps']:
                 self.log("Loaded previous setup state. Will attempt to resume.")
-            except Exception as e:
-                self.log(f"Could not load state file, starting fresh: {e}")
-                self.setup_state = {}
-        else:
-            self.setup_state = {}
+        except Exception as e:
+            self.log(f"Could not load state file, starting fresh: {e}")
+            self.setup_state = {'version': 2, 'steps': {}, 'file_hashes': {}}
 
     def save_setup_state(self):
         try:
@@ -1113,7 +1672,7 @@ class MicroVoltsServerSetup(customtkinter.CTk):
                 os.remove(self.config_file)
                 self.log("Configuration file deleted.")
             
-            self.setup_state = {}
+            self.setup_state = {'version': 2, 'steps': {}, 'file_hashes': {}}
             self.project_path.set("")
             self.local_ip.set("")
             self.generate_random_password()
@@ -1122,17 +1681,17 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             python = sys.executable
             os.execl(python, python, *sys.argv)
 
-    def ask_for_install_type(self):
+    def ask_for_install_type(self, config):
         if not os.path.exists(self.config_file):
-            answer = messagebox.askquestion("Installation Type", "This looks like a first-time setup.\n\nWould you like to download and compile the source code (Yes) or download pre-compiled executables (No)?", icon='question')
+            answer = self.ui_call(messagebox.askquestion, "Installation Type", "This looks like a first-time setup.\n\nWould you like to download and compile the source code (Yes) or download pre-compiled executables (No)?", icon='question')
             if answer == 'yes':
                 self.log("User chose to install from source.")
             else:
                 self.log("User chose to use pre-compiled executables.")
-                messagebox.showinfo("Not Implemented", "Downloading pre-compiled executables is not yet implemented. The setup will proceed with source installation.")
+                self.ui_call(messagebox.showinfo, "Not Implemented", "Downloading pre-compiled executables is not yet implemented. The setup will proceed with source installation.")
         return True
 
-    def check_prerequisites(self):
+    def check_prerequisites(self, config):
         self.log("Checking prerequisites...")
         
         try:
@@ -1143,8 +1702,8 @@ class MicroVoltsServerSetup(customtkinter.CTk):
                 raise FileNotFoundError
         except FileNotFoundError:
             self.log("Git not found.")
-            if messagebox.askyesno("Prerequisite Missing", "Git is not installed or not in your PATH. Would you like to download and install it?"):
-                self.install_git()
+            if self.ui_call(messagebox.askyesno, "Prerequisite Missing", "Git is not installed or not in your PATH. Would you like to download and install it?"):
+                self.install_git(config['project_path'])
                 return False
             else:
                 self.log("User chose not to install Git. Setup may fail.")
@@ -1152,7 +1711,7 @@ class MicroVoltsServerSetup(customtkinter.CTk):
 
         if not self.is_vs_installed():
             self.log("Visual Studio with C++ workload not found.")
-            messagebox.showerror("Prerequisite Missing", "Visual Studio with the 'Desktop development with C++' workload is required. Please install it from the Visual Studio Installer.")
+            self.ui_call(messagebox.showerror, "Prerequisite Missing", "Visual Studio with the 'Desktop development with C++' workload is required. Please install it from the Visual Studio Installer.")
             return False
         else:
             self.log("Visual Studio with C++ workload found.")
@@ -1165,15 +1724,15 @@ class MicroVoltsServerSetup(customtkinter.CTk):
                     self.log(f"7-Zip version {seven_zip_version} is sufficient (>= 24.09).")
                 else:
                     self.log(f"7-Zip version {seven_zip_version} is too old. Version 24.09 or newer is required.")
-                    messagebox.showerror("Prerequisite Missing", f"Your 7-Zip version ({seven_zip_version}) is too old.\nPlease upgrade to version 24.09 or newer for vcpkg to work correctly.")
+                    self.ui_call(messagebox.showerror, "Prerequisite Missing", f"Your 7-Zip version ({seven_zip_version}) is too old.\nPlease upgrade to version 24.09 or newer for vcpkg to work correctly.")
                     return False
             except ValueError:
                 self.log(f"Could not parse 7-Zip version: {seven_zip_version}")
-                messagebox.showerror("Prerequisite Error", f"Could not parse the 7-Zip version string: {seven_zip_version}")
+                self.ui_call(messagebox.showerror, "Prerequisite Error", f"Could not parse the 7-Zip version string: {seven_zip_version}")
                 return False
         else:
             self.log("7-Zip is not installed or could not be found.")
-            messagebox.showerror("Prerequisite Missing", "7-Zip is not installed or could not be found in your PATH.\nPlease install version 24.09 or newer and ensure it's in your system's PATH.")
+            self.ui_call(messagebox.showerror, "Prerequisite Missing", "7-Zip is not installed or could not be found in your PATH.\nPlease install version 24.09 or newer and ensure it's in your system's PATH.")
             return False
             
         return True
@@ -1202,10 +1761,10 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             self.log(f"Error checking for Visual Studio: {e}")
             return False
 
-    def install_git(self):
+    def install_git(self, project_path):
         self.log("Downloading Git...")
         git_installer_url = "https://github.com/git-for-windows/git/releases/download/v2.45.2.windows.1/Git-2.45.2-64-bit.exe"
-        installer_path = os.path.join(self.project_path.get(), "Git-Installer.exe")
+        installer_path = os.path.join(project_path, "Git-Installer.exe")
         try:
             response = requests.get(git_installer_url, stream=True)
             response.raise_for_status()
@@ -1217,11 +1776,11 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             subprocess.run([installer_path], shell=True, check=False)
             
             self.log("Git installation finished. Please restart the setup tool.")
-            messagebox.showinfo("Restart Required", "Git has been installed. Please restart the setup tool.")
-            self.quit()
+            self.ui_call(messagebox.showinfo, "Restart Required", "Git has been installed. Please restart the setup tool.")
+            self.schedule_gui_task(self.quit)
         except Exception as e:
             self.log(f"Failed to download or install Git: {e}")
-            messagebox.showerror("Error", f"Failed to install Git: {e}")
+            self.ui_call(messagebox.showerror, "Error", f"Failed to install Git: {e}")
 
     def get_7z_version(self):
         self.log("Checking for 7-Zip version...")
@@ -1279,15 +1838,16 @@ class MicroVoltsServerSetup(customtkinter.CTk):
 
     def startup_update_check(self):
         if self.project_path.get() and os.path.exists(os.path.join(self.project_path.get(), "MicrovoltsEmulator", ".git")):
-            update_thread = threading.Thread(target=self.check_for_updates, args=(True,))
-            update_thread.daemon = True
-            update_thread.start()
+            self.start_update_check(startup=True)
 
-    def check_for_updates(self, startup=False):
-        repo_path = os.path.join(self.project_path.get(), "MicrovoltsEmulator")
+    def start_update_check(self, startup=False):
+        self.tasks.submit(self.check_for_updates, self.project_path.get(), startup)
+
+    def check_for_updates(self, project_path, startup=False):
+        repo_path = os.path.join(project_path, "MicrovoltsEmulator")
         if not os.path.exists(os.path.join(repo_path, ".git")):
             if not startup:
-                messagebox.showerror("Error", "This is not a Git repository. Cannot check for updates.")
+                self.ui_call(messagebox.showerror, "Error", "This is not a Git repository. Cannot check for updates.")
             return
 
         self.log("Checking for updates...")
@@ -1295,67 +1855,402 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             subprocess.run(["git", "fetch"], cwd=repo_path, check=True, capture_output=True, text=True)
             status_result = subprocess.run(["git", "status", "-uno"], cwd=repo_path, check=True, capture_output=True, text=True)
             
-            updated = False
             if "Your branch is behind" in status_result.stdout:
-                if messagebox.askyesno("Update Available", "A new version of the emulator is available. Would you like to update now?"):
-                    self.log("New update found. Pulling changes...")
-                    subprocess.run(["git", "pull"], cwd=repo_path, check=True, capture_output=True, text=True)
-                    self.log("Update complete.")
-                    updated = True
-            else:
-                self.log("You have the most updated version of the Emulator available.")
-                if not startup:
-                    messagebox.showinfo("Up to Date", "You have the most updated version of the Emulator available.")
-
-            if not startup or updated:
-                if messagebox.askyesno("Recompile Project", "Would you like to recompile the project now?"):
-                    self.run_recompile_in_thread()
+                if self.ui_call(messagebox.askyesno, "Update Available", "A new version of the emulator is available. Would you like to update now?\n\n"
+                                "It is built next to the live tree; running servers are restarted onto it one at a time once it is ready."):
+                    upstream = subprocess.run(["git", "rev-parse", "@{u}"], cwd=repo_path, check=True, capture_output=True, text=True)
+                    self.log("New update found. Building it in the staging worktree...")
+                    self.schedule_gui_task(self.run_staged_update_in_thread, upstream.stdout.strip())
+                return
+            self.log("You have the most updated version of the Emulator available.")
+            if not startup:
+                self.ui_call(messagebox.showinfo, "Up to Date", "You have the most updated version of the Emulator available.")
+                if self.ui_call(messagebox.askyesno, "Recompile Project", "Would you like to recompile the project now?"):
+                    head = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_path, check=True, capture_output=True, text=True)
+                    self.schedule_gui_task(self.run_staged_update_in_thread, head.stdout.strip())
 
         except subprocess.CalledProcessError as e:
             self.log(f"Error checking for updates: {e.stderr}")
             if not startup:
-                messagebox.showerror("Error", f"An error occurred while checking for updates:\n{e.stderr}")
+                self.ui_call(messagebox.showerror, "Error", f"An error occurred while checking for updates:\n{e.stderr}")
 
-    def run_recompile_in_thread(self):
+    def run_staged_update_in_thread(self, revision):
         self.start_button.configure(state=tk.DISABLED)
         self.update_button.configure(state=tk.DISABLED)
+        self.rollback_button.configure(state=tk.DISABLED)
         self.progress_bar.start()
-        
-        recompile_thread = threading.Thread(target=self.run_recompile)
-        recompile_thread.daemon = True
-        recompile_thread.start()
+        self.tasks.submit(self.run_staged_update, self.project_path.get(), revision)
 
     def schedule_gui_task(self, func, *args):
-        self.after(0, lambda: func(*args))
+        """Queues func(*args) to run on the Tk thread; safe to call from any thread."""
+        self.gui_tasks.append((func, args))
+        self.ui_notifier.notify()
+
+    def ui_call(self, func, *args):
+        """Runs func(*args) on the Tk thread and returns its result; use for dialogs from background tasks."""
+        return self.tasks.call_sync(func, *args)
+
+    def read_local_changes(self, repo_path):
+        """The live tree's uncommitted changes to tracked files as a binary patch (b"" when clean)."""
+        return subprocess.run(["git", "diff", "--binary", "HEAD"], cwd=repo_path, check=True, capture_output=True).stdout
+
+    def prepare_staging_worktree(self, repo_path, revision, local_changes=b""):
+        """Checks out revision plus local_changes in MicrovoltsEmulator-staging and returns its path.
+
+        The worktree is kept between updates so its build output makes the next build incremental.
+        """
+        staging_path = repo_path + "-staging"
+        if os.path.exists(os.path.join(staging_path, ".git")):
+            subprocess.run(["git", "checkout", "--detach", "-f", revision], cwd=staging_path, check=True, capture_output=True)
+            subprocess.run(["git", "clean", "-fdq"], cwd=staging_path, check=True, capture_output=True)
+        else:
+            subprocess.run(["git", "worktree", "prune"], cwd=repo_path, check=True, capture_output=True)
+            subprocess.run(["git", "worktree", "add", "--detach", staging_path, revision], cwd=repo_path, check=True, capture_output=True)
+        subprocess.run(["git", "submodule", "update", "--init", "--recursive"], cwd=staging_path, check=True, capture_output=True)
+
+        if local_changes:
+            self.log("Applying uncommitted changes from the live tree to the staging worktree...")
+            subprocess.run(["git", "apply", "--whitespace=nowarn"], cwd=staging_path, input=local_changes, check=True, capture_output=True)
+        return staging_path
+
+    def artifact_cache(self):
+        """The build artifact cache from the 'artifact_cache' settings, or None when it is disabled."""
+        if not self.artifact_cache_config.get("enabled", True):
+            return None
+        return ArtifactCache(self.artifact_cache_config.get("directory", "build_cache"),
+                             max_bytes=int(float(self.artifact_cache_config.get("max_gb", 10)) * (1 << 30)))
 
-    def run_recompile(self):
-        if self.recompile_project():
-            self.schedule_gui_task(messagebox.showinfo, "Success", "Project recompiled successfully.")
-        
-        self.schedule_gui_task(self.finalize_recompile_ui)
+    def build_toolchain_fingerprint(self):
+        msbuild_path = self.find_msbuild()
+        vcvarsall_path = self.find_vcvarsall()
+        if not msbuild_path or not vcvarsall_path:
+            return None
+        return f"{tool_identity(msbuild_path)}\n{tool_identity(vcvarsall_path)}"
 
-    def finalize_recompile_ui(self):
-        self.start_button.configure(state=tk.NORMAL)
-        self.update_button.configure(state=tk.NORMAL)
-        self.progress_bar.stop()
+    def run_staged_update(self, project_path, revision):
+        """Builds revision in the staging worktree, snapshots it as a release and rolls the running servers onto it.
 
-    def find_vcvarsall(self):
-        self.log("Finding vcvarsall.bat...")
+        A build of the same sources and toolchain found in the artifact cache is restored
+        instead of running MSBuild. Nothing the running servers use is touched until the
+        new release exists.
+        """
+        repo_path = os.path.join(project_path, "MicrovoltsEmulator")
+        store = ReleaseStore(repo_path, keep=int(self.rollout_config.get("keep_releases", 3)))
         try:
-            vswhere_path = None
-            possible_paths = [
-                os.path.join(os.environ.get("ProgramFiles(x86)", ""), "Microsoft Visual Studio", "Installer", "vswhere.exe"),
-                os.path.join(os.environ.get("ProgramFiles", ""), "Microsoft Visual Studio", "Installer", "vswhere.exe")
-            ]
-            for path in possible_paths:
-                if os.path.exists(path):
-                    vswhere_path = path
-                    break
-            
-            if not vswhere_path:
-                self.log("vswhere.exe not found.")
-                return None
-
+            try:
+                # Local edits, such as command permission changes, are part of what the user expects to run.
+                local_changes = self.read_local_changes(repo_path)
+            except subprocess.CalledProcessError as e:
+                error = (e.stderr or b"").decode('utf-8', errors='replace').strip()
+                self.log(f"Could not read the live tree's changes: {error}")
+                self.schedule_gui_task(messagebox.showerror, "Update Failed", f"Could not read the live tree's changes:\n{error}")
+                return
+
+            release = None
+            cache = self.artifact_cache()
+            cache_key = None
+            if cache is not None:
+                toolchain = self.build_toolchain_fingerprint()
+                if toolchain:
+                    source = revision + (f"+{hashlib.sha256(local_changes).hexdigest()}" if local_changes else "")
+                    # ccache builds use /Z7 debug info, so their output is not interchangeable with plain builds.
+                    configuration = "Release|x64" + ("|ccache" if self.compiler_cache_enabled.get() else "")
+                    cache_key = ArtifactCache.key(source, configuration, toolchain)
+                    if cache.lookup(cache_key):
+                        started_at = time.time()
+                        release = store.add(revision, lambda path: cache.restore(cache_key, path))
+                        self.log(f"Restored release {release} from the build cache in {time.time() - started_at:.1f}s; MSBuild was skipped.")
+
+            if release is None:
+                release = self.build_release(project_path, repo_path, revision, local_changes, store, cache, cache_key)
+                if release is None:
+                    return
+
+            restarted = self.roll_servers(store.path(release))
+            if restarted is None:
+                store.mark_failed(release)
+                self.schedule_gui_task(messagebox.showerror, "Update Rolled Back",
+                                       f"Release {release} did not come up, so every restarted server was rolled back. Check the log for details.")
+                return
+            store.activate(release)
+            store.prune()
+
+            try:
+                subprocess.run(["git", "merge", "--ff-only", revision], cwd=repo_path, check=True, capture_output=True)
+            except subprocess.CalledProcessError as e:
+                self.log(f"Release {release} is live, but the source tree could not be fast-forwarded: "
+                         f"{(e.stderr or b'').decode('utf-8', errors='replace').strip()}")
+            self.schedule_gui_task(messagebox.showinfo, "Success",
+                                   f"Release {release} is live." + (f" Restarted {restarted} server(s) one batch at a time." if restarted else ""))
+        finally:
+            self.schedule_gui_task(self.finalize_recompile_ui)
+
+    def build_release(self, project_path, repo_path, revision, local_changes, store, cache=None, cache_key=None):
+        """Builds revision in the staging worktree and snapshots it into `store`; returns the release name or None."""
+        try:
+            staging_path = self.prepare_staging_worktree(repo_path, revision, local_changes)
+        except subprocess.CalledProcessError as e:
+            error = (e.stderr or b"").decode('utf-8', errors='replace').strip()
+            self.log(f"Could not prepare the staging worktree: {error}")
+            self.schedule_gui_task(messagebox.showerror, "Update Failed", f"Could not prepare the staging worktree:\n{error}")
+            return None
+
+        started_at = time.time()
+        success = self.recompile_project(project_path, target="Build", repo_path=staging_path)
+        duration = time.time() - started_at
+        self.last_build = {'duration': duration, 'success': success}
+        self.build_counts['success' if success else 'failure'] += 1
+        if not success:
+            self.log("Staged build failed; the running servers were not touched.")
+            return None
+
+        build_dir = os.path.join(staging_path, "x64")
+        release = store.snapshot(build_dir, revision)
+        self.log(f"Built release {release} in {format_duration(duration)}.")
+        if cache is not None and cache_key is not None:
+            try:
+                manifest, added, evicted = cache.store(cache_key, build_dir, ignore=ReleaseStore.SKIP, revision=revision)
+                self.log(f"Saved the build to the artifact cache: {len(manifest['files'])} file(s), "
+                         f"{added / 1048576:.1f} MB new" + (f", {len(evicted)} old build(s) evicted." if evicted else "."))
+            except OSError as e:
+                self.log(f"Could not save the build to the artifact cache: {e}")
+        return release
+
+    def roll_servers(self, release_dir, instances=None):
+        """Restarts the running servers (or just `instances`) onto release_dir a batch at a time, waiting for each batch to be ready.
+
+        If a batch never becomes ready, every server restarted so far goes back to the
+        executable it was running before and None is returned; otherwise the restart count.
+        """
+        manager = self.server_manager
+        running = manager.running_instances() if instances is None else instances
+        batch_size = max(1, int(self.rollout_config.get("batch_size", 1)))
+        ready_timeout = float(self.rollout_config.get("ready_timeout", 60))
+        settle = float(self.rollout_config.get("settle", 5))
+        restarted = []
+        for first in range(0, len(running), batch_size):
+            batch = running[first:first + batch_size]
+            errors = []
+            for name, exe_path, policy in batch:
+                manager.stop_server(name)
+                restarted.append((name, exe_path, policy))
+                errors.append(manager.start_server(name, os.path.join(release_dir, os.path.basename(exe_path)), policy))
+            self.schedule_gui_task(self.on_servers_started, [error for error in errors if error])
+            failed = [name for name, _, policy in batch if not wait_until_ready(manager, name, policy, ready_timeout, settle)]
+            if failed:
+                self.log(f"{', '.join(failed)} did not become ready on the new release; rolling back {len(restarted)} server(s)...")
+                errors = []
+                for name, exe_path, policy in reversed(restarted):
+                    manager.stop_server(name)
+                    errors.append(manager.start_server(name, exe_path, policy))
+                self.schedule_gui_task(self.on_servers_started, [error for error in errors if error])
+                return None
+            self.log(f"{', '.join(name for name, _, _ in batch)} ready on {os.path.basename(release_dir)}.")
+        return len(restarted)
+
+    def roll_back_release(self):
+        if not self.project_path.get():
+            messagebox.showerror("Error", "Please select an installation directory first.")
+            return
+        store = ReleaseStore(os.path.join(self.project_path.get(), "MicrovoltsEmulator"))
+        previous = store.previous()
+        if previous is None:
+            messagebox.showinfo("Roll Back", "There is no previous release to roll back to.")
+            return
+        if not messagebox.askyesno("Roll Back", f"Restart the running servers on release {previous}?"):
+            return
+        self.start_button.configure(state=tk.DISABLED)
+        self.update_button.configure(state=tk.DISABLED)
+        self.rollback_button.configure(state=tk.DISABLED)
+        self.tasks.submit(self.run_roll_back, store, previous)
+
+    def run_roll_back(self, store, release):
+        try:
+            if self.roll_servers(store.path(release)) is None:
+                store.mark_failed(release)
+                self.schedule_gui_task(messagebox.showerror, "Roll Back Failed", f"Release {release} did not come up; the servers were returned to the current release.")
+                return
+            store.activate(release)
+            self.log(f"Rolled back to release {release}.")
+        finally:
+            self.schedule_gui_task(self.finalize_recompile_ui)
+
+    def refresh_release_label(self):
+        store = ReleaseStore(os.path.join(self.project_path.get(), "MicrovoltsEmulator")) if self.project_path.get() else None
+        current = store.current_release() if store else None
+        if current:
+            self.release_label.configure(text=f"Release: {current['name']} ({current['revision'][:8]})")
+        else:
+            self.release_label.configure(text="Release: none yet, servers start from x64")
+        self.rollback_button.configure(state=tk.NORMAL if store and store.previous() else tk.DISABLED)
+
+    def rebuild_main_server(self):
+        """Incrementally builds only the MainServer project and rolls the running MainServer instances onto it."""
+        if not self.project_path.get() or not os.path.isdir(self.project_path.get()):
+            messagebox.showerror("Error", "Please select a valid installation directory first.")
+            return
+        self.start_button.configure(state=tk.DISABLED)
+        self.update_button.configure(state=tk.DISABLED)
+        self.progress_bar.start()
+        self.tasks.submit(self.run_main_server_rebuild, self.project_path.get())
+
+    def run_main_server_rebuild(self, project_path):
+        """Builds MainServer in the live tree, releases it on top of the current release and rolls only MainServer onto it."""
+        manager = self.server_manager
+        repo_path = os.path.join(project_path, "MicrovoltsEmulator")
+        build_dir = os.path.join(repo_path, "x64")
+        running = [instance for instance in manager.running_instances() if instance[0].startswith("MainServer")]
+        # Windows keeps a running exe locked, so instances still running out of x64 itself must stop first.
+        locked = [instance for instance in running
+                  if os.path.normcase(os.path.dirname(os.path.abspath(instance[1]))) == os.path.normcase(os.path.abspath(build_dir))]
+        for name, _, _ in locked:
+            manager.stop_server(name)
+
+        try:
+            started_at = time.time()
+            success = self.recompile_project(project_path, target="MainServer")
+            duration = time.time() - started_at
+            self.last_build = {'duration': duration, 'success': success}
+            self.build_counts['success' if success else 'failure'] += 1
+            if not success:
+                errors = [manager.start_server(name, exe_path, policy) for name, exe_path, policy in locked]
+                if locked:
+                    self.schedule_gui_task(self.on_servers_started, [error for error in errors if error])
+                return
+
+            store = ReleaseStore(repo_path, keep=int(self.rollout_config.get("keep_releases", 3)))
+            try:
+                head = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_path, check=True, capture_output=True, text=True).stdout.strip()
+            except (OSError, subprocess.CalledProcessError):
+                head = "local"
+            base_dir = store.current_dir()
+
+            def populate(path):
+                # Only MainServer was rebuilt; every other binary comes from the release that is live.
+                shutil.copytree(base_dir or build_dir, path, ignore=shutil.ignore_patterns(*ReleaseStore.SKIP))
+                if base_dir:
+                    for name in os.listdir(build_dir):
+                        if name.startswith("MainServer.") and os.path.isfile(os.path.join(build_dir, name)):
+                            shutil.copy2(os.path.join(build_dir, name), os.path.join(path, name))
+            release = store.add(head, populate)
+
+            restarted = self.roll_servers(store.path(release), running)
+            if restarted is None:
+                store.mark_failed(release)
+                self.schedule_gui_task(messagebox.showerror, "Rebuild Rolled Back",
+                                       "The rebuilt MainServer did not come up, so its instances were rolled back. Check the log for details.")
+                return
+            store.activate(release)
+            store.prune()
+            restarted = f" and restarted {restarted} instance(s)" if restarted else ""
+            self.schedule_gui_task(messagebox.showinfo, "Success", f"MainServer rebuilt in {format_duration(duration)} as release {release}{restarted}.")
+        finally:
+            self.schedule_gui_task(self.finalize_recompile_ui)
+
+    def finalize_recompile_ui(self):
+        self.start_button.configure(state=tk.NORMAL)
+        self.update_button.configure(state=tk.NORMAL)
+        self.progress_bar.stop()
+        self.refresh_release_label()
+
+    def toggle_compiler_cache(self):
+        if self.compiler_cache_enabled.get() and self.project_path.get() and not find_ccache(self.project_path.get()):
+            messagebox.showinfo("Compiler Cache", "ccache was not found. Run the setup again to download it, or install ccache and add it to PATH.")
+        self.save_settings()
+
+    def prepare_compiler_cache(self, project_path):
+        """Routes the build's cl.exe / clang-cl.exe calls through ccache; returns None when disabled or unavailable.
+
+        MSBuild runs the compiler named by CLToolExe from CLToolPath, so a directory with
+        ccache copied in as cl.exe and clang-cl.exe makes ccache wrap either toolset; ccache
+        then finds the real compiler on PATH, skipping its own directory. ccache.props is
+        force-imported before Microsoft.Cpp.targets to switch to /Z7 debug info and one
+        object file per source, which ccache needs to cache a compile.
+        """
+        if not self.compiler_cache_enabled.get():
+            return None
+        ccache_path = find_ccache(project_path)
+        if not ccache_path:
+            self.log("Compiler cache is enabled but ccache was not found; building without it.")
+            return None
+
+        shim_dir = os.path.join(project_path, "ccache", "shims")
+        os.makedirs(shim_dir, exist_ok=True)
+        for name in ("cl.exe", "clang-cl.exe"):
+            shim = os.path.join(shim_dir, name)
+            if not os.path.exists(shim) or os.path.getsize(shim) != os.path.getsize(ccache_path):
+                shutil.copy2(ccache_path, shim)
+        props_path = os.path.join(shim_dir, "ccache.props")
+        props = (
+            '<Project xmlns="http://schemas.microsoft.com/developer/msbuild/2003">\n'
+            '  <PropertyGroup>\n'
+            f'    <CLToolPath>{shim_dir}</CLToolPath>\n'
+            '    <UseMultiToolTask>true</UseMultiToolTask>\n'
+            '  </PropertyGroup>\n'
+            '  <ItemDefinitionGroup>\n'
+            '    <ClCompile>\n'
+            '      <DebugInformationFormat>OldStyle</DebugInformationFormat>\n'
+            '      <ObjectFileName>$(IntDir)%(FileName).obj</ObjectFileName>\n'
+            '    </ClCompile>\n'
+            '  </ItemDefinitionGroup>\n'
+            '</Project>\n'
+        )
+        try:
+            with open(props_path, 'r', encoding='utf-8') as f:
+                unchanged = f.read() == props
+        except OSError:
+            unchanged = False
+        if not unchanged:
+            with open(props_path, 'w', encoding='utf-8') as f:
+                f.write(props)
+
+        env = dict(os.environ)
+        env['CCACHE_DIR'] = self.compiler_cache_config.get("directory") or os.path.join(project_path, "ccache", "cache")
+        env['CCACHE_MAXSIZE'] = str(self.compiler_cache_config.get("max_size", "10G"))
+        # Paths under the install directory are hashed relative to it, so the live tree and
+        # the staging worktree share cache entries.
+        env['CCACHE_BASEDIR'] = os.path.abspath(project_path)
+        env['CCACHE_SLOPPINESS'] = "pch_defines,time_macros"
+        clang_cl = shutil.which("clang-cl") or os.path.join(os.environ.get("ProgramFiles", "C:\\Program Files"), "LLVM", "bin", "clang-cl.exe")
+        if os.path.isfile(clang_cl):
+            env['PATH'] = env.get('PATH', "") + os.pathsep + os.path.dirname(clang_cl)
+
+        self.log(f"Using compiler cache {ccache_path} (cache in {env['CCACHE_DIR']}).")
+        return {'ccache': ccache_path, 'env': env, 'before': read_ccache_stats(ccache_path, env),
+                'msbuild_args': f' /p:ForceImportBeforeCppTargets="{props_path}"'}
+
+    def report_compiler_cache_stats(self, compiler_cache):
+        after = read_ccache_stats(compiler_cache['ccache'], compiler_cache['env'])
+        if after is None:
+            return
+        before = compiler_cache['before'] or {}
+        stats = {key: after[key] - before.get(key, 0) for key in ("hits", "misses", "uncacheable")}
+        stats['size'] = after['size']
+        self.last_compiler_cache_stats = stats
+        self.log(f"Compiler cache: {format_compiler_cache_stats(stats)}")
+        self.schedule_gui_task(self.show_compiler_cache_stats)
+
+    def show_compiler_cache_stats(self):
+        if self.last_compiler_cache_stats:
+            self.compiler_cache_label.configure(text=f"Last build: {format_compiler_cache_stats(self.last_compiler_cache_stats)}")
+
+    def find_vcvarsall(self):
+        self.log("Finding vcvarsall.bat...")
+        try:
+            vswhere_path = None
+            possible_paths = [
+                os.path.join(os.environ.get("ProgramFiles(x86)", ""), "Microsoft Visual Studio", "Installer", "vswhere.exe"),
+                os.path.join(os.environ.get("ProgramFiles", ""), "Microsoft Visual Studio", "Installer", "vswhere.exe")
+            ]
+            for path in possible_paths:
+                if os.path.exists(path):
+                    vswhere_path = path
+                    break
+            
+            if not vswhere_path:
+                self.log("vswhere.exe not found.")
+                return None
+
             cmd = [vswhere_path, "-latest", "-property", "installationPath"]
             result = subprocess.run(cmd, capture_output=True, text=True, check=True)
             vs_path = result.stdout.strip()
@@ -1406,7 +2301,11 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             self.log(f"Error finding MSBuild.exe: {e}")
             return None
             
-    def recompile_project(self):
+    def recompile_project(self, project_path, target="Rebuild", repo_path=None):
+        """Builds the solution with MSBuild; target is a solution target such as Rebuild or a single project name.
+
+        repo_path selects another checkout of the emulator, such as the staging worktree.
+        """
         self.log("Attempting to recompile project...")
         
         msbuild_path = self.find_msbuild()
@@ -1421,20 +2320,23 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             self.schedule_gui_task(messagebox.showerror, "Error", "Could not find vcvarsall.bat. Please ensure Visual Studio C++ tools are installed.")
             return False
 
-        repo_path = os.path.join(self.project_path.get(), "MicrovoltsEmulator")
+        repo_path = repo_path or os.path.join(project_path, "MicrovoltsEmulator")
         sln_file = os.path.join(repo_path, "Microvolts-Emulator-V2.sln")
         if not os.path.exists(sln_file):
             self.log(f"Solution file not found at {sln_file}")
             self.schedule_gui_task(messagebox.showerror, "Error", f"Solution file (.sln) not found.")
             return False
 
+        compiler_cache = self.prepare_compiler_cache(project_path)
         try:
             self.log("Starting recompile process...")
             
             compile_cmd = (
                 f'call "{vcvarsall_path}" x64 && '
-                f'"{msbuild_path}" "{sln_file}" /t:Rebuild /p:Configuration=Release /p:Platform=x64'
+                f'"{msbuild_path}" "{sln_file}" /t:{target} /p:Configuration=Release /p:Platform=x64'
             )
+            if compiler_cache:
+                compile_cmd += compiler_cache['msbuild_args']
 
             self.log(f"Executing command: {compile_cmd}")
 
@@ -1445,6 +2347,7 @@ class MicroVoltsServerSetup(customtkinter.CTk):
                 text=True,
                 shell=True,
                 cwd=repo_path,
+                env=compiler_cache['env'] if compiler_cache else None,
                 creationflags=subprocess.CREATE_NO_WINDOW,
                 encoding='utf-8',
                 errors='replace'
@@ -1455,6 +2358,8 @@ class MicroVoltsServerSetup(customtkinter.CTk):
 
             process.stdout.close()
             return_code = process.wait()
+            if compiler_cache:
+                self.report_compiler_cache_stats(compiler_cache)
 
             if return_code == 0:
                 self.log("Recompile successful.")
@@ -1490,10 +2395,10 @@ class MicroVoltsServerSetup(customtkinter.CTk):
         messagebox.showerror("Error", "Could not find mariadb.exe.")
         return None
             
-    def extract_and_cleanup(self):
+    def extract_and_cleanup(self, config):
         self.log("Verifying repository structure...")
         try:
-            repo_path = os.path.join(self.project_path.get(), "MicrovoltsEmulator")
+            repo_path = os.path.join(config['project_path'], "MicrovoltsEmulator")
             if not os.path.exists(repo_path):
                 raise Exception("Repository directory not found")
             sln_file = os.path.join(repo_path, "Microvolts-Emulator-V2.sln")
@@ -1504,44 +2409,72 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             self.log(f"Failed to verify repository: {str(e)}")
             return False
             
-    def configure_project(self):
+    def configure_project(self, config):
         self.log("Project configuration completed")
         return True
         
-    def worker_configure_vs_projects(self):
+    def worker_configure_vs_projects(self, config):
         self.log("Configuring Visual Studio projects...")
         # Placeholder for the logic to modify .vcxproj files.
         self.log("Visual Studio project configuration step is a placeholder.")
         return True
         
-    def setup_config(self):
+    def config_port_problems(self, settings, allocator):
+        """Lists the missing, shared or reserved ports that would end up in the configs.
+
+        Blank rows are skipped, as render_server_configs skips them.
+        """
+        def missing(value):
+            return "port is missing" if not value else f"'{value}' is not a port"
+
+        primary = settings.get('primary_ports') or {}
+        details = []
+        first_use = {str(settings.get('db_port', '')): "the DB port"}
+        for field, heading in ServerListModel.PRIMARY_HEADINGS.items():
+            port = str(primary.get(field, ""))
+            if not port.isdigit():
+                details.append(f"Server 1 {heading}: {missing(port)}")
+            elif port in first_use:
+                details.append(f"Server 1 {heading}: port {port} is also used by {first_use[port]}")
+            else:
+                first_use[port] = f"Server 1 {heading}"
+        rows = [ServerListModel.normalize(server) for server in settings.get('servers', [])]
+        problems = allocator.check(rows)
+        for index, row in enumerate(rows):
+            if ServerListModel.is_blank(row):
+                continue
+            for field in ServerListModel.PORT_FIELDS:
+                if not row[field].isdigit():
+                    problems[(index, field)] = missing(row[field])
+        return details + [f"Server {index + 2} {ServerListModel.HEADINGS[field]}: {problem}"
+                          for (index, field), problem in sorted(problems.items())]
+
+    def setup_config(self, settings, allocator=None):
         self.log("Setting up configuration files...")
         try:
-            repo_path = os.path.join(self.project_path.get(), "MicrovoltsEmulator")
-            setup_dir = os.path.join(repo_path, "Setup")
-            os.makedirs(setup_dir, exist_ok=True)
-            
-            config_path = os.path.join(setup_dir, "config.ini")
-            
-            config = configparser.ConfigParser()
-            config.optionxform = str
-            
-            local_ip = self.local_ip.get() if self.local_ip.get() else "127.0.0.1"
-
-            config['Database'] = {
-                'Ip': self.db_ip.get(),
-                'Port': self.db_port.get(),
-                'DatabaseName': self.db_name.get(),
-                'Username': self.db_username.get(),
-                'PasswordEnvironmentName': 'MICROVOLTS_DB_PASSWORD'
-            }
-            
-            with open(config_path, 'w') as configfile:
-                config.write(configfile)
-                
-            self.log(f"Configuration file created: {config_path}")
+            if allocator is None:
+                # Runs off the Tk thread during setup, so the DB and Server 1 ports come from the settings snapshot.
+                reserved = [settings['db_port']] if str(settings['db_port']).isdigit() else []
+                try:
+                    allocator = PortAllocator.from_config(self.port_allocation_config, reserved, settings.get('primary_ports'))
+                except (TypeError, ValueError):
+                    allocator = PortAllocator.from_config({}, reserved, settings.get('primary_ports'))
+            problems = self.config_port_problems(settings, allocator)
+            if problems:
+                self.log("Configuration files were not written; fix these ports (Server 1 on the Server Config tab, "
+                         "the others on the Multi-Server tab, where \"Auto-assign Ports\" can fill them in) and try again:")
+                for problem in problems:
+                    self.log(f"  {problem}")
+                return False
+
+            setup_dir = os.path.join(settings['project_path'], "MicrovoltsEmulator", "Setup")
+            written, unchanged, removed = write_server_configs(setup_dir, render_server_configs(settings))
+            for path in written:
+                self.log(f"Configuration file written: {os.path.join(setup_dir, path)}")
+            self.log(f"{len(unchanged)} configuration file(s) already up to date"
+                     + (f", {len(removed)} stale instance config(s) removed." if removed else "."))
             
-            db_password = self.db_password.get()
+            db_password = settings['db_password']
             os.environ['MICROVOLTS_DB_PASSWORD'] = db_password
             self.log("Database password set as environment variable for this session.")
             
@@ -1550,6 +2483,20 @@ class MicroVoltsServerSetup(customtkinter.CTk):
             self.log(f"Failed to setup configuration: {str(e)}")
             return False
 
+    def write_configs_now(self):
+        """Renders the server configs from the current settings without running setup."""
+        if not self.project_path.get() or not os.path.isdir(os.path.join(self.project_path.get(), "MicrovoltsEmulator")):
+            messagebox.showerror("Error", "The emulator has not been downloaded to the installation directory yet.")
+            return
+        config = self.get_current_config()
+        allocator = self.port_allocator()
+        problems = self.config_port_problems(config, allocator)
+        if problems:
+            shown = "\n".join(problems[:10]) + (f"\n...and {len(problems) - 10} more" if len(problems) > 10 else "")
+            messagebox.showerror("Write Configs", f"Fix these ports before writing the configs (\"Auto-assign Ports\" can do it):\n\n{shown}")
+            return
+        self.tasks.submit(self.setup_config, config, allocator)
+
     def open_command_editor(self):
         if not self.project_path.get() or not os.path.isdir(self.project_path.get()):
             messagebox.showerror("Error", "Please select a valid installation directory first.")
@@ -1557,43 +2504,168 @@ class MicroVoltsServerSetup(customtkinter.CTk):
 
         if self.command_editor_window is None or not self.command_editor_window.winfo_exists():
             try:
-                self.command_editor_window = CommandEditorWindow(self, self.project_path.get())
+                self.command_editor_window = CommandEditorWindow(self, self.project_path.get(), self.command_index_cache)
             except Exception as e:
                 self.log(f"Error creating Command Editor window: {e}")
                 messagebox.showerror("Error", f"Could not create Command Editor window:\n{e}")
                 return
         else:
+            # The window loaded its commands when it was created; only reloads on reopen.
+            self.command_editor_window.deiconify()
             self.command_editor_window.focus()
-
-        self.command_editor_window.load_commands()
+            self.command_editor_window.load_commands()
         self.command_editor_window.deiconify()
         self.command_editor_window.grab_set()
 
+class LogHistoryWindow(customtkinter.CTkToplevel):
+    TIME_RANGES = {
+        "Last 15 minutes": 15 * 60,
+        "Last hour": 3600,
+        "Last 24 hours": 24 * 3600,
+        "Last 7 days": 7 * 24 * 3600,
+        "All history": None,
+    }
+
+    def __init__(self, parent, archive, server_names):
+        super().__init__(parent)
+        self.title("Server Log History")
+        self.geometry("1000x600")
+        self.transient(parent)
+
+        self.parent = parent
+        self.archive = archive
+        self.server_var = tk.StringVar(value=server_names[0] if server_names else "")
+        self.query_var = tk.StringVar()
+        self.regex_var = tk.BooleanVar(value=False)
+        self.range_var = tk.StringVar(value="Last hour")
+
+        search_frame = customtkinter.CTkFrame(self, fg_color="transparent")
+        search_frame.pack(fill="x", padx=10, pady=10)
+        self.server_selector = customtkinter.CTkComboBox(search_frame, variable=self.server_var, values=server_names, width=160)
+        self.server_selector.pack(side="left")
+        customtkinter.CTkComboBox(search_frame, variable=self.range_var, values=list(self.TIME_RANGES), state="readonly", width=150).pack(side="left", padx=5)
+        query_entry = customtkinter.CTkEntry(search_frame, textvariable=self.query_var, placeholder_text="Search text")
+        query_entry.pack(side="left", fill="x", expand=True, padx=5)
+        query_entry.bind("<Return>", lambda e: self.run_search())
+        customtkinter.CTkCheckBox(search_frame, text="Regex", variable=self.regex_var, width=70).pack(side="left", padx=5)
+        self.search_button = customtkinter.CTkButton(search_frame, text="Search", command=self.run_search, width=90)
+        self.search_button.pack(side="left")
+
+        self.status_label = customtkinter.CTkLabel(self, text="", text_color="gray60", anchor="w")
+        self.status_label.pack(fill="x", padx=10)
+        self.results_text = customtkinter.CTkTextbox(self, state='disabled', font=("Consolas", 13))
+        self.results_text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+
+    def run_search(self):
+        server_name = self.server_var.get()
+        query = self.query_var.get()
+        if not server_name:
+            return
+        if self.regex_var.get():
+            try:
+                re.compile(query)
+            except re.error as e:
+                self.status_label.configure(text=f"Invalid regular expression: {e}")
+                return
+
+        window = self.TIME_RANGES.get(self.range_var.get())
+        start_ts = time.time() - window if window else None
+        regex = self.regex_var.get()
+        self.search_button.configure(state=tk.DISABLED)
+        self.status_label.configure(text="Searching...")
+
+        def search():
+            started_at = time.perf_counter()
+            try:
+                results = self.archive.search(server_name, query, start_ts=start_ts, regex=regex)
+                error = None
+            except Exception as e:
+                results, error = [], e
+            self.parent.schedule_gui_task(self.show_results, results, error, time.perf_counter() - started_at)
+
+        self.parent.tasks.submit(search)
+
+    def show_results(self, results, error, elapsed):
+        if not self.winfo_exists():
+            return
+        self.search_button.configure(state=tk.NORMAL)
+        if error:
+            self.status_label.configure(text=f"Search failed: {error}")
+            return
+        self.status_label.configure(text=f"{len(results)} matching lines (showing most recent) in {elapsed * 1000:.0f} ms")
+        self.results_text.configure(state='normal')
+        self.results_text.delete(1.0, tk.END)
+        self.results_text.insert(tk.END, "".join(
+            f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))}  {line}\n" for ts, line in results))
+        self.results_text.see(tk.END)
+        self.results_text.configure(state='disabled')
+
+class ServerTemplateDialog(customtkinter.CTkToplevel):
+    """Asks for a server count and template for MicroVoltsServerSetup.generate_servers."""
+
+    def __init__(self, parent, template):
+        super().__init__(parent)
+        self.parent = parent
+        self.title("Generate Servers")
+        self.transient(parent)
+        self.grid_columnconfigure(1, weight=1)
+
+        self.count = tk.StringVar(value="1")
+        self.fields = {field: tk.StringVar(value=template.get(field, "")) for field in ServerListModel.FIELDS}
+        self.increment_ip = tk.BooleanVar(value=False)
+
+        customtkinter.CTkLabel(self, text="Number of servers:").grid(row=0, column=0, sticky=tk.W, padx=10, pady=(10, 2))
+        customtkinter.CTkEntry(self, textvariable=self.count).grid(row=0, column=1, sticky="ew", padx=10, pady=(10, 2))
+        for row, field in enumerate(ServerListModel.FIELDS, start=1):
+            label = ServerListModel.HEADINGS[field] + (" (first)" if field in ServerListModel.PORT_FIELDS else "") + ":"
+            customtkinter.CTkLabel(self, text=label).grid(row=row, column=0, sticky=tk.W, padx=10, pady=2)
+            customtkinter.CTkEntry(self, textvariable=self.fields[field]).grid(row=row, column=1, sticky="ew", padx=10, pady=2)
+        last = len(ServerListModel.FIELDS) + 1
+        customtkinter.CTkCheckBox(self, text="Give each server the next IP address", variable=self.increment_ip).grid(
+            row=last, column=0, columnspan=2, sticky=tk.W, padx=10, pady=5)
+        customtkinter.CTkLabel(self, text="Ports already used by another server are skipped.", text_color="gray60").grid(
+            row=last + 1, column=0, columnspan=2, sticky=tk.W, padx=10)
+        customtkinter.CTkButton(self, text="Generate", command=self.generate).grid(row=last + 2, column=0, columnspan=2, pady=10)
+        self.grab_set()
+
+    def generate(self):
+        count = self.count.get().strip()
+        if not count.isdigit() or not 0 < int(count) <= 1000:
+            messagebox.showerror("Generate Servers", "Enter a number of servers between 1 and 1000.", parent=self)
+            return
+        template = {field: var.get() for field, var in self.fields.items()}
+        if self.parent.generate_servers(int(count), template, self.increment_ip.get()):
+            self.destroy()
+
 class CommandEditorWindow(customtkinter.CTkToplevel):
-    def __init__(self, parent, project_path):
+    def __init__(self, parent, project_path, index_cache):
         super().__init__(parent)
         self.title("Command Permission Editor")
         self.geometry("900x600")
         self.transient(parent)
 
         self.project_path = project_path
+        self.index_cache = index_cache
+        self.log = parent.log
+        self.tasks = parent.tasks
+        self.loading = False
         self.commands = {}
+        self.table = CommandTableModel({})
+        self.sort_column = "Command"
+        self.sort_descending = False
+        self.row_values = {}
+        self.row_tags = {}
         self.command_files_path = os.path.join(self.project_path, 'MicrovoltsEmulator', 'MainServer', 'include', 'ChatCommands', 'Commands')
         self.player_enums_path = os.path.join(self.project_path, 'MicrovoltsEmulator', 'Common', 'include', 'Enums', 'PlayerEnums.h')
 
         self.grades = self.load_grades()
         
-        self.style = ttk.Style(self)
-        self.style.theme_use("default")
-        self.style.configure("Treeview", background="#2a2d2e", foreground="white", fieldbackground="#2a2d2e", borderwidth=0, rowheight=25)
-        self.style.map("Treeview", background=[('selected', '#24527a')])
-        self.style.configure("Treeview.Heading", background="#565b5e", foreground="white", relief="flat", font=('Calibri', 10, 'bold'))
-        self.style.map("Treeview.Heading", background=[('active', '#3484F0')])
+        self.style = configure_treeview_style(self)
 
         self.main_frame = customtkinter.CTkFrame(self, fg_color="transparent")
         self.main_frame.pack(fill="both", expand=True, padx=10, pady=10)
         self.main_frame.grid_columnconfigure(0, weight=1)
-        self.main_frame.grid_rowconfigure(0, weight=1)
+        self.main_frame.grid_rowconfigure(1, weight=1)
 
         self.create_widgets()
         self.load_commands()
@@ -1601,7 +2673,7 @@ class CommandEditorWindow(customtkinter.CTkToplevel):
         button_frame = customtkinter.CTkFrame(self, fg_color="transparent")
         button_frame.pack(fill="x", pady=10, padx=10)
         
-        instructions = "Double-click a permission to change it. Your changes are temporary until you click 'Save Changes'."
+        instructions = "Double-click a permission to change it, or select rows and use 'Set Grade for Selected'. Your changes are temporary until you click 'Save Changes'."
         customtkinter.CTkLabel(button_frame, text=instructions, text_color="gray60").pack(side="left", expand=True, fill="x")
         
         save_button = customtkinter.CTkButton(button_frame, text="Save Changes", command=self.save_changes)
@@ -1609,73 +2681,79 @@ class CommandEditorWindow(customtkinter.CTkToplevel):
 
     def load_grades(self):
         try:
-            with open(self.player_enums_path, 'r') as f:
-                content = f.read()
-            
-            enum_content_match = re.search(r'enum\s+PlayerGrade\s*{([^}]+)}', content)
-            if not enum_content_match:
-                raise ValueError("PlayerGrade enum not found")
-
-            enum_content = enum_content_match.group(1)
-            grade_regex = re.compile(r'(\w+)\s*=\s*\d+')
-            grades = grade_regex.findall(enum_content)
-            
-            if not grades:
-                raise ValueError("No grades found in PlayerGrade enum")
-
-            return grades
+            return self.index_cache.load_grades(self.player_enums_path)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load player grades from PlayerEnums.h:\n{e}")
             self.destroy()
             return []
 
     def load_commands(self):
-        description_regex = re.compile(r'ICommand\s*{\s*[^,]+,\s*"([^"]+)"')
-        permission_regex = re.compile(r"REGISTER_CMD\(\s*(\w+)\s*,\s*Common::Enums::PlayerGrade::(\w+)\)")
-
         if not os.path.isdir(self.command_files_path):
             messagebox.showerror("Error", f"Commands directory not found at:\n{self.command_files_path}")
             self.destroy()
             return
 
-        for filepath in glob.glob(os.path.join(self.command_files_path, "*.h")):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-                matches = permission_regex.finditer(content)
-                for match in matches:
-                    command_name = match.group(1)
-                    permission = match.group(2)
-                    
-                    class_def_search_area = content[:match.start()]
-                    
-                    class_regex = re.compile(r"(?:class|struct)\s+" + re.escape(command_name) + r"\s*(?:final)?\s*:\s*public")
-                    class_match = class_regex.search(class_def_search_area)
-                    
-                    if class_match:
-                        constructor_area = class_def_search_area[class_match.start():]
-                        desc_match = description_regex.search(constructor_area)
-                        if desc_match:
-                            description = desc_match.group(1)
-                            self.commands[command_name] = {
-                                "file": filepath,
-                                "permission": permission,
-                                "description": description,
-                                "original_permission": permission
-                            }
-        
+        if self.loading:
+            return
+        # A cold cache parses every header, so the scan runs on the task pool.
+        self.loading = True
+        self.match_count_label.configure(text="Loading commands...")
+        self.tasks.submit(self.scan_commands, on_done=self.on_commands_loaded, on_error=self.on_commands_failed)
+
+    def scan_commands(self):
+        """Runs on the task pool: parses new or changed headers and saves the index cache."""
+        commands = build_command_table(self.index_cache.load_directory(self.command_files_path))
+        reused, parsed, dropped = self.index_cache.last_scan
+        if parsed or dropped:
+            self.log(f"Command index: {parsed} header(s) parsed, {reused} cached, {dropped} removed.")
+        try:
+            self.index_cache.save()
+        except OSError as e:
+            self.log(f"Warning: Could not save command index cache: {e}")
+        return commands
+
+    def on_commands_loaded(self, commands):
+        self.loading = False
+        if not self.winfo_exists():
+            return
+        self.commands = commands
         self.populate_tree()
 
+    def on_commands_failed(self, error):
+        self.loading = False
+        self.log(f"Error loading commands: {error}")
+        if self.winfo_exists():
+            self.match_count_label.configure(text="")
+            messagebox.showerror("Error", f"Failed to load commands:\n{error}", parent=self)
+
     def create_widgets(self):
+        filter_frame = customtkinter.CTkFrame(self.main_frame, fg_color="transparent")
+        filter_frame.grid(row=0, column=0, sticky="ew", pady=(0, 5))
+        filter_frame.grid_columnconfigure(1, weight=1)
+
+        customtkinter.CTkLabel(filter_frame, text="Filter:").grid(row=0, column=0, padx=(0, 5))
+        self.filter_text = tk.StringVar()
+        self.filter_text.trace_add("write", lambda *args: self.apply_filter())
+        customtkinter.CTkEntry(filter_frame, textvariable=self.filter_text).grid(row=0, column=1, sticky="ew", padx=(0, 5))
+        self.grade_filter = customtkinter.CTkOptionMenu(filter_frame, values=["All Grades"] + self.grades, width=140,
+                                                        command=lambda value: self.apply_filter())
+        self.grade_filter.grid(row=0, column=2, padx=5)
+        self.bulk_grade = customtkinter.CTkOptionMenu(filter_frame, values=self.grades or [""], width=140)
+        self.bulk_grade.grid(row=0, column=3, padx=5)
+        customtkinter.CTkButton(filter_frame, text="Set Grade for Selected", width=160,
+                                command=self.set_grade_for_selection).grid(row=0, column=4, padx=(5, 0))
+        self.match_count_label = customtkinter.CTkLabel(filter_frame, text="", text_color="gray60")
+        self.match_count_label.grid(row=1, column=0, columnspan=5, sticky="w")
+
         tree_frame = customtkinter.CTkFrame(self.main_frame, fg_color="transparent")
-        tree_frame.grid(row=0, column=0, sticky="nsew")
+        tree_frame.grid(row=1, column=0, sticky="nsew")
         tree_frame.grid_columnconfigure(0, weight=1)
         tree_frame.grid_rowconfigure(0, weight=1)
 
-        self.tree = ttk.Treeview(tree_frame, columns=("Command", "Description", "Permission"), show="headings")
-        self.tree.heading("Command", text="Command")
-        self.tree.heading("Description", text="Description / Usage")
-        self.tree.heading("Permission", text="Permission")
+        self.tree = ttk.Treeview(tree_frame, columns=("Command", "Description", "Permission"), show="headings", selectmode="extended")
+        for column in CommandTableModel.COLUMNS:
+            self.tree.heading(column, command=lambda c=column: self.sort_by(c))
+        self.update_headings()
 
         self.tree.column("Command", width=150, stretch=False, anchor="w")
         self.tree.column("Description", width=450, anchor="w")
@@ -1692,12 +2770,71 @@ class CommandEditorWindow(customtkinter.CTkToplevel):
 
         self.tree.bind("<Double-1>", self.on_double_click)
 
+    def update_headings(self):
+        titles = {"Command": "Command", "Description": "Description / Usage", "Permission": "Permission"}
+        for column, title in titles.items():
+            arrow = (" \u25bc" if self.sort_descending else " \u25b2") if column == self.sort_column else ""
+            self.tree.heading(column, text=title + arrow)
+
     def populate_tree(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        for i, (name, data) in enumerate(sorted(self.commands.items())):
+        """Syncs tree items with self.commands, touching only rows that were added, removed or changed."""
+        self.table = CommandTableModel(self.commands, self.grades)
+        # Filtered-out rows are detached rather than deleted, so row_values lists every item.
+        removed = set(self.row_values) - set(self.commands)
+        if removed:
+            self.tree.delete(*removed)
+            for name in removed:
+                del self.row_values[name]
+                self.row_tags.pop(name, None)
+        for name, data in self.commands.items():
+            values = (name, data['description'], data['permission'])
+            if name not in self.row_values:
+                self.tree.insert("", "end", values=values, iid=name)
+            elif self.row_values[name] != values:
+                self.tree.item(name, values=values)
+            self.row_values[name] = values
+        self.apply_filter()
+
+    def apply_filter(self):
+        """Shows the matching rows in sort order with a single children call on the tree."""
+        grade = self.grade_filter.get()
+        names = self.table.filter(self.filter_text.get(), None if grade == "All Grades" else grade,
+                                  self.sort_column, self.sort_descending)
+        self.tree.set_children("", *names)
+        for i, name in enumerate(names):
             tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-            self.tree.insert("", "end", values=(name, data['description'], data['permission']), tags=(tag,), iid=name)
+            if self.row_tags.get(name) != tag:
+                self.tree.item(name, tags=(tag,))
+                self.row_tags[name] = tag
+        self.match_count_label.configure(text=f"{len(names)} of {len(self.commands)} commands")
+
+    def sort_by(self, column):
+        if column == self.sort_column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column, self.sort_descending = column, False
+        self.update_headings()
+        self.apply_filter()
+
+    def set_permission(self, names, grade):
+        changed = self.table.set_permission(names, grade)
+        for name in changed:
+            self.tree.set(name, "Permission", grade)
+            self.row_values[name] = (name, self.commands[name]['description'], grade)
+        if changed and (self.sort_column == "Permission" or self.grade_filter.get() != "All Grades"):
+            self.apply_filter()
+        return changed
+
+    def set_grade_for_selection(self):
+        # Rows hidden by the filter may still be selected; only change what is on screen.
+        visible = set(self.tree.get_children(""))
+        selected = [name for name in self.tree.selection() if name in visible]
+        grade = self.bulk_grade.get()
+        if not selected or not grade:
+            messagebox.showinfo("No Selection", "Select one or more commands first (Ctrl/Shift-click to select several).", parent=self)
+            return
+        changed = self.set_permission(selected, grade)
+        self.match_count_label.configure(text=f"Set {len(changed)} of {len(selected)} selected command(s) to {grade}")
 
     def on_double_click(self, event):
         if hasattr(self, '_editor') and self._editor.winfo_exists():
@@ -1721,9 +2858,8 @@ class CommandEditorWindow(customtkinter.CTkToplevel):
 
         def on_combo_select(event):
             new_permission = self._editor.get()
-            self.tree.set(rowid, "Permission", new_permission)
             command_name = self.tree.item(rowid, "values")[0]
-            self.commands[command_name]['permission'] = new_permission
+            self.set_permission([command_name], new_permission)
             self._editor.destroy()
 
         def on_focus_out(event):
@@ -1735,138 +2871,2309 @@ class CommandEditorWindow(customtkinter.CTkToplevel):
         self._editor.bind("<Escape>", lambda e: self._editor.destroy())
 
     def save_changes(self):
-        changed_files = set()
+        changes_by_file = {}
         for name, data in self.commands.items():
             if data['permission'] != data['original_permission']:
-                filepath = data['file']
-                
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        content = f.read()
-
-                    old_line = f"REGISTER_CMD({name}, Common::Enums::PlayerGrade::{data['original_permission']})"
-                    new_line = f"REGISTER_CMD({name}, Common::Enums::PlayerGrade::{data['permission']})"
-                    
-                    if old_line in content:
-                        content = content.replace(old_line, new_line, 1)
-                        with open(filepath, 'w', encoding='utf-8') as f:
-                            f.write(content)
-                        
-                        data['original_permission'] = data['permission']
-                        changed_files.add(os.path.basename(filepath))
-                    else:
-                        messagebox.showwarning("Warning", f"Could not find the line to update for command '{name}' in {os.path.basename(filepath)}. It might have been modified externally or the file has changed.")
-
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to save changes for {name} in {os.path.basename(filepath)}.\n\nError: {e}")
+                changes_by_file.setdefault(data['file'], {})[name] = (data.get('offset'), data['original_permission'], data['permission'])
 
+        changed_files = set()
+        for filepath, changes in changes_by_file.items():
+            try:
+                missing = apply_permission_changes(filepath, changes)
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save changes for {', '.join(sorted(changes))} in {os.path.basename(filepath)}.\n\nError: {e}")
+                continue
+            for name in missing:
+                messagebox.showwarning("Warning", f"Could not find the line to update for command '{name}' in {os.path.basename(filepath)}. It might have been modified externally or the file has changed.")
+            for name in set(changes) - set(missing):
+                self.commands[name]['original_permission'] = self.commands[name]['permission']
+            if len(missing) < len(changes):
+                changed_files.add(filepath)
 
         if changed_files:
-            messagebox.showinfo("Success", f"Changes saved successfully to:\n\n" + "\n".join(sorted(list(changed_files))))
+            # Grade names differ in length, so later sites in the rewritten headers moved.
+            fresh = build_command_table(self.index_cache.load_directory(self.command_files_path))
+            for name, data in self.commands.items():
+                if data['file'] in changed_files and name in fresh:
+                    data['offset'] = fresh[name]['offset']
+            try:
+                self.index_cache.save()
+            except OSError as e:
+                self.log(f"Warning: Could not save command index cache: {e}")
+
+            saved = "\n".join(sorted(os.path.basename(path) for path in changed_files))
+            if messagebox.askyesno("Success", f"Changes saved successfully to:\n\n{saved}\n\n"
+                                              "Rebuild MainServer now and restart its running instances to apply them?"):
+                self.master.rebuild_main_server()
         else:
             messagebox.showinfo("No Changes", "No permissions were changed.")
         
         self.withdraw()
 
+class SetupStep:
+    """One entry of the setup pipeline, with the inputs that decide whether it has to run again.
+
+    The fingerprint covers the listed config values, the contents of the listed files
+    (relative to the install directory), the identity of the listed tools on PATH and
+    a revision string to bump when the step's own behaviour changes.
+    """
+
+    def __init__(self, name, func, is_process, config_keys=(), files=(), tools=(), depends=(), revision="1", artifacts=()):
+        self.name = name
+        self.func = func
+        self.is_process = is_process
+        self.config_keys = tuple(config_keys)
+        self.files = tuple(files)
+        self.tools = tuple(tools)
+        self.depends = tuple(depends)
+        self.revision = revision
+        self.artifacts = tuple(artifacts)
+
+    def cached_artifacts(self, config):
+        """Paths (relative to the install directory unless absolute) the step would reuse if it ran now."""
+        project_path = config.get('project_path') or ""
+        present = [path for path in self.artifacts if os.path.exists(os.path.join(project_path, path))]
+        present += [tool for tool in self.tools if tool_identity(tool) != "missing"]
+        return present
+
+    def fingerprint(self, config, file_hashes):
+        project_path = config.get('project_path') or ""
+        inputs = {
+            'revision': self.revision,
+            'config': {key: config.get(key) for key in self.config_keys},
+            'files': {path: file_digest(os.path.join(project_path, path), file_hashes) for path in self.files},
+            'tools': {tool: tool_identity(tool) for tool in self.tools},
+        }
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+def file_digest(path, cache):
+    """sha256 of a file, memoized in `cache` by path, size and mtime so unchanged files are never re-read."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "missing"
+    cached = cache.get(path)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    cache[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+    return cache[path][2]
+
+def read_ccache_stats(ccache_path, env):
+    """Cumulative {'hits', 'misses', 'uncacheable', 'size'} from `ccache --print-stats`, or None if ccache fails."""
+    try:
+        result = subprocess.run([ccache_path, "--print-stats"], env=env, capture_output=True, text=True, check=True,
+                                creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    counters = {}
+    for line in result.stdout.splitlines():
+        key, _, value = line.partition("\t")
+        if value.strip().isdigit():
+            counters[key] = int(value)
+    hits = counters.get("direct_cache_hit", 0) + counters.get("preprocessed_cache_hit", 0)
+    misses = counters.get("cache_miss", 0)
+    # Calls ccache passed straight to the compiler: unsupported options, multiple sources, no output file...
+    uncacheable = sum(value for key, value in counters.items()
+                      if key.startswith(("unsupported_", "could_not_", "multiple_source_files", "no_input_file",
+                                         "compiler_produced_", "output_to_stdout", "called_for_", "autoconf_test")))
+    return {'hits': hits, 'misses': misses, 'uncacheable': uncacheable, 'size': counters.get("cache_size_kibibyte", 0) * 1024}
+
+def format_compiler_cache_stats(stats):
+    cacheable = stats['hits'] + stats['misses']
+    rate = f" ({stats['hits'] * 100 // cacheable}% hit rate)" if cacheable else ""
+    uncacheable = f", {stats['uncacheable']} uncacheable" if stats['uncacheable'] else ""
+    return f"{stats['hits']} hits, {stats['misses']} misses{rate}{uncacheable}, cache size {stats['size'] / (1 << 30):.2f} GB"
+
+def tool_identity(tool):
+    """Identifies the tool found on PATH by location, size and mtime, which changes on upgrade without running it."""
+    path = shutil.which(tool)
+    if not path:
+        return "missing"
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "missing"
+    return f"{os.path.normcase(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+class ServerListModel:
+    """The Multi-Server tab's servers as plain dicts of strings, one per extra MainServer/CastServer pair."""
+
+    FIELDS = ("main_local_ip", "main_public_ip", "main_port", "main_ipc_port",
+              "cast_local_ip", "cast_public_ip", "cast_port", "cast_ipc_port")
+    HEADINGS = {
+        "main_local_ip": "Main Local IP", "main_public_ip": "Main Public IP",
+        "main_port": "Main Port", "main_ipc_port": "Main IPC",
+        "cast_local_ip": "Cast Local IP", "cast_public_ip": "Cast Public IP",
+        "cast_port": "Cast Port", "cast_ipc_port": "Cast IPC",
+    }
+    PORT_FIELDS = ("main_port", "main_ipc_port", "cast_port", "cast_ipc_port")
+    # Server 1 (AuthServer plus the first MainServer/CastServer pair) is set on the Server Config tab.
+    PRIMARY_PORTS = {"auth_port": "13000", "auth_ipc_port": "13001", "main_port": "13002",
+                     "main_ipc_port": "13003", "cast_port": "13004", "cast_ipc_port": "13005"}
+    PRIMARY_HEADINGS = {"auth_port": "Auth Port", "auth_ipc_port": "Auth IPC", "main_port": "Main Port",
+                        "main_ipc_port": "Main IPC", "cast_port": "Cast Port", "cast_ipc_port": "Cast IPC"}
+
+    def __init__(self, rows=()):
+        self.rows = [self.normalize(row) for row in rows]
+
+    @classmethod
+    def normalize(cls, data):
+        return {field: str(data.get(field) or "").strip() for field in cls.FIELDS}
+
+    @classmethod
+    def is_blank(cls, row):
+        """True for a row nothing was entered in yet, like a fresh "+ Add Server" row."""
+        return not any(row.get(field) for field in cls.FIELDS)
+
+    def to_list(self):
+        return [dict(row) for row in self.rows]
+
+    def replace(self, rows):
+        self.rows = [self.normalize(row) for row in rows]
+
+    def add(self, row=None):
+        self.rows.append(self.normalize(row or {}))
+        return len(self.rows) - 1
+
+    def remove(self, indexes):
+        for index in sorted(set(indexes), reverse=True):
+            del self.rows[index]
+
+    def set(self, index, field, value):
+        value = str(value).strip()
+        if field in self.PORT_FIELDS and value and not (value.isdigit() and 0 < int(value) < 65536):
+            raise ValueError(f"'{value}' is not a valid port")
+        self.rows[index][field] = value
+
+    def used_ports(self):
+        return {int(row[field]) for row in self.rows for field in self.PORT_FIELDS if row[field].isdigit()}
+
+    def generate(self, count, template, increment_ip=False):
+        """Appends `count` servers based on `template`, giving each the next ports nobody uses yet.
+
+        Every port field starts at the template's value and moves up past ports already taken
+        by any server. With increment_ip, the i-th new server gets the template IPs plus i, so
+        none of them shares an address with the server the template was taken from.
+        """
+        used = self.used_ports()
+        cursors = {}
+        for field in self.PORT_FIELDS:
+            if not str(template.get(field, "")).isdigit():
+                raise ValueError(f"The template needs a numeric {self.HEADINGS[field]}")
+            cursors[field] = int(template[field])
+        new_rows = []
+        for i in range(count):
+            row = {}
+            for field in ("main_local_ip", "main_public_ip", "cast_local_ip", "cast_public_ip"):
+                address = str(template.get(field, "")).strip()
+                if increment_ip and address:
+                    address = str(ipaddress.ip_address(address) + i + 1)
+                row[field] = address
+            for field in self.PORT_FIELDS:
+                port = cursors[field]
+                while port in used:
+                    port += 1
+                if port > 65535:
+                    raise ValueError(f"Ran out of ports for {self.HEADINGS[field]}")
+                used.add(port)
+                row[field] = str(port)
+                cursors[field] = port + 1
+            new_rows.append(self.normalize(row))
+        self.rows.extend(new_rows)
+        return new_rows
+
+    def export(self, path):
+        """Writes the servers as CSV (one column per field) or, for any other extension, as a JSON list."""
+        if path.lower().endswith(".csv"):
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+                writer.writeheader()
+                writer.writerows(self.rows)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_list(), f, indent=4)
+
+    @classmethod
+    def read_file(cls, path):
+        """Reads servers from a CSV or JSON export, or from the 'servers' list of a saved mv_setup_config.json."""
+        if path.lower().endswith(".csv"):
+            with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+                reader = csv.DictReader(f)
+                if not set(reader.fieldnames or ()) & set(cls.FIELDS):
+                    raise ValueError(f"No known columns; expected some of: {', '.join(cls.FIELDS)}")
+                rows = list(reader)
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            rows = data.get("servers", []) if isinstance(data, dict) else data
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise ValueError("Expected a list of server objects")
+        model = cls()
+        for number, row in enumerate(rows, start=1):
+            index = model.add()
+            for field in cls.FIELDS:
+                try:
+                    model.set(index, field, row.get(field) or "")
+                except ValueError as e:
+                    raise ValueError(f"Row {number}: {e}")
+        return model.rows
+
+class PortAllocator:
+    """Checks the Multi-Server ports for clashes and hands out free port blocks.
+
+    Every instance needs a block of four ports (MainServer, its IPC port, CastServer and its
+    IPC port). Reserved ports are kept as sorted, merged intervals, so testing a port is a
+    bisect, and a whole config is checked in one pass over a port -> users index. Claimed
+    ports ({port: owner}) are reserved ports that belong to something named, like Server 1.
+    """
+
+    DEFAULTS = {"range_start": 13000, "range_end": 19999, "reserved": []}
+    BLOCK_SIZE = len(ServerListModel.PORT_FIELDS)
+
+    def __init__(self, range_start=13000, range_end=19999, reserved=(), claimed=None):
+        self.claimed = dict(claimed or {})
+        self.range_start = int(range_start)
+        self.range_end = int(range_end)
+        if not 0 < self.range_start <= self.range_end < 65536:
+            raise ValueError(f"Invalid port range {self.range_start}-{self.range_end}")
+        intervals = []
+        for entry in reserved:
+            # Entries are a port, "low-high" or [low, high].
+            if isinstance(entry, str) and "-" in entry:
+                low, high = entry.split("-", 1)
+            elif isinstance(entry, (list, tuple)):
+                low, high = entry
+            else:
+                low = high = entry
+            intervals.append((int(low), int(high)))
+        self.intervals = []
+        for low, high in sorted(intervals):
+            if self.intervals and low <= self.intervals[-1][1] + 1:
+                self.intervals[-1] = (self.intervals[-1][0], max(high, self.intervals[-1][1]))
+            else:
+                self.intervals.append((low, high))
+        self._starts = [low for low, _ in self.intervals]
+
+    @classmethod
+    def from_config(cls, allocation_config, extra_reserved=(), primary_ports=None):
+        """Builds an allocator from the 'port_allocation' section of mv_setup_config.json.
+
+        primary_ports are Server 1's ports from the Server Config tab; they are claimed.
+        """
+        settings = dict(cls.DEFAULTS)
+        settings.update(allocation_config)
+        claimed = {int(port): f"Server 1 {ServerListModel.PRIMARY_HEADINGS[field]}"
+                   for field, port in (primary_ports or {}).items() if str(port).isdigit()}
+        return cls(settings["range_start"], settings["range_end"], list(settings["reserved"]) + list(extra_reserved), claimed)
+
+    def is_reserved(self, port):
+        i = bisect.bisect_right(self._starts, port) - 1
+        return i >= 0 and port <= self.intervals[i][1]
+
+    def check(self, rows, bound=()):
+        """Returns {(row index, field): problem} for ports that are shared, reserved or already bound on the host."""
+        users = {}
+        for index, row in enumerate(rows):
+            for field in ServerListModel.PORT_FIELDS:
+                if row[field].isdigit():
+                    users.setdefault(int(row[field]), []).append((index, field))
+        problems = {}
+        for port, owners in users.items():
+            if len(owners) > 1:
+                for owner in owners:
+                    others = [f"Server {index + 2} {ServerListModel.HEADINGS[field]}" for index, field in owners if (index, field) != owner]
+                    problems[owner] = f"port {port} is also used by {', '.join(others[:2])}" + (" and others" if len(others) > 2 else "")
+            elif port in self.claimed:
+                problems[owners[0]] = f"port {port} is also used by {self.claimed[port]}"
+            elif self.is_reserved(port):
+                problems[owners[0]] = f"port {port} is reserved"
+            elif port in bound:
+                problems[owners[0]] = f"port {port} is already in use on this host"
+        return problems
+
+    def allocate(self, rows, bound=()):
+        """Gives every row with a missing or conflicting port a fresh block; returns the changed row indexes.
+
+        Rows whose four ports are all valid keep them, and their ports are never handed out.
+        When rows share a port, the first one keeps it and only the later ones move, so the
+        instance that is probably running on it is left alone. Every block is found before
+        any row changes, so a ValueError leaves `rows` untouched.
+        """
+        taken = set(bound) | set(self.claimed)
+        needs = []
+        for index, row in enumerate(rows):
+            ports = [row[field] for field in ServerListModel.PORT_FIELDS]
+            if all(port.isdigit() for port in ports):
+                ports = [int(port) for port in ports]
+                if len(set(ports)) == len(ports) and not any(port in taken or self.is_reserved(port) for port in ports):
+                    taken.update(ports)
+                    continue
+            needs.append(index)
+
+        port = self.range_start
+        blocks = []
+        for index in needs:
+            while True:
+                if port + self.BLOCK_SIZE - 1 > self.range_end:
+                    raise ValueError(f"Not enough free ports in {self.range_start}-{self.range_end} for {len(needs)} server(s)")
+                blocked = [p for p in range(port, port + self.BLOCK_SIZE) if p in taken or self.is_reserved(p)]
+                if not blocked:
+                    break
+                port = blocked[-1] + 1
+            blocks.append((index, port))
+            taken.update(range(port, port + self.BLOCK_SIZE))
+            port += self.BLOCK_SIZE
+
+        for index, first in blocks:
+            for field, assigned in zip(ServerListModel.PORT_FIELDS, range(first, first + self.BLOCK_SIZE)):
+                rows[index][field] = str(assigned)
+        return needs
+
+class ReleaseStore:
+    """Versioned copies of the build output that the servers are launched from.
+
+    Each release is a snapshot of a staged build's x64 directory, stored as
+    MicrovoltsEmulator/x64-<name>. Sitting next to x64 keeps paths relative to the
+    executable (../Setup/config.ini) resolving as they do for x64. releases.json lists
+    the releases, oldest first, and names the current one. A release that did not come
+    up during a rollout is marked failed and never offered as a rollback target.
+    """
+
+    # Intermediate build files that servers never load.
+    SKIP = ("*.obj", "*.pch", "*.ilk", "*.iobj", "*.ipdb", "*.idb", "*.tlog", "*.lastbuildstate", "*.log")
+
+    def __init__(self, repo_path, keep=3):
+        self.repo_path = repo_path
+        self.keep = keep
+        self.index_path = os.path.join(repo_path, "releases.json")
+        self.releases = []
+        self.current = None
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.releases = data.get('releases', [])
+            self.current = data.get('current')
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def path(self, name):
+        return os.path.join(self.repo_path, f"x64-{name}")
+
+    def current_release(self):
+        return next((release for release in self.releases
+                     if release['name'] == self.current and not release.get('failed')
+                     and os.path.isdir(self.path(release['name']))), None)
+
+    def current_dir(self):
+        return self.path(self.current) if self.current_release() else None
+
+    def previous(self):
+        """Name of the newest good release older than the current one that is still on disk, or None."""
+        names = [release['name'] for release in self.releases]
+        if self.current not in names:
+            return None
+        return next((release['name'] for release in reversed(self.releases[:names.index(self.current)])
+                     if not release.get('failed') and os.path.isdir(self.path(release['name']))), None)
+
+    def snapshot(self, build_dir, revision):
+        """Copies build_dir into a new release directory and returns the release name."""
+        return self.add(revision, lambda path: shutil.copytree(build_dir, path, ignore=shutil.ignore_patterns(*self.SKIP)))
+
+    def add(self, revision, populate):
+        """Creates a release; populate(path) fills the (not yet existing) directory. Returns the release name."""
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{revision[:8]}"
+        path = self.path(name)
+        temp_path = path + ".tmp"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        populate(temp_path)
+        os.replace(temp_path, path)
+        self.releases.append({'name': name, 'revision': revision, 'created': time.time()})
+        self.save()
+        return name
+
+    def activate(self, name):
+        self.current = name
+        self.save()
+
+    def mark_failed(self, name):
+        """Flags a release that did not come up and deletes its files; the entry stays as a record."""
+        for release in self.releases:
+            if release['name'] == name:
+                release['failed'] = True
+        shutil.rmtree(self.path(name), ignore_errors=True)
+        self.save()
+
+    def prune(self):
+        """Deletes all but the newest `keep` releases, always keeping the current and previous one."""
+        protected = {self.current, self.previous()}
+        kept = []
+        for index, release in enumerate(self.releases):
+            if not release.get('failed') and (release['name'] in protected or index >= len(self.releases) - self.keep):
+                kept.append(release)
+                continue
+            shutil.rmtree(self.path(release['name']), ignore_errors=True)
+            # A release an instance still runs from is locked on Windows; keep listing it until it can go.
+            if os.path.isdir(self.path(release['name'])):
+                kept.append(release)
+        if len(kept) != len(self.releases):
+            self.releases = kept
+            self.save()
+
+    def save(self):
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'current': self.current, 'releases': self.releases}, f, indent=4)
+        os.replace(temp_path, self.index_path)
+
+class ArtifactCache:
+    """Content-addressed store of build outputs, keyed by sources, configuration and toolchain.
+
+    Every distinct file is kept once in objects/<sha256[:2]>/<sha256>, however many builds
+    contain it; a build is a manifest in manifests/<key>.json mapping relative paths to
+    digests. When the objects exceed max_bytes, the least recently used builds are dropped
+    and objects no remaining build refers to are deleted.
+    """
+
+    def __init__(self, root, max_bytes=10 << 30):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(root, "objects")
+        self.manifests_dir = os.path.join(root, "manifests")
+
+    @staticmethod
+    def key(source, configuration, toolchain):
+        return hashlib.sha256(f"{source}\n{configuration}\n{toolchain}".encode('utf-8')).hexdigest()
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _manifest_path(self, key):
+        return os.path.join(self.manifests_dir, f"{key}.json")
+
+    def _write_json(self, path, data):
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+
+    def _manifests(self):
+        manifests = []
+        if os.path.isdir(self.manifests_dir):
+            for name in os.listdir(self.manifests_dir):
+                if name.endswith(".json"):
+                    try:
+                        with open(os.path.join(self.manifests_dir, name), 'r', encoding='utf-8') as f:
+                            manifests.append(json.load(f))
+                    except (OSError, ValueError):
+                        pass
+        return manifests
+
+    def lookup(self, key):
+        """Returns the manifest for key if every file it lists is still in the store, else None."""
+        try:
+            with open(self._manifest_path(key), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if all(os.path.isfile(self._object_path(digest)) for digest, _ in manifest['files'].values()):
+            return manifest
+        return None
+
+    def store(self, key, build_dir, ignore=(), **info):
+        """Adds the files under build_dir (minus `ignore` glob patterns) as build `key`.
+
+        Returns (manifest, bytes added, evicted keys).
+        """
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        files = {}
+        added = 0
+        for directory, _, names in os.walk(build_dir):
+            for name in names:
+                if any(fnmatch.fnmatch(name, pattern) for pattern in ignore):
+                    continue
+                path = os.path.join(directory, name)
+                digest = file_digest(path, {})
+                size = os.path.getsize(path)
+                files[os.path.relpath(path, build_dir).replace(os.sep, "/")] = [digest, size]
+                object_path = self._object_path(digest)
+                if not os.path.exists(object_path):
+                    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                    shutil.copyfile(path, object_path + ".tmp")
+                    os.replace(object_path + ".tmp", object_path)
+                    added += size
+        now = time.time()
+        manifest = dict(info, key=key, files=files, created=now, last_used=now)
+        self._write_json(self._manifest_path(key), manifest)
+        return manifest, added, self.evict(protect=key)
+
+    def restore(self, key, destination):
+        """Recreates build `key` under destination and marks it as recently used; returns the file count."""
+        manifest = self.lookup(key)
+        if manifest is None:
+            raise KeyError(key)
+        for relative_path, (digest, _) in manifest['files'].items():
+            path = os.path.join(destination, *relative_path.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(self._object_path(digest), path)
+        manifest['last_used'] = time.time()
+        self._write_json(self._manifest_path(key), manifest)
+        return len(manifest['files'])
+
+    def evict(self, protect=None):
+        """Drops least recently used builds until the unique objects fit max_bytes; returns the dropped keys."""
+        manifests = sorted(self._manifests(), key=lambda manifest: manifest.get('last_used', 0))
+        sizes = {}
+        references = {}
+        for manifest in manifests:
+            for digest, size in manifest['files'].values():
+                sizes[digest] = size
+            for digest in {digest for digest, _ in manifest['files'].values()}:
+                references[digest] = references.get(digest, 0) + 1
+        total = sum(sizes.values())
+
+        evicted = []
+        for manifest in manifests:
+            if total <= self.max_bytes:
+                break
+            if manifest['key'] == protect:
+                continue
+            try:
+                os.remove(self._manifest_path(manifest['key']))
+            except OSError:
+                continue
+            evicted.append(manifest['key'])
+            for digest in {digest for digest, _ in manifest['files'].values()}:
+                references[digest] -= 1
+                if references[digest] == 0:
+                    total -= sizes.pop(digest)
+                    try:
+                        os.remove(self._object_path(digest))
+                    except OSError:
+                        pass
+        return evicted
+
+class SupervisionPolicy:
+    """Restart and hang-detection settings for a single supervised server."""
+
+    DEFAULTS = {
+        "auto_restart": True,
+        "backoff_initial": 2.0,
+        "backoff_max": 120.0,
+        "backoff_multiplier": 2.0,
+        "backoff_reset_after": 300.0,
+        "crash_loop_limit": 5,
+        "crash_loop_window": 300.0,
+        "startup_grace": 30.0,
+        "probe_enabled": True,
+        "probe_host": "127.0.0.1",
+        "probe_port": None,
+        "probe_interval": 10.0,
+        "probe_timeout": 2.0,
+        "probe_failures": 3,
+        "silence_timeout": 1800.0,
+    }
+
+    def __init__(self, **settings):
+        unknown = set(settings) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown supervision settings: {', '.join(sorted(unknown))}")
+        for key, default in self.DEFAULTS.items():
+            setattr(self, key, settings.get(key, default))
+
+    @classmethod
+    def from_config(cls, supervision_config, server_name, **instance_defaults):
+        """Builds a policy from the 'supervision' section of mv_setup_config.json.
+
+        instance_defaults (the server's own probe_host and probe_port) apply unless the config sets them.
+        """
+        settings = dict(instance_defaults)
+        settings.update(supervision_config.get("default", {}))
+        settings.update(supervision_config.get(server_name, {}))
+        if not settings.get("probe_enabled", True):
+            settings["probe_port"] = None
+        return cls(**{k: v for k, v in settings.items() if k in cls.DEFAULTS})
+
 class ServerProcessManager:
-    def __init__(self, log_callback):
+    def __init__(self, log_callback, line_classifier=None, console_index_lines=250000):
         self.log = log_callback
+        self.line_classifier = line_classifier
+        self.console_index_lines = console_index_lines
+        self.console_indexes = {}
         self.processes = {}
         self.output_queues = {}
         self.server_names = []
         self.reader_threads = {}
-
-    def _reader_thread(self, stream, q):
+        self.archive = None
+
+        self.exe_paths = {}
+        self.policies = {}
+        self.instance_stats = {}
+        self.last_output = {}
+        self.events = queue.Queue()
+        self.lock = threading.RLock()
+        self._supervisor_thread = None
+        self._supervisor_stop = threading.Event()
+        self.metrics_snapshot = ()
+        self.notify = None
+        self.status_version = 0
+
+    def _reader_thread(self, stream, q, server_name, index):
         try:
             for line in iter(stream.readline, b''):
-                q.put(line.decode('utf-8', errors='replace'))
+                self.last_output[server_name] = time.time()
+                text = line.decode('utf-8', errors='replace')
+                level = self.line_classifier(server_name, text) if self.line_classifier else "DEFAULT"
+                # Both reader threads share the index; the lock keeps queue and index order identical.
+                with index.lock:
+                    seq = index.add(text, level)
+                    q.put((seq, text, level))
+                self._notify()
+                archive = self.archive
+                if archive is not None:
+                    archive.append(server_name, text)
         finally:
             stream.close()
 
-    def start_server(self, server_name, exe_path):
+    def _emit(self, event_type, server_name, message):
+        """Queues a supervisor event; the GUI drains these on the main thread."""
+        self.events.put({'type': event_type, 'server': server_name, 'message': message})
+        self._notify()
+
+    def _notify(self):
+        if self.notify is not None:
+            self.notify()
+
+    def _state_changed(self):
+        self.status_version += 1
+        self._notify()
+
+    def _new_stats(self):
+        return {
+            'state': "Stopped",
+            'restarts': 0,
+            'downtime': 0.0,
+            'down_since': None,
+            'started_at': None,
+            'last_exit_code': None,
+            'exit_times': deque(),
+            'backoff': None,
+            'next_restart_at': None,
+            'probe_failures': 0,
+            'next_probe_at': 0.0,
+        }
+
+    def _spawn(self, server_name, exe_path):
+        process = subprocess.Popen(
+            [exe_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=os.path.dirname(exe_path),
+            creationflags=subprocess.CREATE_NO_WINDOW
+        )
+        self.processes[server_name] = process
+
+        if server_name not in self.server_names:
+            self.server_names.append(server_name)
+
+        # The queue outlives restarts so the console keeps a single continuous history.
+        q = self.output_queues.setdefault(server_name, queue.Queue())
+        index = self.console_indexes.get(server_name)
+        if index is None:
+            index = self.console_indexes[server_name] = ConsoleIndex(self.console_index_lines)
+
+        stdout_thread = threading.Thread(target=self._reader_thread, args=(process.stdout, q, server_name, index))
+        stderr_thread = threading.Thread(target=self._reader_thread, args=(process.stderr, q, server_name, index))
+        stdout_thread.daemon = True
+        stderr_thread.daemon = True
+        stdout_thread.start()
+        stderr_thread.start()
+        self.reader_threads[server_name] = (stdout_thread, stderr_thread)
+
+        now = time.time()
+        stats = self.instance_stats.setdefault(server_name, self._new_stats())
+        if stats['down_since'] is not None:
+            stats['downtime'] += now - stats['down_since']
+            stats['down_since'] = None
+        stats['state'] = "Running"
+        stats['started_at'] = now
+        stats['probe_failures'] = 0
+        stats['next_probe_at'] = now + self.policies[server_name].startup_grace
+        stats['next_restart_at'] = None
+        self.last_output[server_name] = now
+        self._state_changed()
+        return process
+
+    def start_server(self, server_name, exe_path, policy=None):
+        """Starts and supervises one server; returns None, or the error message for the caller to show on the Tk thread."""
         if server_name in self.processes and self.processes[server_name].poll() is None:
             self.log(f"{server_name} is already running.")
-            return True
+            return None
 
         if not os.path.exists(exe_path):
             self.log(f"Error: Executable not found at {exe_path}")
-            messagebox.showerror("Server Error", f"Executable not found for {server_name} at:\n{exe_path}")
-            return False
+            return f"Executable not found for {server_name} at:\n{exe_path}"
 
         try:
             self.log(f"Starting {server_name} from {exe_path}...")
-            
-            process = subprocess.Popen(
-                [exe_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=os.path.dirname(exe_path),
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            self.processes[server_name] = process
-
-            if server_name not in self.server_names:
-                self.server_names.append(server_name)
-
-            q = queue.Queue()
-            self.output_queues[server_name] = q
-
-            stdout_thread = threading.Thread(target=self._reader_thread, args=(process.stdout, q))
-            stderr_thread = threading.Thread(target=self._reader_thread, args=(process.stderr, q))
-            stdout_thread.daemon = True
-            stderr_thread.daemon = True
-            stdout_thread.start()
-            stderr_thread.start()
-            self.reader_threads[server_name] = (stdout_thread, stderr_thread)
+            with self.lock:
+                self.exe_paths[server_name] = exe_path
+                self.policies[server_name] = policy or SupervisionPolicy()
+                stats = self.instance_stats.setdefault(server_name, self._new_stats())
+                stats['exit_times'].clear()
+                stats['backoff'] = None
+                process = self._spawn(server_name, exe_path)
+            self._ensure_supervisor()
 
             self.log(f"{server_name} started successfully (PID: {process.pid}).")
-            return True
+            return None
         except Exception as e:
             self.log(f"Failed to start {server_name}: {e}")
-            messagebox.showerror("Server Error", f"Failed to start {server_name}:\n{e}")
+            return f"Failed to start {server_name}:\n{e}"
+
+    def _kill_process(self, server_name, process, log=None):
+        log = log or self.log
+        try:
+            # Using taskkill is more forceful and ensures child processes are also terminated.
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], check=True, capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW)
+            return True
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            log(f"Failed to stop {server_name} via taskkill, falling back to terminate: {e}")
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                log(f"{server_name} did not terminate gracefully, killing.")
+                process.kill()
             return False
 
     def stop_server(self, server_name):
+        with self.lock:
+            # Removing the exe path takes the server out of supervision before it dies.
+            self.exe_paths.pop(server_name, None)
+            stats = self.instance_stats.get(server_name)
+            if stats:
+                stats['state'] = "Stopped"
+                stats['next_restart_at'] = None
+                stats['down_since'] = None
+            self._state_changed()
+
         if server_name in self.processes:
             process = self.processes[server_name]
             if process.poll() is None:
                 self.log(f"Stopping {server_name} (PID: {process.pid})...")
-                try:
-                    # Using taskkill is more forceful and ensures child processes are also terminated.
-                    subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], check=True, capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW)
+                if self._kill_process(server_name, process):
                     self.log(f"{server_name} stopped successfully.")
-                except (subprocess.CalledProcessError, FileNotFoundError) as e:
-                    self.log(f"Failed to stop {server_name} via taskkill, falling back to terminate: {e}")
-                    process.terminate()
-                    try:
-                        process.wait(timeout=5)
-                    except subprocess.TimeoutExpired:
-                        self.log(f"{server_name} did not terminate gracefully, killing.")
-                        process.kill()
-
-            del self.processes[server_name]
-            if server_name in self.output_queues:
-                del self.output_queues[server_name]
-            if server_name in self.reader_threads:
-                del self.reader_threads[server_name]
-        
+
+            with self.lock:
+                self.processes.pop(server_name, None)
+                if server_name in self.output_queues:
+                    del self.output_queues[server_name]
+                if server_name in self.reader_threads:
+                    del self.reader_threads[server_name]
+
+    def running_instances(self):
+        """Returns (name, exe_path, policy) for every supervised server, in start order."""
+        with self.lock:
+            return [(name, self.exe_paths[name], self.policies.get(name))
+                    for name in self.server_names if name in self.exe_paths]
+
     def stop_all_servers(self):
         self.log("Stopping all running servers...")
-        for server_name in list(self.processes.keys()):
+        for server_name in list(set(self.processes.keys()) | set(self.exe_paths.keys())):
             self.stop_server(server_name)
         self.log("All servers stopped.")
 
     def get_status(self, server_name):
+        stats = self.instance_stats.get(server_name)
+        if stats and stats['state'] in ("Restarting", "Parked", "Hung"):
+            return stats['state']
         if server_name in self.processes and self.processes[server_name].poll() is None:
             return "Running"
         return "Stopped"
 
+    def get_stats(self, server_name):
+        """Returns restart count, downtime and uptime for one server instance."""
+        stats = self.instance_stats.get(server_name)
+        if not stats:
+            return None
+        now = time.time()
+        downtime = stats['downtime']
+        if stats['down_since'] is not None:
+            downtime += now - stats['down_since']
+        running = self.get_status(server_name) == "Running"
+        return {
+            'state': self.get_status(server_name),
+            'restarts': stats['restarts'],
+            'downtime': downtime,
+            'uptime': now - stats['started_at'] if running and stats['started_at'] else 0.0,
+            'last_exit_code': stats['last_exit_code'],
+        }
+
+    def _ensure_supervisor(self):
+        if self._supervisor_thread and self._supervisor_thread.is_alive():
+            return
+        self._supervisor_stop.clear()
+        self._supervisor_thread = threading.Thread(target=self._supervise_loop, daemon=True)
+        self._supervisor_thread.start()
+
+    def shutdown(self):
+        self._supervisor_stop.set()
+
+    def _supervise_loop(self):
+        while not self._supervisor_stop.wait(1.0):
+            for server_name in list(self.exe_paths.keys()):
+                try:
+                    self._supervise(server_name)
+                except Exception as e:
+                    self._emit('log', server_name, f"Supervisor error for {server_name}: {e}")
+            self.publish_metrics()
+
+    def publish_metrics(self):
+        samples = []
+        for server_name in list(self.server_names):
+            stats = self.get_stats(server_name)
+            if stats is None:
+                continue
+            labels = {'server': server_name}
+            samples.append(("mv_server_up", labels, 1 if stats['state'] == "Running" else 0))
+            samples.append(("mv_server_state", {'server': server_name, 'state': stats['state']}, 1))
+            samples.append(("mv_server_restarts_total", labels, stats['restarts']))
+            samples.append(("mv_server_uptime_seconds", labels, stats['uptime']))
+            samples.append(("mv_server_downtime_seconds_total", labels, stats['downtime']))
+            q = self.output_queues.get(server_name)
+            samples.append(("mv_server_console_queue_depth", labels, q.qsize() if q else 0))
+        self.metrics_snapshot = tuple(samples)
+
+    def _supervise(self, server_name):
+        """One supervision pass over a server.
+
+        Port probes and kills can take seconds, so they run outside self.lock; whatever
+        they find is applied under the lock only if the same process is still supervised
+        (start_server/stop_server may have run in between).
+        """
+        with self.lock:
+            if server_name not in self.exe_paths:
+                return
+            now = time.time()
+            policy = self.policies[server_name]
+            stats = self.instance_stats[server_name]
+            process = self.processes.get(server_name)
+
+            if stats['state'] == "Parked":
+                return
+
+            if stats['state'] == "Restarting":
+                if now >= stats['next_restart_at']:
+                    try:
+                        process = self._spawn(server_name, self.exe_paths[server_name])
+                        stats['restarts'] += 1
+                        self._emit('log', server_name, f"{server_name} restarted (PID: {process.pid}, restart #{stats['restarts']}).")
+                    except Exception as e:
+                        self._emit('log', server_name, f"Failed to restart {server_name}: {e}")
+                        self._record_exit(server_name, policy, stats, now, None)
+                return
+
+            if process is None:
+                return
+
+            exit_code = process.poll()
+            if exit_code is not None:
+                self._emit('log', server_name, f"{server_name} exited with code {exit_code}.")
+                self._record_exit(server_name, policy, stats, now, exit_code)
+                return
+
+            if stats['backoff'] is not None and now - stats['started_at'] >= policy.backoff_reset_after:
+                stats['backoff'] = None
+
+            hang_reason = self._detect_hang(server_name, policy, stats, now)
+            probe = hang_reason is None and self._probe_due(policy, stats, now)
+
+        if probe:
+            responsive = probe_tcp_port(policy.probe_host, policy.probe_port, policy.probe_timeout)
+            with self.lock:
+                if not self._still_supervised(server_name, process):
+                    return
+                hang_reason = self._record_probe(policy, stats, responsive)
+
+        if not hang_reason:
+            return
+        with self.lock:
+            if not self._still_supervised(server_name, process):
+                return
+            stats['state'] = "Hung"
+        self._emit('log', server_name, f"{server_name} appears hung ({hang_reason}). Restarting.")
+        self._kill_process(server_name, process, log=lambda msg: self._emit('log', server_name, msg))
+        with self.lock:
+            if self._still_supervised(server_name, process):
+                self._record_exit(server_name, policy, stats, time.time(), process.poll())
+
+    def _still_supervised(self, server_name, process):
+        return server_name in self.exe_paths and self.processes.get(server_name) is process
+
+    def _detect_hang(self, server_name, policy, stats, now):
+        if now - stats['started_at'] < policy.startup_grace:
+            return None
+
+        if policy.silence_timeout:
+            silent_for = now - self.last_output.get(server_name, stats['started_at'])
+            if silent_for > policy.silence_timeout:
+                return f"no output for {int(silent_for)}s"
+        return None
+
+    def _probe_due(self, policy, stats, now):
+        if not policy.probe_port or now - stats['started_at'] < policy.startup_grace or now < stats['next_probe_at']:
+            return False
+        stats['next_probe_at'] = now + policy.probe_interval
+        return True
+
+    def _record_probe(self, policy, stats, responsive):
+        if responsive:
+            stats['probe_failures'] = 0
+            return None
+        stats['probe_failures'] += 1
+        if stats['probe_failures'] >= policy.probe_failures:
+            return f"port {policy.probe_port} unresponsive after {stats['probe_failures']} probes"
+        return None
+
+    def _record_exit(self, server_name, policy, stats, now, exit_code):
+        try:
+            self._apply_exit(server_name, policy, stats, now, exit_code)
+        finally:
+            self._state_changed()
+
+    def _apply_exit(self, server_name, policy, stats, now, exit_code):
+        stats['last_exit_code'] = exit_code
+        if stats['down_since'] is None:
+            stats['down_since'] = now
+        self.processes.pop(server_name, None)
+
+        exit_times = stats['exit_times']
+        exit_times.append(now)
+        while exit_times and now - exit_times[0] > policy.crash_loop_window:
+            exit_times.popleft()
+
+        if len(exit_times) >= policy.crash_loop_limit:
+            stats['state'] = "Parked"
+            self._emit('alert', server_name,
+                       f"{server_name} exited {len(exit_times)} times within {int(policy.crash_loop_window)}s. "
+                       f"Automatic restarts are paused until it is started manually.")
+            return
+
+        if not policy.auto_restart:
+            stats['state'] = "Stopped"
+            return
+
+        backoff = policy.backoff_initial if stats['backoff'] is None else min(stats['backoff'] * policy.backoff_multiplier, policy.backoff_max)
+        stats['backoff'] = backoff
+        stats['next_restart_at'] = now + backoff
+        stats['state'] = "Restarting"
+        self._emit('log', server_name, f"Restarting {server_name} in {backoff:g}s...")
+
+class UiNotifier:
+    """Wakes the Tk event loop when producers have data pending.
+
+    notify() may be called from any thread and never touches Tk itself: it sets an
+    event that a relay thread turns into a virtual <<UiWake>> event. The main thread
+    coalesces wakeups into at most one `callback` per frame, and a slow heartbeat
+    runs the callback anyway so periodic work still happens when idle.
+    """
+
+    def __init__(self, root, callback, frame_ms=16, heartbeat_ms=2000):
+        self.root = root
+        self.callback = callback
+        self.frame_ms = frame_ms
+        self.heartbeat_ms = heartbeat_ms
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._flush_scheduled = False
+        self._last_flush = 0.0
+        self.root.bind("<<UiWake>>", self._on_wake, add="+")
+        self._relay_thread = threading.Thread(target=self._relay, daemon=True)
+
+    def start(self):
+        self._relay_thread.start()
+        self._heartbeat()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def notify(self):
+        if not self._wake.is_set():
+            self._wake.set()
+
+    def _relay(self):
+        while not self._stopped.is_set():
+            self._wake.wait()
+            if self._stopped.is_set():
+                return
+            self._wake.clear()
+            try:
+                self.root.event_generate("<<UiWake>>", when="tail")
+            except (tk.TclError, RuntimeError):
+                # The main loop is not running yet (or is shutting down); retry shortly.
+                self._wake.set()
+                time.sleep(0.05)
+
+    def _on_wake(self, event=None):
+        if self._flush_scheduled:
+            return
+        self._flush_scheduled = True
+        elapsed_ms = (time.monotonic() - self._last_flush) * 1000
+        self.root.after(max(0, int(self.frame_ms - elapsed_ms)), self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        self._last_flush = time.monotonic()
+        self.callback()
+
+    def _heartbeat(self):
+        if self._stopped.is_set():
+            return
+        if not self._flush_scheduled:
+            self._flush()
+        self.root.after(self.heartbeat_ms, self._heartbeat)
+
+class TaskExecutor:
+    """Bounded thread pool for blocking work started from the Tk thread.
+
+    `dispatch(func, *args)` must run func on the Tk thread and be safe to call from any
+    thread; completion callbacks and call_sync() prompts all go through it.
+    """
+
+    def __init__(self, dispatch, log, max_workers=4):
+        self.dispatch = dispatch
+        self.log = log
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mv-task")
+        self.pending = set()
+        self.pending_lock = threading.Lock()
+
+    def submit(self, func, *args, on_done=None, on_error=None):
+        """Runs func(*args) on the pool; on_done(result) or on_error(exception) are called on the Tk thread."""
+        future = self.pool.submit(func, *args)
+        with self.pending_lock:
+            self.pending.add(future)
+        future.add_done_callback(self._forget)
+        future.add_done_callback(lambda f: self.dispatch(self._complete, f, func, on_done, on_error))
+        return future
+
+    def _forget(self, future):
+        with self.pending_lock:
+            self.pending.discard(future)
+
+    def _complete(self, future, func, on_done, on_error):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            if on_done is not None:
+                on_done(future.result())
+        elif on_error is not None:
+            on_error(error)
+        else:
+            self.log(f"Background task {getattr(func, '__name__', func)} failed: {error}")
+
+    def call_sync(self, func, *args):
+        """Runs func(*args) on the Tk thread and waits for the result; for dialogs raised from pool threads."""
+        if threading.current_thread() is threading.main_thread():
+            return func(*args)
+        result = concurrent.futures.Future()
+
+        def run():
+            try:
+                result.set_result(func(*args))
+            except BaseException as e:
+                result.set_exception(e)
+
+        self.dispatch(run)
+        return result.result()
+
+    def shutdown(self):
+        # shutdown(cancel_futures=True) needs Python 3.9; cancel queued tasks by hand for 3.7/3.8.
+        with self.pending_lock:
+            pending = list(self.pending)
+        for future in pending:
+            future.cancel()
+        self.pool.shutdown(wait=False)
+
+class LoopLagMonitor:
+    """Measures how late Tk runs a periodic after() callback, i.e. how long the main loop was blocked.
+
+    Final lags go into a histogram. A watchdog thread notices a tick that is overdue by
+    `stall_threshold_ms` while the stall is still happening and samples the main thread's
+    stack, so the report shows what the loop was stuck in rather than where it resumed.
+    Both wake up several times a second, so the monitor only runs between start() and stop().
+    """
+
+    HISTOGRAM_BUCKETS_MS = (16, 50, 100, 250, 500, 1000, 2000, 5000)
+
+    def __init__(self, root, interval_ms=100, frame_ms=16, history_seconds=600, stall_threshold_ms=200, max_stalls=20):
+        self.root = root
+        self.interval = interval_ms / 1000
+        self.frame = frame_ms / 1000
+        self.stall_threshold = stall_threshold_ms / 1000
+        self.samples = deque(maxlen=int(history_seconds / self.interval))
+        self.histogram = [0] * (len(self.HISTOGRAM_BUCKETS_MS) + 1)
+        self.stalls = deque(maxlen=max_stalls)
+        self._expected_at = None
+        self._after_id = None
+        self._open_stall = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self):
+        return self._after_id is not None
+
+    def start(self):
+        if self.running:
+            return
+        # A fresh event per run, so a watchdog from an earlier run can never outlive its stop().
+        self._stopped = threading.Event()
+        self._expected_at = time.perf_counter() + self.interval
+        self._after_id = self.root.after(int(self.interval * 1000), self._tick)
+        threading.Thread(target=self._watch, args=(self._stopped,), daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self._expected_at = None
+        self._open_stall = None
+
+    def _tick(self):
+        now = time.perf_counter()
+        lag = max(0.0, now - self._expected_at)
+        self.samples.append((now, lag))
+        self.histogram[bisect.bisect_left(self.HISTOGRAM_BUCKETS_MS, lag * 1000)] += 1
+        stall, self._open_stall = self._open_stall, None
+        if stall is not None:
+            stall['lag'] = lag
+        self._expected_at = now + self.interval
+        self._after_id = self.root.after(int(self.interval * 1000), self._tick)
+
+    def _watch(self, stopped):
+        main_thread_id = threading.main_thread().ident
+        sampled_for = None
+        while not stopped.wait(self.stall_threshold / 2):
+            expected_at = self._expected_at
+            if expected_at is None or expected_at == sampled_for:
+                continue
+            overdue = time.perf_counter() - expected_at
+            if overdue < self.stall_threshold:
+                continue
+            sampled_for = expected_at
+            frame = sys._current_frames().get(main_thread_id)
+            stall = {'at': time.time(), 'lag': overdue, 'stack': "".join(traceback.format_stack(frame)) if frame else ""}
+            self.stalls.append(stall)
+            self._open_stall = stall
+
+    def summary(self, seconds=60):
+        """Returns (max lag, number of ticks that were late by more than one frame) over the last `seconds`."""
+        since = time.perf_counter() - seconds
+        lags = [lag for at, lag in self.samples if at >= since]
+        return (max(lags) if lags else 0.0), sum(1 for lag in lags if lag > self.frame)
+
+    def report(self):
+        lines = ["Event loop lag histogram (since start):"]
+        lower = 0
+        for upper, count in zip(self.HISTOGRAM_BUCKETS_MS + (None,), self.histogram):
+            label = f"{lower}-{upper} ms" if upper is not None else f">{lower} ms"
+            lines.append(f"  {label:>14}: {count}")
+            lower = upper
+        lines.append("")
+        lines.append(f"Recent stalls over {self.stall_threshold * 1000:.0f} ms (newest last):")
+        for stall in list(self.stalls):
+            lines.append(f"--- {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stall['at']))}  "
+                         f"blocked for {stall['lag'] * 1000:.0f} ms")
+            lines.append(stall['stack'].rstrip())
+        if not self.stalls:
+            lines.append("  none")
+        return "\n".join(lines)
+
+class HotPathProfiler:
+    """Wraps selected methods with cProfile and timing while a session is active.
+
+    Methods are only replaced between start() and stop(), so there is no cost at all
+    when profiling is off. Every call is timed, but only one call at a time is profiled:
+    since Python 3.12 a second cProfile session on any thread raises ValueError, so nested
+    calls and calls from other threads (recompile_project on the task pool while the Tk
+    thread is profiled) are timed only.
+    """
+
+    def __init__(self, targets):
+        self.targets = targets
+        self.active = False
+        self.lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._local = threading.local()
+        self._originals = []
+        self.stats = None
+        self.timings = {}
+        self.started_at = None
+        self._memory_before = None
+
+    def start(self, trace_memory=True):
+        if self.active:
+            return
+        self.stats = None
+        self.timings = {}
+        self.started_at = time.time()
+        for owner, name in self.targets:
+            original = owner.__dict__[name]
+            self._originals.append((owner, name, original))
+            setattr(owner, name, self._wrap(f"{owner.__name__}.{name}", original))
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._memory_before = tracemalloc.take_snapshot()
+        self.active = True
+
+    def stop(self):
+        """Restores the original methods and returns the report text."""
+        if not self.active:
+            return ""
+        for owner, name, original in self._originals:
+            setattr(owner, name, original)
+        self._originals = []
+        memory_after = None
+        if self._memory_before is not None:
+            memory_after = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        self.active = False
+        report = self.report(memory_after)
+        self._memory_before = None
+        return report
+
+    def _wrap(self, label, func):
+        profiler = self
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return profiler._call(label, func, args, kwargs)
+        return wrapper
+
+    def _call(self, label, func, args, kwargs):
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        started_at = time.perf_counter()
+        try:
+            if depth or not self._profile_lock.acquire(blocking=False):
+                return func(*args, **kwargs)
+            try:
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                except ValueError:
+                    # Another profiling tool (a debugger, for one) owns the hook.
+                    return func(*args, **kwargs)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profile.disable()
+                    with self.lock:
+                        if self.stats is None:
+                            self.stats = pstats.Stats(profile)
+                        else:
+                            self.stats.add(profile)
+            finally:
+                self._profile_lock.release()
+        finally:
+            self._local.depth = depth
+            elapsed = time.perf_counter() - started_at
+            with self.lock:
+                calls, total, worst = self.timings.get(label, (0, 0.0, 0.0))
+                self.timings[label] = (calls + 1, total + elapsed, max(worst, elapsed))
+
+    def report(self, memory_after=None):
+        duration = time.time() - self.started_at
+        lines = [f"Hot path profile, {duration:.0f}s session started "
+                 f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at))}", ""]
+        lines.append(f"{'method':<45} {'calls':>8} {'total ms':>10} {'mean ms':>9} {'max ms':>9}")
+        with self.lock:
+            timings = sorted(self.timings.items(), key=lambda item: -item[1][1])
+            stats = self.stats
+        for label, (calls, total, worst) in timings:
+            lines.append(f"{label:<45} {calls:>8} {total * 1000:>10.1f} {total / calls * 1000:>9.2f} {worst * 1000:>9.1f}")
+        if stats is not None:
+            buffer = io.StringIO()
+            stats.stream = buffer
+            stats.sort_stats("cumulative").print_stats(40)
+            lines += ["", buffer.getvalue()]
+        if memory_after is not None and self._memory_before is not None:
+            lines.append("Top allocation growth during the session:")
+            for stat in memory_after.compare_to(self._memory_before, "lineno")[:15]:
+                lines.append(f"  {stat}")
+        return "\n".join(lines)
+
+class ProcResourceBackend:
+    """Reads process counters straight from /proc (Linux)."""
+
+    name = "procfs"
+
+    def __init__(self):
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+
+    @staticmethod
+    def available():
+        return os.path.isdir("/proc/self")
+
+    def read(self, pid):
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+        # The command name may contain spaces, so split after its closing parenthesis.
+        fields = stat[stat.rindex(b")") + 2:].split()
+        cpu_time = (int(fields[11]) + int(fields[12])) / self.clock_ticks
+        threads = int(fields[17])
+        rss = int(fields[21]) * self.page_size
+
+        io_read = io_write = 0.0
+        try:
+            with open(f"/proc/{pid}/io", "rb") as f:
+                for line in f:
+                    if line.startswith(b"read_bytes:"):
+                        io_read = float(line.split()[1])
+                    elif line.startswith(b"write_bytes:"):
+                        io_write = float(line.split()[1])
+        except OSError:
+            pass
+
+        try:
+            handles = len(os.listdir(f"/proc/{pid}/fd"))
+        except OSError:
+            handles = 0
+        return cpu_time, rss, threads, handles, io_read, io_write
+
+class PsutilResourceBackend:
+    """Portable backend used when psutil is installed (required on Windows)."""
+
+    name = "psutil"
+
+    def __init__(self):
+        self._processes = {}
+
+    @staticmethod
+    def available():
+        return psutil is not None
+
+    def read(self, pid):
+        process = self._processes.get(pid)
+        if process is None:
+            process = self._processes[pid] = psutil.Process(pid)
+        try:
+            with process.oneshot():
+                cpu = process.cpu_times()
+                rss = process.memory_info().rss
+                threads = process.num_threads()
+                handles = process.num_handles() if hasattr(process, "num_handles") else process.num_fds()
+                try:
+                    io = process.io_counters()
+                    io_read, io_write = float(io.read_bytes), float(io.write_bytes)
+                except (psutil.AccessDenied, AttributeError):
+                    io_read = io_write = 0.0
+        except psutil.Error as e:
+            self._processes.pop(pid, None)
+            raise OSError(str(e))
+        return cpu.user + cpu.system, rss, threads, handles, io_read, io_write
+
+    def forget(self, pid):
+        self._processes.pop(pid, None)
+
+class ResourceSampler:
+    """Samples CPU, memory, thread/handle counts and I/O for every managed server process.
+
+    Each server gets fixed-size ring buffers (one array('d') per series), so memory use is
+    constant no matter how long the servers run.
+    """
+
+    SERIES = ("cpu", "rss", "threads", "handles", "io_read", "io_write")
+    WINDOWS = (("1m", 60), ("5m", 300), ("1h", 3600))
+    SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+    def __init__(self, server_manager, interval=2.0, history_seconds=3600):
+        self.server_manager = server_manager
+        self.interval = interval
+        self.capacity = max(1, int(history_seconds / interval))
+        self.buffers = {}
+        self.generation = 0
+        self.backend = None
+        if psutil is not None:
+            self.backend = PsutilResourceBackend()
+        elif ProcResourceBackend.available():
+            self.backend = ProcResourceBackend()
+        self.notify = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self.backend is None or (self._thread and self._thread.is_alive()):
+            return self.backend is not None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _new_buffer(self):
+        buffer = {series: array('d', bytes(8 * self.capacity)) for series in self.SERIES}
+        buffer.update({'times': array('d', bytes(8 * self.capacity)), 'index': 0, 'count': 0,
+                       'pid': None, 'last_counters': None, 'last_sample_at': None})
+        return buffer
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample_once()
+
+    def sample_once(self):
+        now = time.monotonic()
+        for server_name, process in list(self.server_manager.processes.items()):
+            buffer = self.buffers.get(server_name)
+            if buffer is None:
+                buffer = self.buffers[server_name] = self._new_buffer()
+            if buffer['pid'] != process.pid:
+                if buffer['pid'] is not None and hasattr(self.backend, "forget"):
+                    self.backend.forget(buffer['pid'])
+                buffer['pid'] = process.pid
+                buffer['last_counters'] = None
+
+            try:
+                cpu_time, rss, threads, handles, io_read, io_write = self.backend.read(process.pid)
+            except (OSError, ValueError, IndexError):
+                continue
+
+            # CPU time and I/O bytes are cumulative counters; store them as rates.
+            cpu_percent = read_rate = write_rate = 0.0
+            last = buffer['last_counters']
+            if last is not None and now > buffer['last_sample_at']:
+                elapsed = now - buffer['last_sample_at']
+                cpu_percent = max(0.0, (cpu_time - last[0]) / elapsed * 100.0)
+                read_rate = max(0.0, (io_read - last[1]) / elapsed)
+                write_rate = max(0.0, (io_write - last[2]) / elapsed)
+            buffer['last_counters'] = (cpu_time, io_read, io_write)
+            buffer['last_sample_at'] = now
+
+            i = buffer['index']
+            buffer['times'][i] = now
+            buffer['cpu'][i] = cpu_percent
+            buffer['rss'][i] = rss
+            buffer['threads'][i] = threads
+            buffer['handles'][i] = handles
+            buffer['io_read'][i] = read_rate
+            buffer['io_write'][i] = write_rate
+            buffer['index'] = (i + 1) % self.capacity
+            buffer['count'] = min(buffer['count'] + 1, self.capacity)
+        self.generation += 1
+        if self.notify is not None:
+            self.notify()
+
+    def recent(self, server_name, series, samples):
+        """Returns up to `samples` most recent values of a series, oldest first."""
+        buffer = self.buffers.get(server_name)
+        if not buffer or not buffer['count']:
+            return []
+        samples = min(samples, buffer['count'])
+        end = buffer['index']
+        start = end - samples
+        values = buffer[series]
+        if start >= 0:
+            return values[start:end].tolist()
+        return values[start:].tolist() + values[:end].tolist()
+
+    def latest(self, server_name):
+        buffer = self.buffers.get(server_name)
+        if not buffer or not buffer['count']:
+            return None
+        i = (buffer['index'] - 1) % self.capacity
+        return {series: buffer[series][i] for series in self.SERIES}
+
+    def summary(self, server_name, series):
+        """Returns {window: (min, avg, max)} for the 1m/5m/1h windows."""
+        result = {}
+        for label, seconds in self.WINDOWS:
+            values = self.recent(server_name, series, max(1, int(seconds / self.interval)))
+            if values:
+                result[label] = (min(values), sum(values) / len(values), max(values))
+        return result
+
+    def sparkline(self, server_name, series="cpu", width=16):
+        values = self.recent(server_name, series, width)
+        if not values:
+            return ""
+        top = max(max(values), 1e-9)
+        last = len(self.SPARK_CHARS) - 1
+        return "".join(self.SPARK_CHARS[min(last, int(v / top * last))] for v in values)
+
+class MetricsExporter:
+    """Serves Prometheus text-format metrics from a background HTTP thread.
+
+    Sources are callables that return an already-built snapshot (a tuple of
+    (name, labels, value) samples). Producers replace their snapshot wholesale,
+    so a scrape only reads references and never waits on the supervisor or Tk.
+    """
+
+    METRICS = {
+        "mv_server_up": ("gauge", "Whether the server process is running (1) or not (0)."),
+        "mv_server_state": ("gauge", "Current supervisor state of the server."),
+        "mv_server_restarts_total": ("counter", "Automatic restarts performed by the supervisor."),
+        "mv_server_uptime_seconds": ("gauge", "Seconds since the current server process started."),
+        "mv_server_downtime_seconds_total": ("counter", "Accumulated seconds the server was down while supervised."),
+        "mv_server_console_queue_depth": ("gauge", "Output lines waiting to be drained into the console."),
+        "mv_server_log_lines_total": ("counter", "Server output lines by level."),
+        "mv_server_log_lines_per_second": ("gauge", "Server output lines per second by level over the last minute."),
+        "mv_setup_step_duration_seconds": ("gauge", "Duration of the last run of each setup step."),
+        "mv_setup_step_success": ("gauge", "Whether the last run of each setup step succeeded."),
+        "mv_build_duration_seconds": ("gauge", "Duration of the last project build."),
+        "mv_build_success": ("gauge", "Whether the last project build succeeded."),
+        "mv_builds_total": ("counter", "Project builds by result."),
+        "mv_build_compiler_cache_results": ("gauge", "Compiler cache hits, misses and uncacheable calls in the last build."),
+        "mv_ui_loop_lag_max_seconds": ("gauge", "Worst Tk event loop scheduling lag over the last minute."),
+        "mv_ui_loop_slow_ticks": ("gauge", "Lag samples over the last minute that were late by more than one frame."),
+    }
+
+    def __init__(self, host="127.0.0.1", port=9464):
+        self.host = host
+        self.port = port
+        self.sources = []
+        self.server = None
+        self._thread = None
+
+    def add_source(self, source):
+        self.sources.append(source)
+
+    def render(self):
+        families = {}
+        for source in list(self.sources):
+            for name, labels, value in source() or ():
+                families.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(families):
+            metric_type, help_text = self.METRICS.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in families[name]:
+                if labels:
+                    label_text = ",".join(f'{k}="{_escape_label(v)}"' for k, v in sorted(labels.items()))
+                    lines.append(f"{name}{{{label_text}}} {_format_metric_value(value)}")
+                else:
+                    lines.append(f"{name} {_format_metric_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def start(self):
+        if self.server is not None:
+            return
+        exporter = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+
+def _format_metric_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class ServerLogArchive:
+    """Persists server output to rotating, gzip-compressed segment files.
+
+    Each segment has a sparse "<timestamp> <offset>" index written next to it. When a
+    segment is closed it is recompressed as one gzip member per index block and the
+    index is rewritten to point at member boundaries, so a search can seek straight
+    to the block covering a timestamp without decompressing the whole segment.
+    """
+
+    def __init__(self, directory="server_logs", max_segment_bytes=16 * 1024 * 1024, max_segment_age=3600,
+                 index_interval_bytes=64 * 1024, max_total_bytes=1024 * 1024 * 1024, flush_interval=1.0):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.index_interval_bytes = index_interval_bytes
+        self.max_total_bytes = max_total_bytes
+        self.flush_interval = flush_interval
+
+        self.pending = queue.SimpleQueue()
+        self.segments = {}
+        self._compress_queue = queue.SimpleQueue()
+        self._writer_thread = None
+        self._compress_thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._writer_thread and self._writer_thread.is_alive():
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._stop.clear()
+        for leftover in glob.glob(os.path.join(self.directory, "*", "*.log")):
+            self._compress_queue.put(leftover)
+        self._writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._compress_thread = threading.Thread(target=self._compress_loop, daemon=True)
+        self._writer_thread.start()
+        self._compress_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._writer_thread:
+            self._writer_thread.join(timeout=5)
+
+    def append(self, server_name, line):
+        """Queues a line for writing. Safe to call from any thread; never blocks."""
+        self.pending.put((server_name, time.time(), line))
+
+    def _server_dir(self, server_name):
+        return os.path.join(self.directory, re.sub(r'[^\w.-]', '_', server_name))
+
+    def _open_segment(self, server_name, now):
+        server_dir = self._server_dir(server_name)
+        os.makedirs(server_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+        path = os.path.join(server_dir, f"{stamp}-{int(now * 1000) % 1000:03d}.log")
+        segment = {
+            'path': path,
+            'file': open(path, 'ab', buffering=256 * 1024),
+            'index': open(path + ".idx", 'a', encoding='ascii'),
+            'opened_at': now,
+            'size': os.path.getsize(path),
+            'next_index_at': 0,
+        }
+        self.segments[server_name] = segment
+        return segment
+
+    def _close_segment(self, server_name):
+        segment = self.segments.pop(server_name, None)
+        if segment:
+            segment['file'].close()
+            segment['index'].close()
+            self._compress_queue.put(segment['path'])
+
+    def _write_loop(self):
+        last_flush = time.time()
+        while True:
+            batch = []
+            try:
+                batch.append(self.pending.get(timeout=self.flush_interval))
+                while len(batch) < 5000:
+                    batch.append(self.pending.get_nowait())
+            except queue.Empty:
+                pass
+
+            for server_name, ts, line in batch:
+                self._write_line(server_name, ts, line)
+
+            now = time.time()
+            if now - last_flush >= self.flush_interval:
+                last_flush = now
+                for server_name, segment in list(self.segments.items()):
+                    segment['file'].flush()
+                    segment['index'].flush()
+                    if now - segment['opened_at'] >= self.max_segment_age:
+                        self._close_segment(server_name)
+
+            if self._stop.is_set() and self.pending.empty():
+                for server_name in list(self.segments):
+                    self._close_segment(server_name)
+                return
+
+    def _write_line(self, server_name, ts, line):
+        segment = self.segments.get(server_name)
+        if segment is None or segment['size'] >= self.max_segment_bytes:
+            if segment is not None:
+                self._close_segment(server_name)
+            segment = self._open_segment(server_name, ts)
+
+        if segment['size'] >= segment['next_index_at']:
+            segment['index'].write(f"{ts:.3f} {segment['size']}\n")
+            segment['next_index_at'] = segment['size'] + self.index_interval_bytes
+
+        data = f"{ts:.3f} {line.rstrip(chr(13) + chr(10))}\n".encode('utf-8', errors='replace')
+        segment['file'].write(data)
+        segment['size'] += len(data)
+
+    def _compress_loop(self):
+        while not self._stop.is_set() or not self._compress_queue.empty():
+            try:
+                path = self._compress_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            try:
+                self._compress_segment(path)
+                self._enforce_retention(os.path.dirname(path))
+            except OSError:
+                pass
+
+    def _compress_segment(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            raw = f.read()
+        entries = _read_archive_index(path + ".idx")
+        timestamps = [ts for ts, _ in entries]
+        offsets = [offset for _, offset in entries]
+        if not offsets:
+            offsets, timestamps = [0], [_archive_line_timestamp(raw[:64]) or 0.0]
+
+        gz_path = path + ".gz"
+        tmp_path = gz_path + ".tmp"
+        index_lines = []
+        with open(tmp_path, 'wb') as out:
+            bounds = offsets + [len(raw)]
+            for i, ts in enumerate(timestamps):
+                block = raw[bounds[i]:bounds[i + 1]]
+                if not block:
+                    continue
+                index_lines.append(f"{ts:.3f} {out.tell()}\n")
+                out.write(gzip.compress(block, compresslevel=6))
+        with open(gz_path + ".idx.tmp", 'w', encoding='ascii') as f:
+            f.writelines(index_lines)
+        os.replace(tmp_path, gz_path)
+        os.replace(gz_path + ".idx.tmp", gz_path + ".idx")
+        os.remove(path)
+        if os.path.exists(path + ".idx"):
+            os.remove(path + ".idx")
+
+    def _enforce_retention(self, server_dir):
+        segments = sorted(glob.glob(os.path.join(server_dir, "*.log.gz")))
+        total = sum(os.path.getsize(p) for p in segments)
+        while segments and total > self.max_total_bytes:
+            oldest = segments.pop(0)
+            total -= os.path.getsize(oldest)
+            os.remove(oldest)
+            if os.path.exists(oldest + ".idx"):
+                os.remove(oldest + ".idx")
+
+    def list_segments(self, server_name):
+        """Returns (start_ts, path) for every segment of a server, oldest first."""
+        segments = []
+        for path in glob.glob(os.path.join(self._server_dir(server_name), "*.log*")):
+            if not (path.endswith(".log") or path.endswith(".log.gz")):
+                continue
+            entries = _read_archive_index(path + ".idx")
+            start = entries[0][0] if entries else os.path.getmtime(path)
+            segments.append((start, path))
+        segments.sort()
+        return segments
+
+    def search(self, server_name, query, start_ts=None, end_ts=None, regex=False, limit=500):
+        """Returns up to `limit` of the most recent (timestamp, line) matches in the time range."""
+        if regex:
+            matcher = re.compile(query, re.IGNORECASE).search
+        else:
+            needle = query.lower()
+            matcher = lambda text: needle in text.lower()
+
+        segments = self.list_segments(server_name)
+        results = []
+        # Walk newest segments first and stop once enough matches have been collected.
+        for i in range(len(segments) - 1, -1, -1):
+            seg_start, path = segments[i]
+            seg_end = segments[i + 1][0] if i + 1 < len(segments) else float('inf')
+            if start_ts is not None and seg_end < start_ts:
+                break
+            if end_ts is not None and seg_start > end_ts:
+                continue
+            try:
+                matches = list(self._search_segment(path, matcher, start_ts, end_ts))
+            except OSError:
+                continue
+            results[:0] = matches
+            if len(results) >= limit:
+                break
+        return results[-limit:]
+
+    def _search_segment(self, path, matcher, start_ts, end_ts):
+        if not os.path.exists(path) and os.path.exists(path + ".gz"):
+            # The segment was compressed after it was listed.
+            path += ".gz"
+        offset = 0
+        if start_ts is not None:
+            entries = _read_archive_index(path + ".idx")
+            position = bisect.bisect_right([ts for ts, _ in entries], start_ts) - 1
+            if position > 0:
+                offset = entries[position][1]
+
+        with open(path, 'rb') as raw:
+            raw.seek(offset)
+            stream = gzip.GzipFile(fileobj=raw) if path.endswith(".gz") else raw
+            try:
+                for data in stream:
+                    stamp, _, text = data.decode('utf-8', errors='replace').partition(" ")
+                    try:
+                        ts = float(stamp)
+                    except ValueError:
+                        continue
+                    if start_ts is not None and ts < start_ts:
+                        continue
+                    if end_ts is not None and ts > end_ts:
+                        return
+                    if matcher(text):
+                        yield ts, text.rstrip("\n")
+            except (OSError, EOFError):
+                # A segment still being written may end in a partial line or gzip member.
+                return
+
+def _read_archive_index(path):
+    entries = []
+    try:
+        with open(path, 'r', encoding='ascii') as f:
+            for line in f:
+                ts, _, offset = line.partition(" ")
+                try:
+                    entries.append((float(ts), int(offset)))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return entries
+
+def _archive_line_timestamp(data):
+    try:
+        return float(data.split(b" ", 1)[0])
+    except (ValueError, IndexError):
+        return None
+
+class LineClassifier:
+    """Assigns a console level (ERROR/WARN/SUCCESS/INFO/DEBUG/DEFAULT) to server output lines.
+
+    Rules are tried in level priority order and the first hit wins. Each built-in rule is
+    gated by a plain substring check, so the regex (which makes sure the keyword starts a
+    word, e.g. not the OK in TOKEN) only runs on lines that contain its keyword. User rules
+    are tried before the built-in rules of the same level. Results are cached per line
+    template (digits masked) with only the built-in rules, per exact line with user rules.
+    """
+
+    LEVEL_PRIORITY = ("ERROR", "WARN", "SUCCESS", "INFO", "DEBUG")
+    # Built-in (keyword, regex) rules run against the upper-cased line. The regexes start with
+    # the keyword so the engine can scan for it, then look back: only a letter ends a word
+    # here, so CONNECTION_FAILED and DB_ERROR are still errors.
+    DEFAULT_RULES = {
+        "ERROR": [("ERROR", r"ERROR(?<![A-Z]ERROR)"), ("FAIL", r"FAIL(?<![A-Z]FAIL)")],
+        "WARN": [("WARN", r"WARN(?<![A-Z]WARN)")],
+        "SUCCESS": [("SUCCESS", r"SUCCESS(?<![A-Z]SUCCESS)"), ("OK", r"OK(?<![A-Z]OK)(?![A-Z])")],
+        "INFO": [("INFO", r"INFO(?<![A-Z]INFO)")],
+        "DEBUG": [("DEBUG", r"DEBUG(?<![A-Z]DEBUG)")],
+    }
+    _DIGIT_MASK = bytes.maketrans(b"123456789", b"000000000")
+
+    def __init__(self, extra_rules=None, cache_size=4096):
+        for level in extra_rules or {}:
+            if level not in self.DEFAULT_RULES:
+                raise ValueError(f"Unknown console level '{level}'")
+        # One flat (level, keyword, regex) list in priority order; user rules get the empty keyword, which always passes the gate.
+        self._rules = []
+        for level in self.LEVEL_PRIORITY:
+            patterns = (extra_rules or {}).get(level)
+            if patterns:
+                # User rules are case-insensitive.
+                self._rules.append((level, "", re.compile("|".join(f"(?i:{pattern})" for pattern in patterns))))
+            self._rules.extend((level, keyword, re.compile(pattern)) for keyword, pattern in self.DEFAULT_RULES[level])
+        self.cache_size = cache_size
+        self._mask_digits = not any(rule[1] == "" for rule in self._rules)
+        self._cache = {}
+
+    def _classify_uncached(self, line):
+        line_upper = line.upper()
+        for level, keyword, pattern in self._rules:
+            if keyword in line_upper and pattern.search(line_upper):
+                return level
+        return "DEFAULT"
+
+    def classify(self, line):
+        if not self.cache_size:
+            return self._classify_uncached(line)
+        # Masking digits folds lines that differ only in ids, ports or timestamps together.
+        # The built-in rules never look at digits; user rules might, so they key on the line itself.
+        key = line
+        if self._mask_digits:
+            try:
+                key = line.encode().translate(self._DIGIT_MASK)
+            except UnicodeEncodeError:
+                pass
+        level = self._cache.get(key)
+        if level is None:
+            level = self._classify_uncached(line)
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[key] = level
+        return level
+
+    @classmethod
+    def for_servers(cls, rules_config):
+        """Builds {server_name: LineClassifier} from the 'console_rules' config section."""
+        default_rules = rules_config.get("default") or {}
+        classifiers = {"default": cls(default_rules)}
+        for server_name, rules in rules_config.items():
+            if server_name != "default":
+                merged = {level: list(patterns) for level, patterns in default_rules.items()}
+                for level, patterns in rules.items():
+                    merged.setdefault(level, [])[:0] = patterns
+                classifiers[server_name] = cls(merged)
+        return classifiers
+
+class ConsoleIndex:
+    """Incrementally maintained search index over the retained output lines of one server.
+
+    Lines get increasing sequence numbers. Each level keeps a position list, and a
+    trigram index maps every trigram to the blocks of BLOCK_SIZE lines containing it,
+    so a substring query only verifies blocks that hold all of its trigrams. A lowercased
+    copy of each completed block lets one C-level scan reject a block before any per-line
+    work. Evicted lines are skipped lazily and postings are compacted in bulk.
+    """
+
+    BLOCK_SIZE = 64
+    LEVELS = ("ERROR", "WARN", "INFO", "SUCCESS", "DEBUG", "DEFAULT")
+
+    def __init__(self, max_lines=250000):
+        self.max_lines = max_lines
+        self.lock = threading.Lock()
+        self.lines = []
+        self.levels = bytearray()
+        self.head = 0
+        self.first_seq = 0
+        self.next_seq = 0
+        self.level_positions = {level: array('q') for level in self.LEVELS}
+        self.level_totals = {level: 0 for level in self.LEVELS}
+        self.trigrams = {}
+        self.block_text = {}
+        self._block_lines = []
+        self._block_trigrams = set()
+        self._compacted_block = 0
+
+    def add(self, line, level):
+        seq = self.next_seq
+        self.next_seq += 1
+        self.lines.append(line)
+        self.levels.append(self.LEVELS.index(level))
+        self.level_positions[level].append(seq)
+        self.level_totals[level] += 1
+
+        block = seq // self.BLOCK_SIZE
+        if seq % self.BLOCK_SIZE == 0:
+            self._block_trigrams = set()
+            self._block_lines = []
+        seen = self._block_trigrams
+        lowered = line.lower()
+        self._block_lines.append(lowered)
+        if len(self._block_lines) == self.BLOCK_SIZE:
+            self.block_text[block] = "".join(self._block_lines)
+        for i in range(len(lowered) - 2):
+            trigram = lowered[i:i + 3]
+            if trigram not in seen:
+                seen.add(trigram)
+                postings = self.trigrams.get(trigram)
+                if postings is None:
+                    postings = self.trigrams[trigram] = array('i')
+                postings.append(block)
+
+        if self.next_seq - self.first_seq > self.max_lines:
+            self._evict()
+        return seq
+
+    def _evict(self):
+        self.first_seq += 1
+        self.head += 1
+        if self.head >= self.max_lines // 2:
+            del self.lines[:self.head]
+            del self.levels[:self.head]
+            self.head = 0
+
+        first_block = self.first_seq // self.BLOCK_SIZE
+        if self.first_seq % self.BLOCK_SIZE == 0:
+            self.block_text.pop(first_block - 1, None)
+        if first_block - self._compacted_block >= 4096:
+            self._compact(first_block)
+
+    def _compact(self, first_block):
+        for key, positions in self.level_positions.items():
+            self.level_positions[key] = positions[bisect.bisect_left(positions, self.first_seq):]
+        for trigram in list(self.trigrams):
+            postings = self.trigrams[trigram]
+            start = bisect.bisect_left(postings, first_block)
+            if start == len(postings):
+                del self.trigrams[trigram]
+            elif start:
+                self.trigrams[trigram] = postings[start:]
+        self._compacted_block = first_block
+
+    def line(self, seq):
+        return self.lines[self.head + seq - self.first_seq]
+
+    def _block_lower(self, block):
+        text = self.block_text.get(block)
+        if text is None:
+            # Partially filled (newest) or partially evicted (oldest) block.
+            start = max(block * self.BLOCK_SIZE, self.first_seq) - self.first_seq + self.head
+            end = min((block + 1) * self.BLOCK_SIZE, self.next_seq) - self.first_seq + self.head
+            text = "".join(self.lines[start:end]).lower()
+        return text
+
+    def level(self, seq):
+        return self.LEVELS[self.levels[self.head + seq - self.first_seq]]
+
+    def search(self, query, levels=None, regex=False, limit=None):
+        """Returns the ascending sequence numbers of retained lines matching the query and levels.
+
+        The lock is held only to pick candidate blocks and to copy one block at a time, so
+        the reader threads adding lines are never stalled behind a long scan.
+        """
+        allowed = None
+        if levels is not None:
+            allowed = {self.LEVELS.index(level) for level in levels}
+            if not allowed:
+                return []
+
+        if regex:
+            pattern = re.compile(query, re.IGNORECASE | re.MULTILINE) if query else None
+            # Regex blocks are checked in their original case: inline flags such as (?-i:...)
+            # make a lowercased copy miss real matches.
+            block_matches = lambda text, lowered: pattern.search(text) is not None
+            line_matches = lambda text: pattern.search(text) is not None
+        else:
+            needle = query.lower()
+            block_matches = lambda text, lowered: needle in lowered
+            line_matches = lambda text: needle in text.lower()
+
+        with self.lock:
+            if not query:
+                if allowed is None:
+                    matches = list(range(self.first_seq, self.next_seq))
+                else:
+                    matches = sorted(seq for level in levels for seq in self._live_positions(level))
+                return matches[-limit:] if limit else matches
+            if regex:
+                blocks = range(self.first_seq // self.BLOCK_SIZE, (self.next_seq - 1) // self.BLOCK_SIZE + 1)
+            else:
+                blocks = self._candidate_blocks(needle)
+
+        # Walk candidate blocks newest first so `limit` lets common queries stop early.
+        matches = []
+        for block in reversed(blocks):
+            with self.lock:
+                first = max(block * self.BLOCK_SIZE, self.first_seq)
+                start = first - self.first_seq + self.head
+                end = min((block + 1) * self.BLOCK_SIZE, self.next_seq) - self.first_seq + self.head
+                if start >= end:
+                    # Evicted since the candidates were picked.
+                    continue
+                lines = self.lines[start:end]
+                line_levels = self.levels[start:end]
+                lowered = None if regex else self._block_lower(block)
+            if not block_matches("".join(lines) if regex else None, lowered):
+                continue
+            for offset in range(len(lines) - 1, -1, -1):
+                if allowed is not None and line_levels[offset] not in allowed:
+                    continue
+                if line_matches(lines[offset]):
+                    matches.append(first + offset)
+            if limit and len(matches) >= limit:
+                break
+        matches.reverse()
+        return matches[-limit:] if limit else matches
+
+    def _live_positions(self, level):
+        positions = self.level_positions[level]
+        return positions[bisect.bisect_left(positions, self.first_seq):]
+
+    def _candidate_blocks(self, needle):
+        first_block = self.first_seq // self.BLOCK_SIZE
+        all_blocks = range(first_block, (self.next_seq - 1) // self.BLOCK_SIZE + 1)
+        if len(needle) < 3:
+            return all_blocks
+
+        postings = []
+        for trigram in {needle[i:i + 3] for i in range(len(needle) - 2)}:
+            blocks = self.trigrams.get(trigram)
+            if blocks is None:
+                return []
+            postings.append(blocks)
+        postings.sort(key=len)
+
+        blocks = set(postings[0][bisect.bisect_left(postings[0], first_block):])
+        for other in postings[1:]:
+            if not blocks:
+                break
+            blocks.intersection_update(other[bisect.bisect_left(other, first_block):])
+        return sorted(blocks)
+
+def _render_ini(sections):
+    """Renders [(section, [(key, value)])] the way configparser writes it, without its per-call overhead."""
+    parts = []
+    for name, items in sections:
+        parts.append(f"[{name}]\n")
+        parts.extend(f"{key} = {value}\n" for key, value in items)
+        parts.append("\n")
+    return "".join(parts)
+
+def render_server_configs(settings):
+    """Returns {path relative to Setup/: config.ini text} for the whole server topology.
+
+    Setup/config.ini is what the started servers read: [Database], [AuthServer] and Server 1's
+    [MainServer]/[CastServer], followed by a [Server<N>] section listing every extra instance.
+    Each extra instance also gets Setup/instances/Server<N>/config.ini in the same layout as
+    Setup/config.ini, with its own MainServer and CastServer. Blank IPs fall back to the local IP.
+    """
+    local_ip = settings['local_ip'] if settings['local_ip'] else "127.0.0.1"
+    primary = dict(ServerListModel.PRIMARY_PORTS, **(settings.get('primary_ports') or {}))
+    database = ("Database", [
+        ("Ip", settings['db_ip']),
+        ("Port", settings['db_port']),
+        ("DatabaseName", settings['db_name']),
+        ("Username", settings['db_username']),
+        ("PasswordEnvironmentName", 'MICROVOLTS_DB_PASSWORD'),
+    ])
+    auth = ("AuthServer", [("Ip", local_ip), ("PublicIp", local_ip),
+                           ("Port", primary['auth_port']), ("IpcPort", primary['auth_ipc_port'])])
+    main = [("Ip", local_ip), ("PublicIp", local_ip), ("Port", primary['main_port']), ("IpcPort", primary['main_ipc_port'])]
+    cast = [("Ip", local_ip), ("PublicIp", local_ip), ("Port", primary['cast_port']), ("IpcPort", primary['cast_ipc_port'])]
+
+    topology = [database, auth, ("MainServer", main), ("CastServer", cast)]
+    files = {}
+    for number, server in enumerate(settings.get('servers', []), start=2):
+        server = ServerListModel.normalize(server)
+        if ServerListModel.is_blank(server):
+            continue
+        main = [("Ip", server['main_local_ip'] or local_ip), ("PublicIp", server['main_public_ip'] or local_ip),
+                ("Port", server['main_port']), ("IpcPort", server['main_ipc_port'])]
+        cast = [("Ip", server['cast_local_ip'] or local_ip), ("PublicIp", server['cast_public_ip'] or local_ip),
+                ("Port", server['cast_port']), ("IpcPort", server['cast_ipc_port'])]
+        topology.append((f"Server{number}", [("Main" + key, value) for key, value in main] + [("Cast" + key, value) for key, value in cast]))
+        files[f"instances/Server{number}/config.ini"] = _render_ini([database, auth, ("MainServer", main), ("CastServer", cast)])
+    files["config.ini"] = _render_ini(topology)
+    return files
+
+def write_server_configs(setup_dir, files):
+    """Writes rendered configs under setup_dir, replacing only files whose content changed.
+
+    Changed files are written to a temporary file and renamed over the old one, so a server
+    never reads a half-written config. Instance configs that are no longer rendered are
+    removed. Returns (written, unchanged, removed) lists of relative paths.
+    """
+    written, unchanged, removed = [], [], []
+    for relative_path, text in files.items():
+        path = os.path.join(setup_dir, *relative_path.split("/"))
+        data = text.encode('utf-8')
+        try:
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    unchanged.append(relative_path)
+                    continue
+        except OSError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        written.append(relative_path)
+
+    instances_dir = os.path.join(setup_dir, "instances")
+    if os.path.isdir(instances_dir):
+        for name in os.listdir(instances_dir):
+            relative_path = f"instances/{name}/config.ini"
+            path = os.path.join(instances_dir, name, "config.ini")
+            if relative_path not in files and name.startswith("Server") and os.path.isfile(path):
+                os.remove(path)
+                removed.append(relative_path)
+                try:
+                    os.rmdir(os.path.dirname(path))
+                except OSError:
+                    pass
+    return written, unchanged, removed
+
+def configure_treeview_style(widget):
+    """Applies the dark ttk.Treeview look shared by the app's tables."""
+    style = ttk.Style(widget)
+    style.theme_use("default")
+    style.configure("Treeview", background="#2a2d2e", foreground="white", fieldbackground="#2a2d2e", borderwidth=0, rowheight=25)
+    style.map("Treeview", background=[('selected', '#24527a')])
+    style.configure("Treeview.Heading", background="#565b5e", foreground="white", relief="flat", font=('Calibri', 10, 'bold'))
+    style.map("Treeview.Heading", background=[('active', '#3484F0')])
+    return style
+
+def probe_bound_ports(ports, host="0.0.0.0", workers=32):
+    """Returns the set of `ports` that can't be bound on this host right now, testing them concurrently."""
+    def in_use(port):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            if os.name != 'nt':
+                # Lingering TIME_WAIT connections don't make a port unavailable to a server.
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                s.bind((host, port))
+            except OSError:
+                return True
+            return False
+
+    if not ports:
+        return set()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(workers, len(ports))) as pool:
+        return {port for port, busy in zip(ports, pool.map(in_use, ports)) if busy}
+
+def wait_until_ready(manager, server_name, policy, timeout, settle=5.0, interval=0.5):
+    """Waits for a freshly started server to accept connections on its probe port.
+
+    Servers without a probe_port count as ready once they have stayed up for `settle`
+    seconds. Returns False as soon as the process exits.
+    """
+    process = manager.processes.get(server_name)
+    started_at = time.time()
+    while time.time() - started_at < timeout:
+        if process is None or process.poll() is not None:
+            return False
+        if policy is not None and policy.probe_port:
+            if probe_tcp_port(policy.probe_host, policy.probe_port, policy.probe_timeout):
+                return True
+        elif time.time() - started_at >= settle:
+            return True
+        time.sleep(interval)
+    return False
+
+def probe_tcp_port(host, port, timeout):
+    try:
+        with socket.create_connection((host, int(port)), timeout=timeout):
+            return True
+    except (OSError, ValueError):
+        return False
+
 def main():
     app = MicroVoltsServerSetup()
     app.protocol("WM_DELETE_WINDOW", app.on_closing)
     app.mainloop()
 
 if __name__ == "__main__":
-    from multiprocessing import freeze_support
-    freeze_support()
     main()
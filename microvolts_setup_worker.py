@@ -0,0 +1,935 @@
+"""Setup steps that run in the worker host process, and the host itself.
+
+This module must stay free of GUI imports: the host is started once per session with
+`python microvolts_setup_worker.py` (or `<frozen exe> --worker-host`) and receives step
+jobs as JSON lines on stdin, answering with the same message dicts the GUI already
+understands (log, ask, showerror, showinfo, result) on stdout.
+"""
+import collections
+import json
+import os
+import queue
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+
+import requests
+
+WORKER_HOST_FLAG = "--worker-host"
+MARIADB_VERSION = "11.5.1"
+CCACHE_VERSION = "4.10.2"
+
+
+class StepCancelled(BaseException):
+    """Raised inside a step once the GUI cancels it. Not an Exception, so steps' own handlers don't swallow it."""
+
+
+def worker_log(q, message):
+    q.put({'type': 'log', 'message': message})
+
+def worker_ask_yes_no(q, title, prompt):
+    return q.ask(title, prompt)
+
+def worker_show_error(q, title, message):
+    q.put({'type': 'showerror', 'title': title, 'message': message})
+
+def worker_show_info(q, title, message):
+    q.put({'type': 'showinfo', 'title': title, 'message': message})
+
+def run_process(q, args, input=None, capture_output=False, text=False, check=False, **kwargs):
+    """subprocess.run() that registers the child with the job so a cancel can kill it."""
+    if capture_output:
+        kwargs['stdout'] = kwargs['stderr'] = subprocess.PIPE
+    # The host's stdin is the job pipe; never let a child read from it.
+    kwargs['stdin'] = subprocess.PIPE if input is not None else subprocess.DEVNULL
+    if os.name != 'nt':
+        # Own process group, so kill_process_tree() can take grandchildren with it.
+        kwargs.setdefault('start_new_session', True)
+    with subprocess.Popen(args, text=text, **kwargs) as process:
+        q.track(process)
+        try:
+            stdout, stderr = process.communicate(input)
+        finally:
+            q.untrack(process)
+    if q.cancelled:
+        raise StepCancelled()
+    result = subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+    if check:
+        result.check_returncode()
+    return result
+
+def kill_process_tree(process):
+    """Kills a child and everything it started (git-remote-https, msiexec children, vcpkg's compilers...)."""
+    if process.poll() is not None:
+        return
+    if os.name == 'nt':
+        result = subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True,
+                                creationflags=subprocess.CREATE_NO_WINDOW)
+        if result.returncode == 0:
+            return
+    else:
+        try:
+            if os.getpgid(process.pid) == process.pid:
+                os.killpg(process.pid, signal.SIGKILL)
+                return
+        except OSError:
+            pass
+    try:
+        process.kill()
+    except OSError:
+        pass
+
+class ProgressReporter:
+    """Sends 'progress' messages (value 0..1 plus a label), at most one per whole percent or label change."""
+
+    def __init__(self, q):
+        self.q = q
+        self.last = None
+
+    def update(self, value, label):
+        value = min(max(value, 0.0), 1.0)
+        key = (int(value * 100), label)
+        if key != self.last:
+            self.last = key
+            self.q.put({'type': 'progress', 'value': value, 'label': label})
+
+
+class GitProgress:
+    """Maps git's --progress phases of a clone or fetch onto one 0..1 range."""
+
+    PATTERN = re.compile(r"^(?:remote: )?(Counting objects|Compressing objects|Receiving objects|Resolving deltas|Updating files):\s+(\d+)%")
+    PHASES = {
+        "Counting objects": (0.0, 0.05),
+        "Compressing objects": (0.05, 0.1),
+        "Receiving objects": (0.1, 0.8),
+        "Resolving deltas": (0.8, 0.95),
+        "Updating files": (0.95, 1.0),
+    }
+
+    def feed(self, line):
+        match = self.PATTERN.match(line)
+        if match is None:
+            return None
+        start, end = self.PHASES[match.group(1)]
+        percent = int(match.group(2))
+        return start + (end - start) * percent / 100, f"{match.group(1)}: {percent}%"
+
+
+class VcpkgProgress:
+    """Follows `vcpkg install`'s "Installing N/M port..." lines and records how long each port took."""
+
+    INSTALLING = re.compile(r"^Installing (\d+)/(\d+) (\S+?)(?:\.\.\.)?$")
+    ELAPSED = re.compile(r"^Elapsed time to handle (\S+): (.+)$")
+
+    def __init__(self):
+        self.durations = {}
+
+    def feed(self, line):
+        match = self.INSTALLING.match(line)
+        if match is not None:
+            index, total = int(match.group(1)), int(match.group(2))
+            return (index - 1) / total, f"Installing {match.group(3)} ({index}/{total})"
+        match = self.ELAPSED.match(line)
+        if match is not None:
+            self.durations[match.group(1)] = match.group(2)
+        return None
+
+
+class MsiProgress:
+    """Estimates msiexec progress from the "Action start" lines of its verbose log."""
+
+    PATTERN = re.compile(r"^Action start [\d:]+: (\w+)\.")
+    # Standard InstallExecuteSequence milestones, in order.
+    ACTIONS = ("CostInitialize", "InstallValidate", "InstallInitialize", "ProcessComponents", "UnpublishFeatures",
+               "RemoveFiles", "InstallFiles", "CreateShortcuts", "WriteRegistryValues", "InstallServices",
+               "StartServices", "RegisterProduct", "PublishFeatures", "PublishProduct", "InstallFinalize")
+
+    def feed(self, line):
+        match = self.PATTERN.match(line)
+        if match is None or match.group(1) not in self.ACTIONS:
+            return None
+        index = self.ACTIONS.index(match.group(1))
+        return index / len(self.ACTIONS), f"MSI: {match.group(1)}"
+
+
+def follow_file(path, process, lines, poll=0.25):
+    """Feeds lines appended to `path` into `lines` until `process` exits. msiexec logs are UTF-16 or ANSI."""
+    handle = None
+    encoding = None
+    pending = ""
+    while True:
+        exited = process.poll() is not None
+        if handle is None and os.path.exists(path):
+            handle = open(path, 'rb')
+        if handle is not None:
+            data = handle.read()
+            if data:
+                if encoding is None:
+                    encoding = {b'\xff\xfe': 'utf-16-le', b'\xfe\xff': 'utf-16-be'}.get(data[:2], 'latin-1')
+                    if encoding != 'latin-1':
+                        data = data[2:]
+                if encoding != 'latin-1' and len(data) % 2:
+                    handle.seek(-1, os.SEEK_CUR)
+                    data = data[:-1]
+                pending += data.decode(encoding, errors='replace')
+                *complete, pending = pending.replace('\r', '').split('\n')
+                for line in complete:
+                    lines.put(('follow', line))
+        if exited:
+            break
+        time.sleep(poll)
+    if handle is not None:
+        handle.close()
+
+def stream_process(q, args, parser=None, follow=None, cwd=None, batch_interval=0.25, tail_lines=200):
+    """Runs a long child command, forwarding its output to the log in batches while it runs.
+
+    stderr is merged into stdout and carriage returns split lines, so git's progress meter is
+    seen line by line. Lines the parser recognises drive the progress bar instead of the log.
+    `follow` is a file (an msiexec log) whose new lines go to the parser only. Returns a
+    CompletedProcess whose stdout holds the last `tail_lines` lines, for error messages.
+    """
+    progress = ProgressReporter(q)
+    tail = collections.deque(maxlen=tail_lines)
+    lines = queue.Queue()
+    kwargs = {'start_new_session': True} if os.name != 'nt' else {}
+    process = subprocess.Popen(args, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, encoding='utf-8', errors='replace', bufsize=1, **kwargs)
+    q.track(process)
+
+    def read_output():
+        # Universal newlines turn git's "\r" progress updates into separate lines.
+        for line in process.stdout:
+            lines.put(('output', line.rstrip('\n')))
+        lines.put(('output', None))
+
+    readers = [threading.Thread(target=read_output, daemon=True)]
+    if follow is not None:
+        readers.append(threading.Thread(target=follow_file, args=(follow, process, lines), daemon=True))
+    for reader in readers:
+        reader.start()
+
+    batch = []
+    flushed_at = time.monotonic()
+    try:
+        output_open = True
+        while output_open:
+            try:
+                source, line = lines.get(timeout=batch_interval)
+            except queue.Empty:
+                source, line = None, None
+            if source == 'output' and line is None:
+                output_open = False
+            elif line is not None:
+                update = parser.feed(line) if parser is not None and line else None
+                if update is not None:
+                    progress.update(*update)
+                elif source == 'output' and line.strip():
+                    tail.append(line)
+                    batch.append(line)
+            if batch and (not output_open or time.monotonic() - flushed_at >= batch_interval):
+                worker_log(q, "\n".join(batch))
+                batch = []
+                flushed_at = time.monotonic()
+        process.wait()
+    finally:
+        q.untrack(process)
+        process.stdout.close()
+    for reader in readers[1:]:
+        reader.join()
+    if q.cancelled:
+        raise StepCancelled()
+    return subprocess.CompletedProcess(args, process.returncode, "\n".join(tail), None)
+
+def download_file(q, url, dest, chunk_size=1024 * 1024):
+    """Downloads url to dest through dest + '.part', resuming an interrupted download when the server supports ranges."""
+    if os.path.exists(dest):
+        worker_log(q, f"Reusing previously downloaded {os.path.basename(dest)}")
+        return dest
+    part = dest + ".part"
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {'Range': f"bytes={offset}-"} if offset else {}
+    with requests.get(url, stream=True, headers=headers, timeout=60) as response:
+        if offset and response.status_code == 416:
+            # The partial file is unusable (or already complete but unverifiable); start over.
+            os.remove(part)
+            return download_file(q, url, dest, chunk_size)
+        response.raise_for_status()
+        if offset and response.status_code == 206:
+            worker_log(q, f"Resuming download of {os.path.basename(dest)} at {offset / 1048576:.1f} MB")
+            total = int(response.headers.get('Content-Range', '').rpartition('/')[2] or 0) or None
+            mode = 'ab'
+        else:
+            offset = 0
+            total = int(response.headers.get('Content-Length') or 0) or None
+            mode = 'wb'
+        progress = ProgressReporter(q)
+        done = offset
+        with open(part, mode) as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if q.cancelled:
+                    raise StepCancelled()
+                f.write(chunk)
+                done += len(chunk)
+                if total:
+                    progress.update(done / total, f"Downloading {os.path.basename(dest)}: "
+                                                  f"{done / 1048576:.0f} of {total / 1048576:.0f} MB")
+    if total is not None and os.path.getsize(part) != total:
+        raise Exception(f"Download of {os.path.basename(dest)} is incomplete ({os.path.getsize(part)} of {total} bytes)")
+    os.replace(part, dest)
+    return dest
+
+def reuse_clone(q, repo_path, repo_url, branch):
+    """Brings an existing (possibly interrupted) clone up to date with origin/branch. Returns False if it can't be reused."""
+    origin = run_process(q, ["git", "-C", repo_path, "remote", "get-url", "origin"], capture_output=True, text=True)
+    if origin.returncode != 0 or origin.stdout.strip() != repo_url:
+        return False
+    worker_log(q, f"Reusing existing clone at {repo_path}; fetching {branch}...")
+    # Objects fetched by an interrupted clone stay in the object store, so this only transfers what is missing.
+    fetch = stream_process(q, ["git", "-C", repo_path, "fetch", "--progress", "origin", branch], parser=GitProgress())
+    if fetch.returncode != 0:
+        worker_log(q, f"Fetch failed: {fetch.stdout.strip()}")
+        return False
+    checkout = run_process(q, ["git", "-C", repo_path, "checkout", "-f", "-B", branch, "FETCH_HEAD"], capture_output=True, text=True)
+    if checkout.returncode != 0:
+        worker_log(q, f"Checkout failed: {checkout.stderr.strip()}")
+        return False
+    return True
+
+def worker_install_llvm(q, config):
+    try:
+        worker_log(q, "Checking for LLVM (clang-cl) installation...")
+        try:
+            result = run_process(q, ['clang-cl', '--version'], capture_output=True, text=True, check=False)
+            if result.returncode == 0:
+                worker_log(q, "LLVM (clang-cl) is already installed")
+                q.put({'type': 'result', 'success': True})
+                return
+        except FileNotFoundError:
+            pass
+        
+        worker_log(q, "LLVM (clang-cl) not found. Installing...")
+        
+        llvm_version = "18.1.8"
+        llvm_url = f"https://github.com/llvm/llvm-project/releases/download/llvmorg-{llvm_version}/LLVM-{llvm_version}-win64.exe"
+        
+        worker_log(q, f"Downloading LLVM {llvm_version}...")
+        installer_path = os.path.join(config['project_path'], f"LLVM-{llvm_version}-win64.exe")
+        download_file(q, llvm_url, installer_path)
+        
+        worker_log(q, "LLVM downloaded successfully. Installing...")
+        
+        result = run_process(q, [installer_path, '/S', '/D=C:\\Program Files\\LLVM'], capture_output=True, text=True, check=False)
+        
+        try:
+            os.remove(installer_path)
+        except OSError:
+            pass
+
+        worker_log(q, "LLVM installation complete.")
+        q.put({'type': 'result', 'success': True})
+
+    except Exception as e:
+        worker_log(q, f"LLVM installation failed: {e}")
+        if worker_ask_yes_no(q, "LLVM Installation Failed", "LLVM installation failed. Continue anyway?"):
+             q.put({'type': 'result', 'success': True})
+        else:
+             q.put({'type': 'result', 'success': False})
+
+def find_ccache(project_path):
+    """ccache on PATH, or the copy worker_install_ccache put in <project>/ccache; None if neither exists."""
+    found = shutil.which("ccache")
+    if found:
+        return found
+    bundled = os.path.join(project_path, "ccache", "ccache.exe")
+    return bundled if os.path.isfile(bundled) else None
+
+def worker_install_ccache(q, config):
+    if not config.get('compiler_cache'):
+        worker_log(q, "Compiler cache is disabled; skipping ccache.")
+        q.put({'type': 'result', 'success': True})
+        return
+    try:
+        existing = find_ccache(config['project_path'])
+        if existing:
+            worker_log(q, f"ccache is already installed at {existing}")
+            q.put({'type': 'result', 'success': True})
+            return
+
+        name = f"ccache-{CCACHE_VERSION}-windows-x86_64"
+        url = f"https://github.com/ccache/ccache/releases/download/v{CCACHE_VERSION}/{name}.zip"
+        worker_log(q, f"Downloading ccache {CCACHE_VERSION}...")
+        archive_path = download_file(q, url, os.path.join(config['project_path'], f"{name}.zip"))
+
+        install_dir = os.path.join(config['project_path'], "ccache")
+        os.makedirs(install_dir, exist_ok=True)
+        with zipfile.ZipFile(archive_path) as archive:
+            for member in archive.infolist():
+                # Members sit in a versioned top-level folder; flatten it into <project>/ccache.
+                relative_path = member.filename.split("/", 1)[-1]
+                if member.is_dir() or not relative_path:
+                    continue
+                target = os.path.join(install_dir, *relative_path.split("/"))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.open(member) as source, open(target, 'wb') as f:
+                    shutil.copyfileobj(source, f)
+        os.remove(archive_path)
+
+        if not os.path.isfile(os.path.join(install_dir, "ccache.exe")):
+            raise Exception("ccache.exe not found in the downloaded archive")
+        worker_log(q, f"ccache {CCACHE_VERSION} installed to {install_dir}")
+        q.put({'type': 'result', 'success': True})
+
+    except Exception as e:
+        worker_log(q, f"ccache installation failed: {e}")
+        if worker_ask_yes_no(q, "ccache Installation Failed", "ccache could not be installed; builds will run without the compiler cache. Continue anyway?"):
+            q.put({'type': 'result', 'success': True})
+        else:
+            q.put({'type': 'result', 'success': False})
+
+def worker_download_repository(q, config):
+    try:
+        worker_log(q, "Cloning MicroVolts Emulator repository...")
+        repo_url = "https://github.com/SoWeBegin/MicrovoltsEmulator.git"
+        repo_path = os.path.join(config['project_path'], "MicrovoltsEmulator")
+        branch = "mv1.1_2.0"
+
+        if os.path.isdir(os.path.join(repo_path, ".git")) and reuse_clone(q, repo_path, repo_url, branch):
+            worker_log(q, "Repository updated successfully")
+            q.put({'type': 'result', 'success': True})
+            return
+
+        if os.path.exists(repo_path):
+            worker_log(q, "Removing existing MicrovoltsEmulator directory...")
+            shutil.rmtree(repo_path)
+        
+        worker_log(q, "Cloning repository (this may take a few minutes)...")
+        result = stream_process(q, [
+            "git", "clone", "--progress", "-b", branch, repo_url, repo_path
+        ], parser=GitProgress())
+        
+        if result.returncode != 0:
+            raise Exception(f"Git clone failed: {result.stdout}")
+            
+        worker_log(q, "Repository cloned successfully")
+        q.put({'type': 'result', 'success': True})
+    except Exception as e:
+        worker_log(q, f"Failed to clone repository: {str(e)}")
+        q.put({'type': 'result', 'success': False})
+
+def worker_setup_vcpkg(q, config):
+    try:
+        worker_log(q, "Setting up vcpkg...")
+        repo_path = os.path.join(config['project_path'], "MicrovoltsEmulator")
+        ext_lib_path = os.path.join(repo_path, "ExternalLibraries")
+        os.makedirs(ext_lib_path, exist_ok=True)
+        
+        vcpkg_path = os.path.join(ext_lib_path, "vcpkg")
+        vcpkg_url = "https://github.com/microsoft/vcpkg.git"
+
+        if os.path.exists(os.path.join(vcpkg_path, ".git")) and not vcpkg_checkout_ok(q, vcpkg_path):
+            # An interrupted clone leaves .git behind without a usable checkout.
+            if not reuse_clone(q, vcpkg_path, vcpkg_url, "master"):
+                shutil.rmtree(vcpkg_path)
+
+        if not os.path.exists(os.path.join(vcpkg_path, ".git")):
+            worker_log(q, "Cloning vcpkg repository...")
+            if os.path.exists(vcpkg_path):
+                shutil.rmtree(vcpkg_path)
+            
+            result = stream_process(q, [
+                "git", "clone", "--progress", vcpkg_url, vcpkg_path
+            ], parser=GitProgress())
+            
+            if result.returncode != 0:
+                raise Exception(f"Git clone failed: {result.stdout}")
+        else:
+            worker_log(q, "vcpkg repository already exists.")
+
+        vcpkg_exe = os.path.join(vcpkg_path, "vcpkg.exe")
+        if os.path.exists(vcpkg_exe):
+            worker_log(q, "vcpkg is already bootstrapped.")
+        else:
+            worker_log(q, "Bootstrapping vcpkg...")
+            bootstrap_script = os.path.join(vcpkg_path, "bootstrap-vcpkg.bat")
+            result = stream_process(q, [bootstrap_script], cwd=vcpkg_path)
+            if result.returncode != 0:
+                worker_log(q, f"Bootstrap exited with code {result.returncode}")
+
+        worker_log(q, "Integrating vcpkg with Visual Studio...")
+        result = run_process(q, [vcpkg_exe, "integrate", "install"], cwd=vcpkg_path, capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            worker_log(q, f"vcpkg integrate install failed: {result.stderr or result.stdout}")
+        else:
+            worker_log(q, "vcpkg integrated successfully.")
+
+        vcpkg_json_source = os.path.join(repo_path, "vcpkg.json")
+        vcpkg_json_dest = os.path.join(vcpkg_path, "vcpkg.json")
+        if os.path.exists(vcpkg_json_source):
+            worker_log(q, f"Moving vcpkg.json to {vcpkg_path}")
+            shutil.move(vcpkg_json_source, vcpkg_json_dest)
+        else:
+            worker_log(q, "Root vcpkg.json not found, skipping move. It might already be in place.")
+
+        # Packages finished by an earlier, interrupted run are already in installed/ and
+        # vcpkg's binary cache, so this only builds what is left.
+        worker_log(q, "Running vcpkg install...")
+        ports = VcpkgProgress()
+        result = stream_process(q, [vcpkg_exe, "install"], parser=ports, cwd=vcpkg_path)
+        if ports.durations:
+            worker_log(q, "Time per port: " + ", ".join(f"{name} {elapsed}" for name, elapsed in ports.durations.items()))
+        if result.returncode != 0:
+            raise Exception(f"vcpkg install failed with exit code {result.returncode}")
+
+        worker_log(q, "vcpkg setup and package installation completed")
+        q.put({'type': 'result', 'success': True})
+    except Exception as e:
+        worker_log(q, f"Failed to setup vcpkg: {str(e)}")
+        q.put({'type': 'result', 'success': False})
+
+def vcpkg_checkout_ok(q, vcpkg_path):
+    result = run_process(q, ["git", "-C", vcpkg_path, "rev-parse", "--verify", "HEAD"], capture_output=True, text=True)
+    return result.returncode == 0 and os.path.exists(os.path.join(vcpkg_path, "bootstrap-vcpkg.bat"))
+
+def worker_delete_service(q, service_name):
+    """Attempts to delete a Windows service."""
+    try:
+        worker_log(q, f"Attempting to delete service: {service_name}")
+        # Use sc.exe to delete the service. This is a standard Windows command.
+        # We don't check the return code here because it will fail if the service doesn't exist,
+        # which is a normal and expected outcome in many cases.
+        result = run_process(q, ['sc', 'delete', service_name], capture_output=True, text=True, check=False)
+        if result.returncode == 0:
+            worker_log(q, f"Service '{service_name}' deleted successfully.")
+        else:
+            # It's not necessarily an error if the service doesn't exist.
+            # We can check the output to be more specific.
+            if "The specified service does not exist" in result.stderr:
+                worker_log(q, f"Service '{service_name}' did not exist, no action needed.")
+            else:
+                worker_log(q, f"Warning: 'sc delete {service_name}' failed with code {result.returncode}: {result.stderr.strip()}")
+        return True
+    except Exception as e:
+        worker_log(q, f"An error occurred while trying to delete service '{service_name}': {e}")
+        # We don't want to fail the whole installation for this, so we return True.
+        # The installer will likely fail with a more specific error if this was the root cause.
+        return True
+
+def worker_install_mariadb(q, config):
+    try:
+        if config['existing_mariadb']:
+            worker_log(q, "Skipping MariaDB installation as per user's choice.")
+            q.put({'type': 'result', 'success': True})
+            return
+
+        # Attempt to delete a lingering service from a previous failed install
+        worker_delete_service(q, "MariaDB")
+
+        worker_log(q, "Installing MariaDB...")
+        mariadb_version = MARIADB_VERSION
+        installer_name = f"mariadb-{mariadb_version}-winx64.msi"
+        
+        try:
+            script_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+        except NameError:
+            script_dir = os.getcwd()
+
+        installer_path = os.path.join(script_dir, installer_name)
+
+        if not os.path.exists(installer_path):
+            worker_log(q, f"MariaDB installer not found at '{installer_path}'. Attempting to download...")
+            mariadb_url = f"https://archive.mariadb.org/mariadb-{mariadb_version}/winx64-packages/{installer_name}"
+            
+            try:
+                download_file(q, mariadb_url, installer_path)
+                worker_log(q, "MariaDB installer downloaded successfully.")
+            except requests.exceptions.RequestException as e:
+                error_msg = f"Could not download MariaDB installer: {e}. Please place '{installer_name}' in the same directory as the setup script and try again."
+                worker_log(q, error_msg)
+                worker_show_error(q, "Download Failed", error_msg)
+                q.put({'type': 'result', 'success': False})
+                return
+        else:
+            worker_log(q, f"Found existing MariaDB installer: {installer_path}")
+        
+        worker_log(q, "Starting MariaDB installation (this may take a few minutes)...")
+        
+        log_file_path = os.path.join(config['project_path'], "mariadb_install_log.txt")
+        worker_log(q, f"MariaDB installation log will be saved to: {log_file_path}")
+
+        install_cmd = [
+            'msiexec', '/i', installer_path, '/qn',
+            f'/L*v', log_file_path,
+            f'PASSWORD={config["db_password"]}',
+            'ADDLOCAL=ALL',
+            'SERVICENAME=MariaDB',
+            'PORT=3306',
+            'CLEANUPDATA=1'
+        ]
+        # Start from an empty log so progress isn't read from a previous attempt.
+        try:
+            os.remove(log_file_path)
+        except OSError:
+            pass
+        result = stream_process(q, install_cmd, parser=MsiProgress(), follow=log_file_path)
+
+        if result.returncode not in [0, 3010]:
+            log_contents = ""
+            try:
+                with open(log_file_path, 'r', encoding='utf-8', errors='ignore') as log_file:
+                    log_contents = log_file.read()
+            except Exception as e:
+                worker_log(q, f"Could not read MariaDB install log: {e}")
+
+            if "CreateService failed (1073)" in log_contents:
+                error_message = (
+                    "MariaDB installation failed because the service already exists.\n\n"
+                    "The setup tried to remove the old service automatically but failed, "
+                    "likely due to insufficient permissions.\n\n"
+                    "Please run this setup tool as an Administrator."
+                )
+                worker_log(q, "Detected 'CreateService failed (1073)' error. Instructing user to run as admin.")
+            elif "data directory exist and not empty" in log_contents:
+                error_message = (
+                    "MariaDB installation failed because the data directory is not empty.\n\n"
+                    "Please manually delete the following directory and then try again:\n"
+                    "C:\\Program Files\\MariaDB 11.5\\data"
+                )
+                worker_log(q, "Detected 'data directory not empty' error. Instructing user to manually delete.")
+            else:
+                error_message = f"MariaDB installation failed with exit code {result.returncode}.\n\nPlease check the log file for details:\n{log_file_path}"
+                worker_log(q, error_message)
+                if log_contents:
+                     worker_log(q, f"--- MariaDB Install Log (last 2000 chars) ---\n{log_contents[-2000:]}")
+
+            worker_show_error(q, "MariaDB Installation Failed", error_message)
+            q.put({'type': 'result', 'success': False})
+            return
+
+        worker_log(q, "MariaDB installed successfully.")
+        q.put({'type': 'result', 'success': True})
+    except Exception as e:
+        worker_log(q, f"An unexpected error occurred during MariaDB installation: {e}")
+        q.put({'type': 'result', 'success': False})
+
+def worker_setup_database(q, config):
+    try:
+        worker_log(q, "Setting up database...")
+        repo_path = os.path.join(config['project_path'], "MicrovoltsEmulator")
+        sql_script_path = os.path.join(repo_path, "microvolts-db.sql")
+
+        if not os.path.exists(sql_script_path):
+            raise Exception("Database script not found")
+
+        mysql_exe = ""
+        custom_path = config.get("mariadb_path")
+
+        if custom_path:
+            path_to_check = os.path.join(custom_path, "bin", "mysql.exe")
+            if os.path.exists(path_to_check):
+                mysql_exe = path_to_check
+                worker_log(q, f"Using custom MariaDB path: {mysql_exe}")
+
+        if not mysql_exe:
+            worker_log(q, "Custom MariaDB path not provided or invalid. Searching default locations...")
+            for version in ["11.5", "11.4", "11.3", "11.2", "11.1", "11.0", "10.11", "10.6", "10.5"]:
+                path = f"C:\\Program Files\\MariaDB {version}\\bin\\mysql.exe"
+                if os.path.exists(path):
+                    mysql_exe = path
+                    worker_log(q, f"Found MariaDB at: {mysql_exe}")
+                    break
+        
+        if not mysql_exe:
+            raise Exception("Could not find mysql.exe. Please specify the path in the DB Config tab if you have an existing installation.")
+
+        # Create the database first
+        worker_log(q, f"Ensuring database '{config['db_name']}' exists...")
+        create_db_cmd = [
+            mysql_exe, "-u", config['db_username'], f"-p{config['db_password']}",
+            "-h", config['db_ip'], f"-P", str(config['db_port']),
+            "-e", f"CREATE DATABASE IF NOT EXISTS `{config['db_name']}`;"
+        ]
+        result = run_process(q, create_db_cmd, capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            raise Exception(f"Failed to create database: {result.stderr}")
+        worker_log(q, f"Database '{config['db_name']}' created or already exists.")
+
+        # Now import the script
+        with open(sql_script_path, 'r') as f:
+            sql_script_content = f.read()
+
+        import_cmd = [
+            mysql_exe, "-u", config['db_username'], f"-p{config['db_password']}",
+            "-h", config['db_ip'], f"-P", str(config['db_port']),
+            "-D", config['db_name']
+        ]
+        result = run_process(q, import_cmd, input=sql_script_content, capture_output=True, text=True, check=False)
+
+        if result.returncode != 0:
+            raise Exception(f"Database script execution failed: {result.stderr}")
+
+        worker_log(q, "Database setup complete.")
+        q.put({'type': 'result', 'success': True})
+    except Exception as e:
+        worker_log(q, f"Failed to set up database: {e}")
+        q.put({'type': 'result', 'success': False})
+
+
+class HostChannel:
+    """The `q` handed to a step inside the host; tags messages with the job id."""
+
+    def __init__(self, host, job):
+        self.host = host
+        self.job = job
+        self.cancelled = False
+        self.result_sent = False
+        self.children = set()
+        self.questions = {}
+
+    def put(self, message):
+        if self.cancelled:
+            raise StepCancelled()
+        if message.get('type') == 'result':
+            self.result_sent = True
+        self.host.send(dict(message, job=self.job))
+
+    def ask(self, title, prompt):
+        ask_id, answered = self.host.new_question(self)
+        self.put({'type': 'ask', 'id': ask_id, 'method': 'askyesno', 'title': title, 'prompt': prompt})
+        answered.wait()
+        if self.cancelled:
+            raise StepCancelled()
+        return self.host.answers.pop(ask_id)
+
+    def track(self, process):
+        self.children.add(process)
+        if self.cancelled:
+            kill_process_tree(process)
+
+    def untrack(self, process):
+        self.children.discard(process)
+
+    def cancel(self):
+        self.cancelled = True
+        for process in list(self.children):
+            kill_process_tree(process)
+        for answered in list(self.questions.values()):
+            answered.set()
+
+
+class WorkerHostLoop:
+    """Runs inside the host process: reads jobs from stdin and runs each step on its own thread."""
+
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.write_lock = threading.Lock()
+        self.channels = {}
+        self.answers = {}
+        self.next_question = 1
+
+    def send(self, message):
+        line = json.dumps(message) + "\n"
+        with self.write_lock:
+            self.protocol.write(line)
+            self.protocol.flush()
+
+    def new_question(self, channel):
+        with self.write_lock:
+            ask_id = self.next_question
+            self.next_question += 1
+        answered = threading.Event()
+        channel.questions[ask_id] = answered
+        return ask_id, answered
+
+    def run_job(self, channel, step_name, config):
+        try:
+            step = globals().get(step_name)
+            if not step_name.startswith("worker_") or not callable(step):
+                raise ValueError(f"Unknown setup step '{step_name}'")
+            step(channel, config)
+            if not channel.result_sent:
+                # A step that returns without a result would leave the GUI waiting forever.
+                self.send({'type': 'log', 'message': f"Step {step_name} ended without reporting a result.", 'job': channel.job})
+                self.send({'type': 'result', 'success': False, 'job': channel.job})
+        except StepCancelled:
+            self.send({'type': 'log', 'message': "Step cancelled.", 'job': channel.job})
+            self.send({'type': 'result', 'success': False, 'cancelled': True, 'job': channel.job})
+        except Exception as e:
+            self.send({'type': 'log', 'message': f"Step {step_name} crashed: {e}", 'job': channel.job})
+            self.send({'type': 'result', 'success': False, 'job': channel.job})
+        finally:
+            self.channels.pop(channel.job, None)
+
+    def serve(self, lines):
+        self.send({'type': 'ready', 'pid': os.getpid()})
+        for line in lines:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                continue
+            op = request.get('op')
+            if op == 'run':
+                channel = self.channels[request['job']] = HostChannel(self, request['job'])
+                threading.Thread(target=self.run_job, args=(channel, request['step'], request['config']), daemon=True).start()
+            elif op == 'answer':
+                for channel in list(self.channels.values()):
+                    answered = channel.questions.pop(request['id'], None)
+                    if answered is not None:
+                        self.answers[request['id']] = request['value']
+                        answered.set()
+            elif op == 'cancel':
+                channel = self.channels.get(request['job'])
+                if channel is not None:
+                    channel.cancel()
+            elif op == 'exit':
+                break
+        for channel in list(self.channels.values()):
+            channel.cancel()
+
+
+def host_main():
+    # Keep a private handle on the real stdout for the protocol and point fd 1 at
+    # stderr, so stray prints from steps or libraries can't corrupt the stream.
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8', newline='\n')
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    sys.stdin.reconfigure(encoding='utf-8')
+    WorkerHostLoop(protocol).serve(sys.stdin)
+
+
+class WorkerHost:
+    """GUI-side handle on the long-lived worker host process.
+
+    Messages from the host are passed to `on_message` from a reader thread. If the host
+    dies, every job it was running is reported as a 'worker_exit' message and the next
+    run() starts a fresh host.
+    """
+
+    def __init__(self, on_message, command=None):
+        self.on_message = on_message
+        self.command = command or self.default_command()
+        self.lock = threading.Lock()
+        self.process = None
+        self.active_jobs = {}
+        self.next_job = 1
+        self.spawned_at = None
+        self.ready = threading.Event()
+        self.ready_latency = None
+        self.restarts = 0
+
+    @staticmethod
+    def default_command():
+        if getattr(sys, 'frozen', False):
+            return [sys.executable, WORKER_HOST_FLAG]
+        return [sys.executable, os.path.abspath(__file__)]
+
+    def start(self):
+        with self.lock:
+            self._ensure_started()
+
+    def _ensure_started(self):
+        if self.process is not None and self.process.poll() is None:
+            return
+        if self.process is not None:
+            self.restarts += 1
+            self.on_message({'type': 'log', 'message': "Worker host exited; starting a new one."})
+        self.ready.clear()
+        self.spawned_at = time.perf_counter()
+        process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   encoding='utf-8', errors='replace', bufsize=1, start_new_session=(os.name != 'nt'),
+                                   creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+        self.process = process
+        threading.Thread(target=self._read_messages, args=(process,), daemon=True).start()
+        threading.Thread(target=self._read_errors, args=(process,), daemon=True).start()
+
+    def _read_messages(self, process):
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if message.get('type') == 'ready':
+                self.ready_latency = time.perf_counter() - self.spawned_at
+                self.ready.set()
+                continue
+            if message.get('type') == 'result':
+                with self.lock:
+                    self.active_jobs.pop(message.get('job'), None)
+            self.on_message(message)
+
+        exitcode = process.wait()
+        with self.lock:
+            lost = [job for job, owner in self.active_jobs.items() if owner is process]
+            for job in lost:
+                del self.active_jobs[job]
+        for job in lost:
+            self.on_message({'type': 'worker_exit', 'job': job, 'exitcode': exitcode})
+
+    def _read_errors(self, process):
+        for line in process.stderr:
+            if line.strip():
+                self.on_message({'type': 'log', 'message': f"[worker host] {line.rstrip()}"})
+
+    def _send(self, request):
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+            return True
+        except (OSError, ValueError, AttributeError):
+            return False
+
+    def run(self, step, config):
+        """Starts `step` (a worker_* function or its name) in the host and returns the job id."""
+        step_name = getattr(step, '__name__', step)
+        with self.lock:
+            self._ensure_started()
+            job = self.next_job
+            self.next_job += 1
+            self.active_jobs[job] = self.process
+            sent = self._send({'op': 'run', 'job': job, 'step': step_name, 'config': config})
+            if not sent:
+                del self.active_jobs[job]
+        if not sent:
+            self.on_message({'type': 'worker_exit', 'job': job, 'exitcode': self.process.poll()})
+        return job
+
+    def answer(self, ask_id, value):
+        with self.lock:
+            self._send({'op': 'answer', 'id': ask_id, 'value': bool(value)})
+
+    def cancel(self, job, grace=5.0):
+        """Asks the host to cancel `job`; kills the host if the step hasn't stopped after `grace` seconds."""
+        with self.lock:
+            if job not in self.active_jobs:
+                return
+            self._send({'op': 'cancel', 'job': job})
+        timer = threading.Timer(grace, self._kill_if_active, args=(job,))
+        timer.daemon = True
+        timer.start()
+
+    def _kill_if_active(self, job):
+        with self.lock:
+            process = self.active_jobs.get(job)
+        if process is not None and process.poll() is None:
+            kill_process_tree(process)
+
+    def stop(self, timeout=2.0):
+        with self.lock:
+            process = self.process
+            if process is None or process.poll() is not None:
+                return
+            self._send({'op': 'exit'})
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            kill_process_tree(process)
+
+
+if __name__ == "__main__":
+    host_main()